@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import io
+import logging
+import os
+import time
+
+from PIL import Image
+
+from config.settings import CAPTCHA_SOLVER
+from src.captcha_corpus import CaptchaCorpus
+from src.captcha_ocr import OCR_BACKENDS, get_ocr_backend, ocr_captcha, preprocess_captcha
+from src.captcha_solver import CaptchaSolver, is_held_out, load_harvested_samples
+
+# Configure logging
+logging.basicConfig(
+    level=logging.WARNING,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# Preprocessing variants replayed against every OCR backend
+PREPROCESS_VARIANTS = {
+    'default': {},
+    'threshold-100': {'threshold': 100},
+    'threshold-160': {'threshold': 160},
+    'no-enhance': {'contrast': None, 'brightness': None},
+}
+
+# PSM sequences: the production cascade and each mode on its own
+PSM_VARIANTS = {
+    'cascade': (7, 8, 13),
+    'psm7': (7,),
+    'psm8': (8,),
+    'psm13': (13,),
+}
+
+
+def ocr_config(backend, psm_modes, preprocess):
+    def solve(image_bytes):
+        img = preprocess_captcha(Image.open(io.BytesIO(image_bytes)), **preprocess)
+        return ocr_captcha(backend, img, psm_modes)[0]
+    return solve
+
+
+def solver_config(solver, fallback=None):
+    def solve(image_bytes):
+        text, confidence = solver.solve(image_bytes)
+        if text and confidence >= CAPTCHA_SOLVER['min_confidence']:
+            return text
+        return fallback(image_bytes) if fallback else None
+    return solve
+
+
+def build_configs(backend_names, model_path):
+    """Return {name: solve(image_bytes) -> text or None} for every configuration to replay"""
+    configs = {}
+    for backend_name in backend_names:
+        try:
+            backend = get_ocr_backend(backend_name)
+        except ImportError as e:
+            print(f"Skipping {backend_name}: {str(e)}")
+            continue
+        for psm_name, psm_modes in PSM_VARIANTS.items():
+            for preprocess_name, preprocess in PREPROCESS_VARIANTS.items():
+                configs[f"{backend_name}/{psm_name}/{preprocess_name}"] = ocr_config(backend, psm_modes, preprocess)
+
+    solver = CaptchaSolver.load(model_path)
+    if solver:
+        configs['solver'] = solver_config(solver)
+        production_ocr = next((name for name in configs if name.endswith('/cascade/default')), None)
+        if production_ocr:
+            configs[f"solver+{production_ocr}"] = solver_config(solver, configs[production_ocr])
+    return configs
+
+
+def training_digests(directory, holdout):
+    """sha1 of every captcha harvested under directory that the solver was trained on"""
+    if not directory or not os.path.isdir(directory):
+        return set()
+    return {hashlib.sha1(image_bytes).hexdigest() for image_bytes, _ in load_harvested_samples(directory)
+            if not is_held_out(image_bytes, holdout)}
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_config(solve, samples):
+    """
+    Replay one configuration over the corpus.
+
+    Only accepted captchas have a known label, so accuracy is measured on those;
+    on rejected captchas we can only count repeats of the guess the server refused.
+    """
+    latencies = []
+    answered = 0
+    correct = 0
+    labelled = 0
+    repeated_rejects = 0
+    for image_bytes, entry in samples:
+        start = time.perf_counter()
+        text = solve(image_bytes)
+        latencies.append(time.perf_counter() - start)
+        if text:
+            answered += 1
+        if entry['accepted']:
+            labelled += 1
+            correct += text == entry['guess']
+        elif text and text == entry['guess']:
+            repeated_rejects += 1
+
+    answer_rate = answered / len(samples)
+    accuracy = correct / labelled if labelled else 0.0
+    # Each attempt fetches a captcha and, when we have an answer, posts the search;
+    # the app token is carried over between attempts, so the homepage is not counted
+    expected_round_trips = (1 + answer_rate) / accuracy if accuracy else float('inf')
+    return {
+        'answer_rate': answer_rate,
+        'accuracy': accuracy,
+        'repeated_rejects': repeated_rejects,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'round_trips': expected_round_trips,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay captcha solver configurations over the captured corpus")
+    parser.add_argument('--corpus', default=None, help="corpus directory (default: CAPTCHA_CORPUS_DIR)")
+    parser.add_argument('--backends', nargs='+', default=list(OCR_BACKENDS), choices=list(OCR_BACKENDS),
+                        help="OCR backends to include")
+    parser.add_argument('--model', default=CAPTCHA_SOLVER['model_path'], help="trained solver model to include")
+    parser.add_argument('--harvest', default=CAPTCHA_SOLVER['harvest_dir'],
+                        help="captchas the solver was trained from (default: CAPTCHA_HARVEST_DIR)")
+    parser.add_argument('--holdout', type=float, default=CAPTCHA_SOLVER['holdout'],
+                        help="the --holdout the solver was trained with")
+    parser.add_argument('--limit', type=int, default=None, help="only replay the first N captchas")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    corpus = CaptchaCorpus(args.corpus)
+    if not corpus.enabled:
+        print("No corpus directory; pass --corpus or set CAPTCHA_CORPUS_DIR")
+        return 1
+
+    samples = list(corpus.samples())[:args.limit]
+    if not samples:
+        print(f"Corpus {corpus.directory} is empty")
+        return 1
+    accepted = sum(1 for _, entry in samples if entry['accepted'])
+    print(f"\nCorpus: {len(samples)} captchas, {accepted} accepted (labelled)")
+
+    # The solver has seen the captchas it was trained on, so scoring it on them
+    # would flatter it: it only replays the trainer's held-out share of the
+    # harvest and captchas never harvested. The OCR configurations see them all
+    training = training_digests(args.harvest, args.holdout)
+    held_out = [(image_bytes, entry) for image_bytes, entry in samples if entry['sha1'] not in training]
+    if len(held_out) < len(samples):
+        print(f"Solver configurations are scored on the {len(held_out)} captchas it was not trained on")
+
+    configs = build_configs(args.backends, args.model)
+    results = []
+    for name, solve in configs.items():
+        replay = held_out if name.startswith('solver') else samples
+        if not replay:
+            print(f"Skipping {name}: every captcha in the corpus is in its training set")
+            continue
+        try:
+            results.append((name, run_config(solve, replay)))
+        except Exception as e:
+            # e.g. the tesseract binary is missing; the other configurations still run
+            print(f"Skipping {name}: {str(e)}")
+    results.sort(key=lambda item: (item[1]['round_trips'], item[1]['p50_ms']))
+
+    print(f"\n{'configuration':<40} {'answered':>9} {'accuracy':>9} {'re-rejects':>10} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'RT/case':>8}")
+    print("-" * 98)
+    for name, result in results:
+        print(f"{name:<40} {result['answer_rate'] * 100:>8.1f}% {result['accuracy'] * 100:>8.1f}% "
+              f"{result['repeated_rejects']:>10} {result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+              f"{result['round_trips']:>8.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
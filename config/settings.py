@@ -13,6 +13,85 @@ MYSQL_DATABASE = {
     'password': os.getenv('DB_PASSWORD', '')
 }
 
+# Database Writer Settings
+DB_WRITER = {
+    'batch_size': int(os.getenv('DB_BATCH_SIZE', '50')),  # cases written per transaction
+    'flush_interval_ms': 2000  # longest a parsed case waits in the buffer
+}
+
+# Dimension Cache Settings
+DIMENSION_CACHE = {
+    'preload': True,  # load the small lookup tables (case types, courts, acts...) at startup
+    'max_litigants': 100000,  # litigant names kept, least recently used evicted first
+    'max_advocates': 20000  # advocate names kept, least recently used evicted first
+}
+
+# CNR Existence Index Settings
+EXISTENCE_INDEX = {
+    'enabled': os.getenv('EXISTENCE_INDEX', 'False').lower() == 'true',  # keep stored and missing CNRs in memory
+    'missing_file': 'data/missing_cnrs.json'  # CNRs of past years confirmed not to exist, kept across runs
+}
+
+# Crawl Frontier Settings
+CRAWL = {
+    'establishments': os.getenv('CRAWL_ESTABLISHMENTS', 'KLKN01').split(','),  # establishment codes, crawled in order
+    'years': [int(year) for year in os.getenv('CRAWL_YEARS', '2019').split(',')],  # case years, crawled in order
+    'shard_block_size': 100  # consecutive serials dealt to one shard at a time
+}
+
+# Crawl Statistics Settings
+CRAWL_STATS = {
+    'outcome_dir': 'logs/outcomes',  # append-only per-CNR outcome logs, one per worker
+    'windows': (300, 3600),  # seconds covered by the rolling rates
+    'memory_warn_mb': int(os.getenv('MEMORY_WARN_MB', '1024')),  # resident memory that logs a warning
+    'memory_limit_mb': int(os.getenv('MEMORY_LIMIT_MB', '2048')),  # resident memory that restarts the worker; 0 disables
+    'memory_check_interval': 30  # seconds between memory checks
+}
+
+# Metrics Endpoint Settings
+METRICS = {
+    'port': int(os.getenv('METRICS_PORT', '0')),  # serve /metrics here, 0 disables; --workers serve from this port up, one each
+    'host': os.getenv('METRICS_HOST', '127.0.0.1')
+}
+
+# Span Tracing and Profiling Settings
+TRACING = {
+    'enabled': os.getenv('TRACE_SPANS', 'False').lower() == 'true',  # time every HTTP call, OCR, parse and SQL statement per CNR
+    'trace_dir': 'logs/traces',  # JSONL span logs, one per worker
+    'profile_path': 'logs/profile.prof'  # where --profile writes its merged cProfile stats
+}
+
+# Crawl Checkpoint Settings
+CHECKPOINT = {
+    'interval': 5.0,  # seconds between checkpoint writes
+    'every': 200,  # CNRs done that force a checkpoint write sooner
+    'max_attempts': 3,  # runs a CNR is tried in before a restore stops replaying it
+    'max_in_flight': 2000  # CNRs kept in flight, oldest dropped first; keeps the row inside a TEXT column
+}
+
+# Worker Process Settings
+WORKERS = {
+    'count': int(os.getenv('CRAWL_WORKERS', '1')),  # crawl processes run_continuous.py starts
+    'max_restarts': 5,  # times a crashed worker is started again before it is given up on
+    'restart_delay': 10,  # seconds before a crashed worker is started again
+    'report_interval': 10,  # seconds between progress reports from each worker
+    'shutdown_timeout': 60  # seconds workers get to save their progress after Ctrl-C
+}
+
+# Distributed Crawl Lease Settings
+LEASES = {
+    'lease_size': 500,  # serials handed to a worker per lease
+    'ttl': 300,  # seconds without a heartbeat before a lease is handed to another worker
+    'heartbeat_interval': 30  # seconds between heartbeats while a lease is worked on
+}
+
+# CNR Range Discovery Settings
+RANGE_DISCOVERY = {
+    'ranges_file': 'data/cnr_ranges.json',  # highest live serial found per establishment/year
+    'gap_tolerance': 10,  # consecutive missing serials that mark the end of the live range
+    'margin': 50  # serials still crawled past the highest live serial found
+}
+
 # Scraping Settings
 USER_AGENTS = [
     'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -26,10 +105,83 @@ RETRY_HTTP_CODES = [500, 502, 503, 504, 522, 524, 408, 429]
 
 # Rate Limiting
 RATE_LIMIT = {
-    'min_time_between_requests': 1.0,  # seconds
-    'max_requests_per_minute': 60
+    'min_time_between_requests': 1.0,  # seconds, sets the starting rate
+    'max_requests_per_minute': 240,  # ceiling the adaptive rate can climb to
+    'min_requests_per_minute': 6,  # floor the adaptive rate backs off to
+    'burst': 5,  # tokens the bucket can hold
+    'additive_increase': 0.02,  # requests/second added per clean response
+    'multiplicative_decrease': 0.5,  # rate factor applied on 429/5xx or slow responses
+    'decrease_cooldown': 5.0,  # seconds between two decreases
+    'latency_factor': 2.0,  # response slower than this multiple of the average counts as congestion
+    'state_file': os.getenv('RATE_LIMIT_STATE_FILE', 'data/rate_limit.json')  # shared by all workers on a host
+}
+
+# Async Scraping Settings
+ASYNC_SCRAPER = {
+    'concurrency': int(os.getenv('ASYNC_CONCURRENCY', '20')),  # logical sessions in flight
+    'connect_timeout': 15,  # seconds
+    'read_timeout': 30  # seconds
 }
 
+# Staged Pipeline Settings
+PIPELINE = {
+    'parse_workers': int(os.getenv('PIPELINE_PARSE_WORKERS', str(os.cpu_count() or 1))),  # parser processes
+    'parse_queue_size': 100,  # fetched pages waiting to be parsed before fetchers wait
+    'persist_queue_size': 100,  # parsed cases waiting to be saved before parsers wait
+    'source_chunk_size': 100,  # CNRs taken from the frontier per pull, off the event loop
+    'metrics_interval': 30  # seconds between logged stage metrics
+}
+
+# Captcha Prefetch Settings
+CAPTCHA_PREFETCH = {
+    'pool_size': 4,  # armed sessions kept ready
+    'producers': 2,  # threads arming sessions in the background
+    'ttl': 120,  # seconds an armed captcha is trusted before it is discarded
+    'take_timeout': 30,  # seconds a worker waits for an armed session before arming its own
+    'max_ocr_misses': 5  # unreadable captchas in a row before a session is dropped and the producer backs off
+}
+
+# Securimage Captcha Solver Settings
+CAPTCHA_SOLVER = {
+    'model_path': 'data/captcha_model.npz',  # written by train_captcha_solver.py
+    'harvest_dir': os.getenv('CAPTCHA_HARVEST_DIR', ''),  # keep accepted captchas here as training data
+    'holdout': 0.2,  # share of harvested captchas, picked by hash, never trained on
+    'min_confidence': 0.85,  # below this the OCR cascade is used instead
+    'threshold': 128,  # grey level separating ink from background
+    'min_glyph_pixels': 20,  # ink pixels a column run needs to count as a character
+    'k': 3  # neighbours voting per character
+}
+
+# Captcha Corpus Settings
+CAPTCHA_CORPUS = {
+    'dir': os.getenv('CAPTCHA_CORPUS_DIR', ''),  # capture every captcha here; empty disables capture
+    'index_file': 'index.jsonl'  # one line per captcha seen: hash, guess, accepted
+}
+
+# Raw Response Archive Settings
+RESPONSE_ARCHIVE = {
+    'dir': os.getenv('RESPONSE_ARCHIVE_DIR', ''),  # archive every case page here; empty disables it
+    'compression_level': 10  # zstd level; pages are small and repetitive, so higher levels pay off
+}
+
+# Captcha OCR backend: 'pytesseract' spawns tesseract per call,
+# 'tesserocr' keeps the engine loaded in-process (requires tesserocr)
+OCR_BACKEND = os.getenv('OCR_BACKEND', 'pytesseract')
+
+# Stored for cases whose page names no court
+DEFAULT_COURT_NAME = 'Kannur District Court'
+
+# Case page parser: 'beautifulsoup' (pure-Python html.parser) or
+# 'lxml' (C-backed, locates every table in a single pass)
+PARSER_BACKEND = os.getenv('PARSER_BACKEND', 'beautifulsoup')
+PARSER_VERIFY_RATE = float(os.getenv('PARSER_VERIFY_RATE', '0'))  # share of lxml parses re-checked with BeautifulSoup
+PARSER_KEEP_HTML = os.getenv('PARSER_KEEP_HTML', 'False').lower() == 'true'  # echo the page in case_details['html_content']
+
+# Write the last captcha images, case page and rejected answers to the working
+# directory; only the synchronous scraper's inline path does, never the async
+# scraper or the prefetch threads, which would overwrite each other's files
+DEBUG_DUMPS = os.getenv('DEBUG_DUMPS', 'False').lower() == 'true'
+
 # Proxy Settings
 PROXY_ENABLED = os.getenv('PROXY_ENABLED', 'False').lower() == 'true'
 PROXY_API_KEY = os.getenv('PROXY_API_KEY', '')
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+import argparse
+import logging
+
+from src.database import Database
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Remove duplicate cases and add the unique index on cases.cnr_number")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="only report how many duplicate cases would be deleted")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    db = Database()
+    if db.has_cnr_index():
+        print("cases.cnr_number is already uniquely indexed")
+        return 0
+
+    removed = db.remove_duplicate_cases(dry_run=args.dry_run)
+    if args.dry_run:
+        print(f"{removed} older copies of duplicated cases would be deleted; the newest copy of each is kept")
+        return 0
+    print(f"Deleted {removed} older copies of duplicated cases")
+
+    if not db.ensure_cnr_index():
+        print("Could not add the unique index on cases.cnr_number; see the log above")
+        return 1
+    print("Added unique index on cases.cnr_number")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+import argparse
+import logging
+import time
+
+from config.settings import DEFAULT_COURT_NAME
+from src.case_parser import PARSER_BACKENDS, get_parser_backend
+from src.case_pipeline import PageParser
+from src.database import CaseWriter, Database
+from src.response_archive import ResponseArchive
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Re-parse archived case pages with the current parser and store them, without any network")
+    parser.add_argument('--archive', default=None, help="archive directory (default: RESPONSE_ARCHIVE_DIR)")
+    parser.add_argument('--cnr', nargs='+', default=None, help="only re-parse these CNR numbers")
+    parser.add_argument('--shard', nargs='+', default=None,
+                        help="only re-parse these state/district shards, e.g. KLKN")
+    parser.add_argument('--all-fetches', action='store_true',
+                        help="re-parse every archived fetch, not just the latest per CNR")
+    parser.add_argument('--parser', choices=PARSER_BACKENDS, default=None,
+                        help="case page parser (default: PARSER_BACKEND)")
+    parser.add_argument('--dry-run', action='store_true', help="parse only, do not write to the database")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    archive = ResponseArchive(args.archive)
+    if not archive.enabled:
+        print("No archive directory; pass --archive or set RESPONSE_ARCHIVE_DIR")
+        return 1
+
+    db = None if args.dry_run else Database()
+    parser = PageParser(get_parser_backend(args.parser))
+
+    stats = {'parsed': 0, 'saved': 0, 'not_found': 0, 'parse_failed': 0, 'save_failed': 0}
+
+    def count_saved(case_details, case_id, error):
+        if case_id:
+            stats['saved'] += 1
+        else:
+            stats['save_failed'] += 1
+            logging.error(f"Failed to save {case_details['cnr_number']}: {str(error)}")
+
+    # Re-parsed cases replace what is stored under the same CNR: the stored copy
+    # is deleted in the same transaction as the insert, since cases.cnr_number
+    # is only unique once migrate_cnr_index.py has run
+    writer = CaseWriter(db, on_saved=count_saved, replace=True) if db else None
+    start_time = time.time()
+    try:
+        for entry, html_content in archive.iter_responses(args.cnr, args.shard, latest_only=not args.all_fetches):
+            if 'This Case Code does not exists' in html_content:
+                stats['not_found'] += 1
+                continue
+
+            case_details = parser._parse_case_details(html_content)
+            if not case_details:
+                stats['parse_failed'] += 1
+                logging.warning(f"Failed to parse archived response for {entry['cnr']}")
+                continue
+            stats['parsed'] += 1
+            # As record_case_result does for live pages; replace=True must never key on an empty CNR
+            if not case_details.get('cnr_number'):
+                case_details['cnr_number'] = entry['cnr']
+            if not case_details.get('court_name'):
+                case_details['court_name'] = DEFAULT_COURT_NAME
+
+            if writer:
+                writer.add(case_details)
+    except KeyboardInterrupt:
+        print("\nInterrupted")
+    finally:
+        if writer:
+            writer.close()
+
+    total_time = time.time() - start_time
+    print("\n=== Re-parse Summary ===")
+    for key, value in stats.items():
+        print(f"{key.replace('_', ' ').capitalize()}: {value}")
+    print(f"Time: {total_time:.1f} seconds ({stats['parsed'] / total_time if total_time else 0:.1f} pages/second)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,33 +1,29 @@
+import argparse
+import asyncio
+import functools
+import itertools
+import os
+import socket
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import logging
 import sys
 import json
+from src.async_ecourts_scraper import AsyncECourtsScraper
+from src.captcha_ocr import OCR_BACKENDS
+from src.case_pipeline import CasePipeline
+from src.case_parser import PARSER_BACKENDS
+from src.cnr_frontier import CheckpointedFrontier, CnrFrontier, LeasedFrontier, encode_cnr, parse_shard
+from src.cnr_index import CnrExistenceIndex
+from src.range_discovery import CnrRanges, discover_max_serial
 from src.ecourts_scraper import ECourtsScraper
-from src.database import Database
-
-def get_last_scraped_case(db):
-    """Get the last scraped case number from the database"""
-    try:
-        last_case = db.get_last_case_number()
-        if last_case:
-            # Extract the numeric part from the CNR number (e.g., '000011' from 'KLKN010000112019')
-            numeric_part = last_case[6:12]  # Get the 6 digits after 'KLKN01'
-            return int(numeric_part)
-        return 0
-    except Exception as e:
-        logging.error(f"Error getting last case number: {str(e)}")
-        return 0
-
-def get_test_cnr_numbers(start_number=1, batch_size=10):
-    """Return a list of test CNR numbers with pattern KLKN01XXXXXX2019"""
-    cnr_numbers = []
-    for i in range(start_number, start_number + batch_size):
-        # Format the number with leading zeros (6 digits)
-        number = str(i).zfill(6)
-        cnr = f"KLKN01{number}2019"
-        cnr_numbers.append(cnr)
-    return cnr_numbers
+from src.crawl_stats import CrawlStats, MemoryWatchdog, OutcomeLog
+from src.database import CaseWriter, Database
+from src.metrics import start_metrics_server
+from src.tracing import CaseProfiler, merge_profiles, start_tracing, stop_tracing
+from src.worker_supervisor import RECYCLE_EXIT_CODE, WorkerReporter, WorkerSupervisor
+from config.settings import CRAWL_STATS, DEFAULT_COURT_NAME, EXISTENCE_INDEX, METRICS, TRACING, WORKERS
 
 def save_failed_cases(failed_cases):
     """Save failed cases to a JSON file"""
@@ -37,66 +33,199 @@ def save_failed_cases(failed_cases):
         json.dump(failed_cases, f, indent=4)
     return filename
 
-def main():
-    """Main function to run the scraper continuously"""
-    try:
-        # Configure logging
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s'
-        )
-        
-        # Initialize database
-        db = Database()
+def record_case_result(writer, stats, cnr, case_data, index=None):
+    """
+    Queue a scraped case for saving, or count it as non-existent.
+
+    Returns False if the fetch failed: the CNR was never scraped, so the
+    caller must not report it done but leave it in flight, to be tried
+    again when the lease or checkpoint is resumed.
+    """
+    if not case_data:
+        stats.record('failed', cnr)
+        logging.error(f"✗ Could not fetch case {cnr}; leaving it to be retried")
+        writer.flush_if_due()
+        return False
+    if 'request_stats' in case_data:
+        stats.observe_latency(case_data['request_stats']['seconds'])
+    if case_data.get('exists', True):
+        # Ensure required fields are present
+        if not case_data.get('cnr_number'):
+            case_data['cnr_number'] = cnr
+        if not case_data.get('court_name'):
+            case_data['court_name'] = DEFAULT_COURT_NAME
         
-        # Get last case number from database
-        last_case_number = db.get_last_case_number()
-        if last_case_number:
-            # Extract the numeric part from the last case number
-            last_number = int(last_case_number[6:12])
-            current_batch = last_number + 1
-            logging.info(f"Starting from case number: {current_batch}")
+        # Saved with the next batch; record_saved_case updates the statistics
+        writer.add(case_data)
+    else:
+        stats.record('non_existent', cnr)
+        logging.info(f"Case {cnr} does not exist")
+        logging.info(f"✓ Case {cnr} does not exist")
+        if index:
+            # Only a page saying so gets here; a failed fetch proves nothing
+            index.add_missing(cnr)
+        writer.flush_if_due()
+    return True
+
+def record_saved_case(stats, case_data, case_id, error, index=None):
+    """Update the run statistics once a buffered case has been written"""
+    cnr = case_data['cnr_number']
+    if case_id:
+        if index:
+            index.add_existing([cnr])
+        stats.record('successful', cnr)
+        logging.info(f"✓ Successfully scraped and saved case {cnr}")
+        logging.info(f"Case Type: {case_data.get('case_type')}")
+        logging.info(f"Filing Number: {case_data.get('filing_number')}")
+        logging.info(f"Decision Date: {case_data.get('decision_date')}")
+    else:
+        stats.record('failed', cnr)
+        if error:
+            logging.error(f"Error saving case {cnr} to database: {str(error)}")
         else:
-            current_batch = 1
-            logging.info("No last case number found. Starting from 1")
-        
+            logging.error(f"Failed to save case {cnr} to database")
+
+def make_case_writer(db, stats, batch_size=None, index=None, frontier=None):
+    checkpoint = None
+    if frontier:
+        # Progress is recorded by the frontier: on the leases, or in this shard's checkpoint
+        def checkpoint(cnr_numbers):
+            for cnr in cnr_numbers:
+                frontier.done(cnr)
+    return CaseWriter(db, batch_size=batch_size, on_saved=functools.partial(record_saved_case, stats, index=index),
+                      checkpoint=checkpoint)
+
+def pending_cnr_numbers(db, stats, cnr_numbers, index=None, frontier=None):
+    """
+    Return the CNR numbers that still need scraping, counting the rest as skipped.
+
+    The existence index settles what it can in memory; the database is asked
+    about the remainder with a single query.
+    """
+    candidates = index.unknown(cnr_numbers) if index else cnr_numbers
+    existing = db.existing_cnrs(candidates)
+    if index:
+        index.add_existing(existing)
+    candidates = set(candidates)
+    
+    pending = []
+    for cnr in cnr_numbers:
+        if cnr in candidates and cnr not in existing:
+            pending.append(cnr)
+            continue
+        stats.record('skipped', cnr)
+        if frontier:
+            frontier.done(cnr)
+        if index and index.is_missing(cnr):
+            logging.info(f"Skipping case {cnr} (known not to exist)")
+        else:
+            logging.info(f"Skipping case {cnr} (already exists)")
+    return pending
+
+def iter_pending_cnr_numbers(db, stats, frontier, index=None, chunk_size=100):
+    """Yield the frontier's CNR numbers, skipping cases already in the database"""
+    cnr_iter = iter(frontier)
+    while True:
+        cnr_numbers = list(itertools.islice(cnr_iter, chunk_size))
+        if not cnr_numbers:
+            return
+        pending = set(pending_cnr_numbers(db, stats, cnr_numbers, index, frontier))
+        for cnr in cnr_numbers:
+            stats.attempted()
+            if cnr in pending:
+                yield cnr
+        if stats.memory_exceeded:
+            logging.warning("Memory limit reached; no more CNRs will be started")
+            return
+
+async def run_async(db, stats, frontier, concurrency, ocr_backend=None, parser_backend=None, batch_size=None,
+                    index=None):
+    """Keep up to `concurrency` CNRs in flight using the asyncio scraper"""
+    loop = asyncio.get_running_loop()
+    # Every database call runs on this one thread, in order, so the event loop is left to the sessions
+    db_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db')
+    writer = make_case_writer(db, stats, batch_size, index, frontier)
+    
+    async def pull_pending_cnr_numbers(chunk_size=100):
+        cnr_iter = iter_pending_cnr_numbers(db, stats, frontier, index)
+        while True:
+            chunk = await loop.run_in_executor(db_thread, list, itertools.islice(cnr_iter, chunk_size))
+            if not chunk:
+                return
+            for cnr in chunk:
+                yield cnr
+    
+    def save(cnr, case_data):
+        if record_case_result(writer, stats, cnr, case_data, index):
+            writer.advance(cnr)
+    
+    try:
+        async with AsyncECourtsScraper(concurrency=concurrency, ocr_backend=ocr_backend,
+                                       parser_backend=parser_backend) as scraper:
+            logging.info(f"Async scraper running with {concurrency} concurrent sessions")
+            async for cnr, case_data in scraper.iter_case_details(pull_pending_cnr_numbers()):
+                # The other sessions keep going while the case is saved
+                await loop.run_in_executor(db_thread, save, cnr, case_data)
+                
+                completed = stats['successful'] + stats['non_existent'] + stats['failed']
+                if completed % 10 == 0:
+                    runtime = time.time() - stats.start_time
+                    logging.info(f"Completed {completed} cases in {time.strftime('%H:%M:%S', time.gmtime(runtime))}")
+    finally:
+        await loop.run_in_executor(db_thread, writer.close)
+        db_thread.shutdown()
+
+async def run_pipeline(db, stats, frontier, concurrency, ocr_backend=None, parser_backend=None, batch_size=None,
+                       index=None, parse_workers=None):
+    """Fetch, parse and save in separate stages: `concurrency` sessions, `parse_workers` processes, one writer"""
+    # The writer runs on the pipeline's persist thread, so it gets a connection of its own
+    writer_db = Database()
+    with make_case_writer(writer_db, stats, batch_size, index, frontier) as writer:
+        async with AsyncECourtsScraper(concurrency=concurrency, ocr_backend=ocr_backend,
+                                       parser_backend=parser_backend) as scraper:
+            def persist(cnr, case_data):
+                if record_case_result(writer, stats, cnr, case_data, index):
+                    writer.advance(cnr)
+            
+            pipeline = CasePipeline(scraper, persist, parsers=parse_workers)
+            await pipeline.run(iter_pending_cnr_numbers(db, stats, frontier, index))
+
+def run_sync(db, stats, frontier, prefetch=False, ocr_backend=None, parser_backend=None, batch_size=None,
+             index=None):
+    """Scrape one CNR at a time with the synchronous scraper"""
+    writer = make_case_writer(db, stats, batch_size, index, frontier)
+    try:
         # Initialize session
-        session = ECourtsScraper(db=db)
+        session = ECourtsScraper(db=db, prefetch=prefetch, ocr_backend=ocr_backend,
+                                 parser_backend=parser_backend)
         logging.info("Session setup successful")
         
-        # Statistics for reporting
-        stats = {
-            'total_attempted': 0,
-            'successful': 0,
-            'non_existent': 0,
-            'failed': 0,
-            'skipped': 0,
-            'start_time': time.time(),
-            'successful_cases': [],
-            'non_existent_cases': [],
-            'failed_cases': [],
-            'skipped_cases': []
-        }
-        
-        while True:  # Run indefinitely
+        cnr_iter = iter(frontier)
+        cnr_numbers = None
+        current_batch = 1
+        while True:  # Run until the frontier is exhausted
             try:
-                # Generate CNR numbers for this batch
-                cnr_numbers = get_test_cnr_numbers(current_batch, 10)
+                if stats.memory_exceeded:
+                    logging.warning("Memory limit reached; stopping after this batch")
+                    break
+                # Take the next CNR numbers from the frontier, unless a failed batch is being retried
+                if cnr_numbers is None:
+                    cnr_numbers = list(itertools.islice(cnr_iter, 10))
+                if not cnr_numbers:
+                    break
                 logging.info(f"\nStarting batch {current_batch} with {len(cnr_numbers)} cases")
                 logging.info("CNR numbers to process:")
                 for cnr in cnr_numbers:
                     logging.info(f"- {cnr}")
                 logging.info("")
                 
+                # Check which cases already exist in database
+                pending = set(pending_cnr_numbers(db, stats, cnr_numbers, index, frontier))
+                
                 # Process each CNR number
                 for i, cnr in enumerate(cnr_numbers, 1):
-                    stats['total_attempted'] += 1
-                    
-                    # Check if case already exists in database
-                    if db.case_exists(cnr):
-                        stats['skipped'] += 1
-                        stats['skipped_cases'].append(cnr)
-                        logging.info(f"Skipping case {i}/{len(cnr_numbers)}: {cnr} (already exists)")
+                    stats.attempted()
+                    if cnr not in pending:
                         continue
                     
                     logging.info(f"\nProcessing case {i}/{len(cnr_numbers)}: {cnr}")
@@ -116,49 +245,16 @@ def main():
                             if attempt < 3:
                                 time.sleep(1)  # Wait before retrying
                     
-                    if case_data:
-                        try:
-                            # Ensure required fields are present
-                            if not case_data.get('cnr_number'):
-                                case_data['cnr_number'] = cnr
-                            if not case_data.get('court_name'):
-                                case_data['court_name'] = "Kannur District Court"  # Default court name
-                            
-                            # Save case data to database
-                            case_id = db.insert_case(case_data)
-                            if case_id:
-                                stats['successful'] += 1
-                                stats['successful_cases'].append(cnr)
-                                logging.info(f"✓ Successfully scraped and saved case {cnr}")
-                                logging.info(f"Case Type: {case_data.get('case_type')}")
-                                logging.info(f"Filing Number: {case_data.get('filing_number')}")
-                                logging.info(f"Decision Date: {case_data.get('decision_date')}")
-                            else:
-                                stats['failed'] += 1
-                                stats['failed_cases'].append(cnr)
-                                logging.error(f"Failed to save case {cnr} to database")
-                        except Exception as e:
-                            stats['failed'] += 1
-                            stats['failed_cases'].append(cnr)
-                            logging.error(f"Error saving case {cnr} to database: {str(e)}")
-                    else:
-                        stats['non_existent'] += 1
-                        stats['non_existent_cases'].append(cnr)
-                        logging.info(f"Case {cnr} does not exist")
-                        logging.info(f"✓ Case {cnr} does not exist")
-                    
-                    # Update last case number in database
-                    db.update_last_case_number(cnr)
+                    # Update the checkpoint once the case is saved; a failed fetch stays in flight
+                    if record_case_result(writer, stats, cnr, case_data, index):
+                        writer.advance(cnr)
                     
                     # Log time taken
                     time_taken = time.time() - start_case_time
-                    logging.info(f"Time taken: {time_taken:.2f} seconds")
-                    
-                    # Wait between cases
-                    time.sleep(2)
+                    logging.info(f"Time taken: {time_taken:.2f} seconds ({session.last_request_stats})")
                 
                 # Print batch summary
-                runtime = time.time() - stats['start_time']
+                runtime = time.time() - stats.start_time
                 logging.info(f"\n=== Batch {current_batch} Summary ===")
                 logging.info(f"Runtime so far: {time.strftime('%H:%M:%S', time.gmtime(runtime))}")
                 logging.info(f"Cases in this batch: {len(cnr_numbers)}")
@@ -167,6 +263,7 @@ def main():
                 
                 # Increment batch number
                 current_batch += 1
+                cnr_numbers = None
                 
             except KeyboardInterrupt:
                 logging.info("\nScraping interrupted by user")
@@ -175,42 +272,330 @@ def main():
                 logging.error(f"Error processing batch: {str(e)}")
                 time.sleep(5)  # Wait before retrying
                 continue
+    finally:
+        writer.close()
+        if 'session' in locals():
+            session.cleanup()
+
+def run_discovery(db, stats, frontier, ranges, prefetch=False, ocr_backend=None, parser_backend=None,
+                  batch_size=None):
+    """Find the highest live serial of each establishment/year with galloping probes and record it"""
+    writer = make_case_writer(db, stats, batch_size)
+    session = ECourtsScraper(db=db, prefetch=prefetch, ocr_backend=ocr_backend, parser_backend=parser_backend)
+    
+    def probe(establishment, year, serial):
+        cnr = encode_cnr(establishment, serial, year)
+        stats.attempted()
+        if db.existing_cnrs([cnr]):
+            stats.record('skipped', cnr)
+            return True
+        case_data = None
+        for attempt in range(1, 4):  # Try up to 3 times
+            try:
+                case_data = session.get_case_details(cnr)
+                if case_data:
+                    break
+            except Exception as e:
+                logging.warning(f"Error probing {cnr} (attempt {attempt}): {str(e)}")
+        # Cases found while probing are kept like any other
+        record_case_result(writer, stats, cnr, case_data)
+        if not case_data:
+            return None
+        return case_data.get('exists', True)
+    
+    try:
+        for establishment, year in frontier.streams:
+            start = db.max_stored_serial(establishment, year)
+            logging.info(f"Discovering live range of {establishment}/{year} from serial {start}")
+            max_serial, probes = discover_max_serial(functools.partial(probe, establishment, year), start=start)
+            ranges.set(establishment, year, max_serial, probes)
+            ranges.save()
+            logging.info(f"Highest live serial of {establishment}/{year} is {max_serial} ({probes} serials probed)")
+    finally:
+        writer.close()
+        session.cleanup()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape eCourts cases continuously")
+    parser.add_argument(
+        '--concurrency', type=int, default=1,
+        help="Number of CNRs kept in flight; values above 1 use the asyncio scraper"
+    )
+    parser.add_argument(
+        '--prefetch', action='store_true',
+        help="Arm sessions with solved captchas in the background (sync scraper only)"
+    )
+    parser.add_argument(
+        '--ocr-backend', choices=sorted(OCR_BACKENDS), default=None,
+        help="Captcha OCR engine (defaults to OCR_BACKEND in config/settings.py)"
+    )
+    parser.add_argument(
+        '--parser', choices=PARSER_BACKENDS, default=None,
+        help="Case page parser (defaults to PARSER_BACKEND in config/settings.py)"
+    )
+    parser.add_argument(
+        '--batch-size', type=int, default=None,
+        help="Cases written to the database per transaction (defaults to DB_WRITER in config/settings.py)"
+    )
+    parser.add_argument(
+        '--establishment', nargs='+', default=None,
+        help="Establishment codes to crawl, e.g. KLKN01 (defaults to CRAWL in config/settings.py)"
+    )
+    parser.add_argument(
+        '--year', nargs='+', type=int, default=None,
+        help="Case years to crawl (defaults to CRAWL in config/settings.py)"
+    )
+    parser.add_argument(
+        '--shard', type=parse_shard, default=(0, 1),
+        help="Crawl only this INDEX/COUNT share of the serials, e.g. 0/4 to 3/4 on four workers"
+    )
+    parser.add_argument(
+        '--lease-worker', action='store_true',
+        help="Claim CNR ranges from the crawl_leases table until none are left, so several hosts can share the crawl"
+    )
+    parser.add_argument(
+        '--worker-id', default=f"{socket.gethostname()}-{os.getpid()}",
+        help="Name this worker's leases are held under (defaults to host-pid)"
+    )
+    parser.add_argument(
+        '--discover-range', action='store_true',
+        help="Probe for the highest live serial, record it in RANGE_DISCOVERY's ranges file and exit"
+    )
+    parser.add_argument(
+        '--existence-index', action='store_true', default=EXISTENCE_INDEX['enabled'],
+        help="Keep stored and known-missing CNRs in memory to skip them without a query (or set EXISTENCE_INDEX=true)"
+    )
+    parser.add_argument(
+        '--pipeline', action='store_true',
+        help="Fetch, parse and save in separate stages joined by bounded queues; "
+             "--concurrency sets the fetchers, --parse-workers the parser processes"
+    )
+    parser.add_argument(
+        '--parse-workers', type=int, default=None,
+        help="Parser processes for --pipeline (defaults to PIPELINE in config/settings.py)"
+    )
+    parser.add_argument(
+        '--workers', type=int, default=WORKERS['count'],
+        help="Crawl with this many processes, each on its own share of --shard (or set CRAWL_WORKERS)"
+    )
+    parser.add_argument(
+        '--metrics-port', type=int, default=METRICS['port'],
+        help="Serve Prometheus metrics on this port, 0 for none; with --workers, worker N serves on port + N "
+             "(or set METRICS_PORT)"
+    )
+    parser.add_argument(
+        '--trace', action='store_true', default=TRACING['enabled'],
+        help="Log a span for every HTTP call, OCR, parse and SQL statement of each CNR to TRACING's trace_dir "
+             "(or set TRACE_SPANS=true)"
+    )
+    parser.add_argument(
+        '--profile', type=int, default=0, metavar='CASES',
+        help="Run cProfile over the first CASES cases of every process and write the merged profile "
+             "to TRACING's profile_path"
+    )
+    return parser.parse_args()
+
+def log_name(args):
+    """Name of this worker's own outcome and trace logs"""
+    shard, shards = args.shard
+    return args.worker_id if args.lease_worker else f"shard-{shard}-of-{shards}"
+
+def new_stats(args=None):
+    """Statistics for reporting; with args, per-CNR outcomes go to this worker's own log"""
+    outcome_log = None
+    if args:
+        outcome_log = OutcomeLog(os.path.join(CRAWL_STATS['outcome_dir'], f"{log_name(args)}.log"))
+    return CrawlStats(outcome_log, watchdog=MemoryWatchdog())
+
+def profile_part(worker, generation):
+    """Where one --workers process writes its profile before the supervisor merges them"""
+    return f"{TRACING['profile_path']}.{worker}-{generation}"
+
+def crawl(args, stats, profile_path=None):
+    """Crawl the frontier args describe, updating stats; returns once it is exhausted or interrupted"""
+    index = None
+    leased_frontier = None
+    checkpointed_frontier = None
+    profiler = CaseProfiler(args.profile, profile_path) if args.profile else None
+    if args.trace:
+        start_tracing(log_name(args))
+    try:
+        # Initialize database
+        db = Database()
         
-        # Print final summary
-        runtime = time.time() - stats['start_time']
-        logging.info("\n=== Final Summary ===")
-        logging.info(f"Total runtime: {time.strftime('%H:%M:%S', time.gmtime(runtime))}")
-        logging.info(f"Total cases attempted: {stats['total_attempted']}")
-        logging.info(f"Successfully scraped: {stats['successful']}")
-        logging.info(f"Non-existent cases: {stats['non_existent']}")
-        logging.info(f"Failed cases: {stats['failed']}")
-        logging.info(f"Skipped cases: {stats['skipped']}")
-        logging.info(f"Success rate: {(stats['successful'] / stats['total_attempted']) * 100:.2f}%")
-        logging.info(f"Average time per case: {runtime / stats['total_attempted']:.2f} seconds")
+        if args.existence_index:
+            index = CnrExistenceIndex()
+            index.load_existing(db)
         
-        logging.info("\nSuccessful CNRs:")
-        for cnr in stats['successful_cases']:
-            logging.info(f"- {cnr}")
+        shard, shards = args.shard
+        frontier = CnrFrontier(args.establishment, args.year, shard=shard, shards=shards)
         
-        logging.info("\nNon-existent CNRs:")
-        for cnr in stats['non_existent_cases']:
-            logging.info(f"- {cnr}")
+        ranges = CnrRanges()
+        if args.discover_range:
+            run_discovery(db, stats, frontier, ranges, prefetch=args.prefetch, ocr_backend=args.ocr_backend,
+                          parser_backend=args.parser, batch_size=args.batch_size)
+            return
         
-        logging.info("\nFailed CNRs:")
-        for cnr in stats['failed_cases']:
-            logging.info(f"- {cnr}")
+        # Only crawl up to the end of each discovered live range
+        for establishment, year in frontier.streams:
+            end_number = ranges.crawl_limit(establishment, year)
+            if end_number is not None:
+                frontier.set_bounds(establishment, year, end=end_number)
+                logging.info(f"Crawling {establishment}/{year} up to serial {end_number}; "
+                             f"run with --discover-range to look further")
         
-        logging.info("\nSkipped CNRs:")
-        for cnr in stats['skipped_cases']:
-            logging.info(f"- {cnr}")
+        if args.lease_worker:
+            # Ranges come from leases shared with the other workers instead of a fixed shard
+            ends = {stream: frontier.bounds(*stream)[1] for stream in frontier.streams}
+            leases = db.open_leases(frontier.streams, ends)
+            frontier = leased_frontier = LeasedFrontier(leases, args.worker_id)
+            logging.info(f"Running as lease worker {args.worker_id}")
+        else:
+            # Each shard keeps its own checkpoint, so shards never resume from each other's progress
+            frontier = checkpointed_frontier = CheckpointedFrontier(frontier, db, f"shard {shard}/{shards}")
+            if not checkpointed_frontier.restore():
+                # Carry on from the cursor kept before per-shard checkpoints, if there is one
+                last_case_number = db.get_last_case_number() if shards == 1 else None
+                if last_case_number:
+                    checkpointed_frontier.frontier.resume_after(last_case_number)
+                    logging.info(f"Resuming after case number: {last_case_number}")
+                else:
+                    logging.info("No checkpoint found. Starting from the beginning")
         
-    except Exception as e:
-        logging.error(f"Error in main: {str(e)}")
+        if profiler:
+            profiler.start()
+        if args.pipeline:
+            try:
+                asyncio.run(run_pipeline(db, stats, frontier, args.concurrency, args.ocr_backend, args.parser,
+                                         args.batch_size, index, args.parse_workers))
+            except KeyboardInterrupt:
+                logging.info("\nScraping interrupted by user")
+        elif args.concurrency > 1:
+            try:
+                asyncio.run(run_async(db, stats, frontier, args.concurrency, args.ocr_backend, args.parser,
+                                      args.batch_size, index))
+            except KeyboardInterrupt:
+                logging.info("\nScraping interrupted by user")
+        else:
+            run_sync(db, stats, frontier, prefetch=args.prefetch, ocr_backend=args.ocr_backend,
+                     parser_backend=args.parser, batch_size=args.batch_size, index=index)
     finally:
-        if 'session' in locals():
-            session.close()
+        if profiler:
+            profiler.stop()
+        stop_tracing()
+        if leased_frontier:
+            leased_frontier.close()
+            leased_frontier.leases.close()
+        if checkpointed_frontier:
+            checkpointed_frontier.close()
+        if index:
+            index.save()
         if 'db' in locals():
             del db
 
+def run_worker(worker, workers, generation, reports, args):
+    """
+    Body of one --workers process: crawl shard `worker` of `workers` within
+    this run's own share, reporting stats to the supervisor.
+    """
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f'%(asctime)s - worker {worker} - %(levelname)s - %(message)s',
+        force=True  # a forked worker inherits the supervisor's handlers
+    )
+    shard, shards = args.shard
+    args.shard = (shard * workers + worker, shards * workers)
+    args.worker_id = f"{args.worker_id}-{worker}"
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port + worker)
+    stats = new_stats(args)
+    reporter = WorkerReporter(reports, worker, generation, stats.report)
+    reporter.start()
+    try:
+        crawl(args, stats, profile_part(worker, generation))
+    except KeyboardInterrupt:
+        logging.info("Worker interrupted")
+    finally:
+        stats.close()
+        reporter.final(stats.report(finished=True))
+    if stats.memory_exceeded:
+        sys.exit(RECYCLE_EXIT_CODE)
+
+def log_progress(start_time, reports):
+    stats = CrawlStats.from_reports(reports.values(), start_time)
+    runtime = time.time() - start_time
+    logging.info(f"Workers have attempted {stats['total_attempted']} cases in "
+                 f"{time.strftime('%H:%M:%S', time.gmtime(runtime))}: {stats['successful']} saved, "
+                 f"{stats['non_existent']} non-existent, {stats['failed']} failed, {stats['skipped']} skipped")
+    log_rates(stats)
+
+def run_workers(args):
+    """Crawl with args.workers processes, one shard each; returns the combined stats"""
+    start_time = time.time()
+    supervisor = WorkerSupervisor(run_worker, args.workers, args=(args,),
+                                  on_progress=functools.partial(log_progress, start_time))
+    reports = supervisor.run()
+    if args.profile:
+        merge_profiles([profile_part(*key) for key in sorted(reports)], TRACING['profile_path'])
+    return CrawlStats.from_reports(reports.values(), start_time)
+
+def log_rates(stats):
+    for window, rates in sorted(stats.rates().items()):
+        logging.info(f"Last {window // 60} min: " +
+                     ", ".join(f"{rate:.1f} {outcome.replace('_', '-')}/min" for outcome, rate in rates.items()))
+
+def log_summary(stats):
+    """Print final summary"""
+    runtime = time.time() - stats.start_time
+    logging.info("\n=== Final Summary ===")
+    logging.info(f"Total runtime: {time.strftime('%H:%M:%S', time.gmtime(runtime))}")
+    logging.info(f"Total cases attempted: {stats['total_attempted']}")
+    logging.info(f"Successfully scraped: {stats['successful']}")
+    logging.info(f"Non-existent cases: {stats['non_existent']}")
+    logging.info(f"Failed cases: {stats['failed']}")
+    logging.info(f"Skipped cases: {stats['skipped']}")
+    if stats['total_attempted']:
+        logging.info(f"Success rate: {(stats['successful'] / stats['total_attempted']) * 100:.2f}%")
+        logging.info(f"Average time per case: {runtime / stats['total_attempted']:.2f} seconds")
+    log_rates(stats)
+    if stats.latency.count:
+        logging.info(f"Fetch latency: p50 <= {stats.latency.percentile(50)}s, p90 <= {stats.latency.percentile(90)}s, "
+                     f"p99 <= {stats.latency.percentile(99)}s over {stats.latency.count} answered CNRs")
+    
+    # The CNRs themselves are not kept in memory; each outcome is in the logs
+    for outcome_log in stats.outcome_logs:
+        logging.info(f"Per-CNR outcomes: {outcome_log}")
+
+def main():
+    """Main function to run the scraper continuously"""
+    args = parse_args()
+    try:
+        # Configure logging
+        logging.basicConfig(
+            level=logging.INFO,
+            format='%(asctime)s - %(levelname)s - %(message)s'
+        )
+        
+        if args.workers > 1 and not args.discover_range:
+            stats = run_workers(args)
+        else:
+            start_metrics_server(args.metrics_port)
+            stats = new_stats(args)
+            try:
+                crawl(args, stats)
+            finally:
+                stats.close()
+            if args.discover_range:
+                return
+        
+        log_summary(stats)
+        if stats.memory_exceeded:
+            # Let the process manager start a fresh process; the checkpoint says where to carry on
+            logging.error("Stopped at the memory limit; exiting for a restart")
+            sys.exit(RECYCLE_EXIT_CODE)
+        
+    except Exception as e:
+        logging.error(f"Error in main: {str(e)}")
+
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -1,9 +1,14 @@
 #!/usr/bin/env python3
+import argparse
 import logging
 import time
+from contextlib import nullcontext
 from datetime import datetime
 from src.ecourts_scraper import ECourtsScraper
 from src.database import Database
+from src.case_records import CaseRecord
+from src.tracing import CaseProfiler, start_tracing, stop_tracing
+from config.settings import TRACING
 
 # Configure logging
 logging.basicConfig(
@@ -12,8 +17,22 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape a fixed list of eCourts cases")
+    parser.add_argument(
+        '--trace', action='store_true', default=TRACING['enabled'],
+        help="Log a span for every HTTP call, OCR, parse and SQL statement of each CNR to TRACING's trace_dir "
+             "(or set TRACE_SPANS=true)"
+    )
+    parser.add_argument(
+        '--profile', type=int, default=0, metavar='CASES',
+        help="Run cProfile over the first CASES cases and write the profile to TRACING's profile_path"
+    )
+    return parser.parse_args()
+
 def main():
     """Main function to run the scraper"""
+    args = parse_args()
     # List of CNR numbers to scrape
     cnr_numbers = [
         'KLKN220000012019',  # RCP case
@@ -47,9 +66,12 @@ def main():
     print("\n=== Starting Scraper ===")
     print(f"Start time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
+    if args.trace:
+        start_tracing('run_scraper')
+    profiler = CaseProfiler(args.profile) if args.profile else nullcontext()
+    
     # Run scraper
-    with ECourtsScraper(db=db) as scraper:
-        results = []
+    with ECourtsScraper(db=db) as scraper, profiler:
         for idx, cnr in enumerate(cnr_numbers, 1):
             case_start = time.time()
             print(f"\nProcessing case {idx}/{total_cases}: {cnr}")
@@ -58,11 +80,13 @@ def main():
                 case_details = scraper.get_case_details(cnr)
                 if case_details:
                     successful_cases += 1
-                    results.append(case_details)
                     if db.insert_case(case_details):
                         print(f"✓ Successfully scraped and saved to database")
                     else:
                         print(f"✗ Scraped but failed to save to database")
+                    # Print the case now instead of keeping every result until the end
+                    for line in CaseRecord.from_dict(case_details).summary():
+                        print(line)
                 else:
                     failed_cases += 1
                     print(f"✗ Failed to scrape case details")
@@ -85,15 +109,7 @@ def main():
         print(f"Total time: {total_time:.2f} seconds")
         print(f"Average time per case: {avg_time:.2f} seconds")
         print(f"Success rate: {successful_cases}/{total_cases} ({(successful_cases/total_cases)*100:.1f}%)")
-        
-        print("\n=== Case Details ===")
-        for result in results:
-            print(f"\nCNR: {result['cnr_number']}")
-            print(f"Case Type: {result.get('case_type', 'N/A')}")
-            print(f"Filing Number: {result.get('filing_number', 'N/A')}")
-            print(f"Decision Date: {result.get('decision_date', 'N/A')}")
-            print(f"Nature of Disposal: {result.get('nature_of_disposal', 'N/A')}")
-            print("-" * 50)
+    stop_tracing()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
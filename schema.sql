@@ -96,7 +96,8 @@ CREATE TABLE IF NOT EXISTS cases (
     created_at TIMESTAMP NULL DEFAULT NULL,
     updated_at TIMESTAMP NULL DEFAULT NULL,
     FOREIGN KEY (case_type_id) REFERENCES case_types(case_type_id),
-    FOREIGN KEY (court_hall_id) REFERENCES court_halls(id)
+    FOREIGN KEY (court_hall_id) REFERENCES court_halls(id),
+    UNIQUE KEY unique_cnr_number (cnr_number)
 );
 
 -- Create case_litigants table
@@ -229,4 +230,30 @@ CREATE TABLE IF NOT EXISTS judgements (
     order_date DATE,
     pdf_filename VARCHAR(255),
     FOREIGN KEY (case_id) REFERENCES cases(case_id) ON DELETE CASCADE
-);
\ No newline at end of file
+);
+
+-- Create crawl_leases table: CNR ranges handed out to crawl workers; the same
+-- statement as CrawlLeases.CREATE_TABLE, which test_leases.py keeps in step
+CREATE TABLE IF NOT EXISTS crawl_leases (
+    establishment VARCHAR(6) NOT NULL,
+    year INT NOT NULL,
+    first_serial INT NOT NULL,
+    last_serial INT NOT NULL,
+    next_serial INT NOT NULL,
+    status VARCHAR(10) NOT NULL,
+    worker_id VARCHAR(100),
+    version INT NOT NULL DEFAULT 0,
+    claimed_at DOUBLE,
+    heartbeat_at DOUBLE,
+    expires_at DOUBLE,
+    completed_at DOUBLE,
+    PRIMARY KEY (establishment, year, first_serial)
+);
+
+-- Create crawl_checkpoints table: one row of progress per crawl worker or shard
+CREATE TABLE IF NOT EXISTS crawl_checkpoints (
+    worker_key VARCHAR(100) NOT NULL PRIMARY KEY,
+    high_water VARCHAR(16),
+    in_flight TEXT,
+    updated_at TIMESTAMP NULL DEFAULT NULL
+);
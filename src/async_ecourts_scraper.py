@@ -0,0 +1,332 @@
+import asyncio
+import json
+import logging
+import time
+from urllib.parse import urlencode, urljoin, urlsplit
+
+import aiohttp
+
+from config.settings import ASYNC_SCRAPER
+from src.captcha_corpus import CaptchaCorpus
+from src.captcha_ocr import get_ocr_backend
+from src.captcha_solver import CaptchaSolver, harvest_captcha
+from src.case_parser import get_parser_backend
+from src.ecourts_scraper import ECourtsScraper, RequestStats
+from src.metrics import CAPTCHA_ANSWERS, HTTP_BYTES, HTTP_RESPONSES, RETRIES, STAGE_SECONDS
+from src.rate_limiter import RateLimiter
+from src.response_archive import ResponseArchive
+from src.tracing import set_attempt, span, trace_case
+
+
+class AsyncSession:
+    """One logical eCourts session with its own cookie jar, app token and captcha state"""
+
+    def __init__(self, session_id, base_url, timeout, rate_limiter):
+        self.session_id = session_id
+        self.base_url = base_url
+        self.rate_limiter = rate_limiter
+        self.app_token = None
+        self.captcha_text = None
+        self.captcha_image = None
+        self.request_stats = RequestStats()
+        self.http = aiohttp.ClientSession(
+            cookie_jar=aiohttp.CookieJar(),
+            timeout=timeout,
+            headers={
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+                'Accept': 'application/json, text/javascript, */*; q=0.01',
+                'Accept-Language': 'en-US,en;q=0.9',
+                'X-Requested-With': 'XMLHttpRequest',
+                'Connection': 'keep-alive',
+                'Referer': base_url
+            }
+        )
+
+    def reset(self):
+        """Forget the token and captcha so the next attempt starts from the homepage"""
+        self.app_token = None
+        self.captcha_text = None
+
+    async def request(self, method, url, **kwargs):
+        """Send one request, charging it to request_stats; returns (status, content_type, body)"""
+        parts = urlsplit(url)
+        with span('http', method=method, url=parts.path + (f"?{parts.query}" if parts.query else '')) as attributes:
+            await self.rate_limiter.acquire_async()
+            started = time.monotonic()
+            try:
+                async with self.http.request(method, url, **kwargs) as response:
+                    body = await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                await self.rate_limiter.record_async(None)
+                raise
+            await self.rate_limiter.record_async(response.status, time.monotonic() - started)
+            attributes['status'] = response.status
+            attributes['bytes'] = len(body)
+        data = kwargs.get('data')
+        bytes_sent = len(urlencode(data)) if data else 0
+        self.request_stats.record(bytes_sent, len(body))
+        HTTP_RESPONSES.inc(status=response.status)
+        HTTP_BYTES.inc(bytes_sent, direction='sent')
+        HTTP_BYTES.inc(len(body), direction='received')
+        return response.status, response.content_type, body
+
+    async def close(self):
+        await self.http.close()
+
+
+class AsyncECourtsScraper:
+    """
+    Asyncio counterpart of ECourtsScraper.
+
+    Keeps a pool of independent sessions and runs one CNR per session at a time,
+    so up to `concurrency` CNRs are in flight from a single process.
+    """
+
+    # Parsing and captcha OCR are CPU-only and shared with the sync scraper
+    _extract_app_token = ECourtsScraper._extract_app_token
+    _parse_case_details = ECourtsScraper._parse_case_details
+    _parse_case_details_soup = ECourtsScraper._parse_case_details_soup
+    _extract_ia_details = ECourtsScraper._extract_ia_details
+    _extract_acts_and_sections = ECourtsScraper._extract_acts_and_sections
+    _solve_captcha = ECourtsScraper._solve_captcha
+
+    def __init__(self, concurrency=None, rate_limiter=None, ocr_backend=None, parser_backend=None):
+        """Initialize scraper; sessions are opened lazily by open() or `async with`"""
+        self.base_url = "https://services.ecourts.gov.in/ecourtindia_v6/"
+        self.concurrency = concurrency or ASYNC_SCRAPER['concurrency']
+        self.ocr = get_ocr_backend(ocr_backend)
+        self.parser_backend = get_parser_backend(parser_backend)
+        self.captcha_solver = CaptchaSolver.load()
+        self.captcha_corpus = CaptchaCorpus()
+        self.response_archive = ResponseArchive()
+        # Every session draws from the same host-wide budget
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.timeout = aiohttp.ClientTimeout(
+            sock_connect=ASYNC_SCRAPER['connect_timeout'],
+            sock_read=ASYNC_SCRAPER['read_timeout']
+        )
+        self.sessions = []
+        self._idle_sessions = None
+
+    async def open(self):
+        """Create the pool of logical sessions"""
+        self._idle_sessions = asyncio.Queue()
+        for session_id in range(self.concurrency):
+            session = AsyncSession(session_id, self.base_url, self.timeout, self.rate_limiter)
+            self.sessions.append(session)
+            self._idle_sessions.put_nowait(session)
+        logging.info(f"Opened {self.concurrency} async eCourts sessions")
+
+    async def close(self):
+        """Close every logical session"""
+        for session in self.sessions:
+            await session.close()
+        self.sessions = []
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def _get_app_token_and_captcha(self, session):
+        """Fetch and OCR a captcha, visiting the homepage first only if the session holds no token"""
+        if not session.app_token:
+            with STAGE_SECONDS.time(stage='homepage'):
+                _, _, page = await session.request('GET', self.base_url)
+            session.app_token = self._extract_app_token(page.decode('utf-8', errors='replace'))
+            if not session.app_token:
+                logging.error(f"[session {session.session_id}] Could not find app token in page")
+                return False
+
+        captcha_url = urljoin(self.base_url, "vendor/securimage/securimage_show.php")
+        with STAGE_SECONDS.time(stage='captcha_fetch'):
+            status, content_type, image_bytes = await session.request(
+                'POST',
+                captcha_url,
+                headers={
+                    'Referer': self.base_url,
+                    'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
+                    'Sec-Fetch-Site': 'same-origin',
+                    'Sec-Fetch-Mode': 'no-cors',
+                    'Sec-Fetch-Dest': 'image',
+                }
+            )
+        if status != 200 or not content_type.startswith('image/'):
+            logging.error(f"[session {session.session_id}] Failed to get CAPTCHA image: HTTP {status}")
+            return False
+
+        # OCR releases the GIL (subprocess or C API), so a thread keeps the event loop free;
+        # to_thread also carries the CNR over, so the OCR span is charged to it
+        session.captcha_image = image_bytes
+        session.captcha_text = await asyncio.to_thread(self._solve_captcha, image_bytes)
+        return bool(session.captcha_text)
+
+    async def _search_by_cnr(self, session, cnr):
+        """POST the searchByCNR form and return the decoded JSON body"""
+        data = {
+            'cino': cnr,
+            'fcaptcha_code': session.captcha_text,
+            'ajax_req': 'true',
+            'app_token': session.app_token
+        }
+        with STAGE_SECONDS.time(stage='search'):
+            status, _, body = await session.request(
+                'POST',
+                f"{self.base_url}?p=cnr_status/searchByCNR",
+                data=data,
+                headers={
+                    'Content-Type': 'application/x-www-form-urlencoded',
+                    'Origin': 'https://services.ecourts.gov.in',
+                    'Referer': self.base_url + '?p=cnr_status/searchByCNR',
+                    'Sec-Fetch-Site': 'same-origin',
+                    'Sec-Fetch-Mode': 'cors',
+                    'Sec-Fetch-Dest': 'empty'
+                }
+            )
+        # Any answer uses up the captcha; the token is replaced by the one in the response
+        captcha_text, captcha_image = session.captcha_text, session.captcha_image
+        session.captcha_text = None
+        session.captcha_image = None
+        session.app_token = None
+        if status != 200:
+            logging.error(f"[session {session.session_id}] HTTP {status} for CNR {cnr}")
+            return None
+        # The portal answers with JSON but does not always label it as such
+        result = json.loads(body)
+        session.app_token = result.get('app_token')
+        if 'errormsg' in result:
+            self.captcha_corpus.add(captcha_image, captcha_text, False, result['errormsg'])
+            CAPTCHA_ANSWERS.inc(result='rejected')
+        else:
+            # The server accepted the captcha, so its answer is a trustworthy label
+            CAPTCHA_ANSWERS.inc(result='accepted')
+            harvest_captcha(captcha_image, captcha_text)
+            self.captcha_corpus.add(captcha_image, captcha_text, True)
+        return result
+
+    async def _fetch_with_session(self, session, cnr, max_attempts, parse=True):
+        session.request_stats = RequestStats()
+        try:
+            with trace_case(cnr):
+                return await self._fetch_attempts(session, cnr, max_attempts, parse)
+        finally:
+            logging.info(f"CNR {cnr} cost {session.request_stats}")
+
+    async def _fetch_attempts(self, session, cnr, max_attempts, parse=True):
+        for attempt in range(max_attempts):
+            try:
+                logging.info(f"[session {session.session_id}] Attempt {attempt + 1}/{max_attempts} for CNR {cnr}")
+                if attempt:
+                    RETRIES.inc()
+                set_attempt(attempt + 1)
+
+                if not await self._get_app_token_and_captcha(session):
+                    logging.warning(f"[session {session.session_id}] Failed to prepare token and CAPTCHA on attempt {attempt + 1}")
+                    continue
+
+                result = await self._search_by_cnr(session, cnr)
+                if result is None:
+                    continue
+
+                if 'errormsg' in result:
+                    logging.warning(f"[session {session.session_id}] Error in response (attempt {attempt + 1}): {result['errormsg']}")
+                    continue
+
+                html_content = result.get('casetype_list', '')
+                # Compressing and writing the page, and parsing it below, would hold up every other session
+                await asyncio.to_thread(self.response_archive.put, cnr, html_content)
+                if 'This Case Code does not exists' in html_content:
+                    logging.info(f"Case {cnr} does not exist")
+                    return {'cnr_number': cnr, 'exists': False, 'request_stats': session.request_stats.as_dict()}
+
+                if not parse:
+                    return {'cnr_number': cnr, 'exists': True, 'page': html_content,
+                            'request_stats': session.request_stats.as_dict()}
+
+                case_details = await asyncio.to_thread(self._parse_case_details, html_content)
+                if case_details:
+                    case_details['exists'] = True
+                    case_details['request_stats'] = session.request_stats.as_dict()
+                    logging.info(f"Successfully fetched data for CNR {cnr} on attempt {attempt + 1}")
+                    return case_details
+                logging.warning(f"Failed to parse case details from response on attempt {attempt + 1}")
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logging.error(f"[session {session.session_id}] Request error on attempt {attempt + 1}: {str(e)}")
+                session.reset()
+            except json.JSONDecodeError as e:
+                logging.error(f"[session {session.session_id}] Invalid JSON response on attempt {attempt + 1}: {str(e)}")
+                session.reset()
+            except Exception as e:
+                logging.error(f"[session {session.session_id}] Unexpected error on attempt {attempt + 1}: {str(e)}")
+                session.reset()
+
+        logging.error(f"Failed to fetch case details for {cnr} after {max_attempts} attempts")
+        return None
+
+    async def get_case_details(self, cnr, max_attempts=3):
+        """Get case details for one CNR on the next idle session"""
+        session = await self._idle_sessions.get()
+        try:
+            return await self._fetch_with_session(session, cnr, max_attempts)
+        finally:
+            self._idle_sessions.put_nowait(session)
+
+    async def fetch_case_page(self, cnr, max_attempts=3):
+        """
+        Like get_case_details, but leave parsing to the caller: an existing
+        case comes back as {'cnr_number', 'exists': True, 'page', 'request_stats'}
+        with the raw case page HTML under 'page'.
+        """
+        session = await self._idle_sessions.get()
+        try:
+            return await self._fetch_with_session(session, cnr, max_attempts, parse=False)
+        finally:
+            self._idle_sessions.put_nowait(session)
+
+    async def iter_case_details(self, cnr_numbers, max_attempts=3):
+        """
+        Scrape CNRs concurrently and yield (cnr, case_details) as each one finishes.
+
+        `cnr_numbers` may be any iterable or async iterable, including an endless
+        generator; it is consumed lazily so that at most `concurrency` CNRs are
+        in flight at once. An async iterable lets a source that blocks, such as
+        one querying the database, do so off the event loop.
+        case_details follows get_case_details: a dict, or None on failure.
+        """
+        if hasattr(cnr_numbers, '__aiter__'):
+            cnr_iter = aiter(cnr_numbers)
+
+            async def next_cnr():
+                return await anext(cnr_iter, None)
+        else:
+            cnr_iter = iter(cnr_numbers)
+
+            async def next_cnr():
+                return next(cnr_iter, None)
+        in_flight = {}
+
+        async def schedule_next():
+            cnr = await next_cnr()
+            if cnr is None:
+                return False
+            task = asyncio.ensure_future(self.get_case_details(cnr, max_attempts))
+            in_flight[task] = cnr
+            return True
+
+        for _ in range(self.concurrency):
+            if not await schedule_next():
+                break
+
+        try:
+            while in_flight:
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    cnr = in_flight.pop(task)
+                    await schedule_next()
+                    yield cnr, task.result()
+        finally:
+            for task in in_flight:
+                task.cancel()
@@ -13,14 +13,15 @@ from config.settings import (
     USER_AGENTS,
     REQUEST_TIMEOUT,
     RETRY_TIMES,
-    RATE_LIMIT,
     PROXY_ENABLED,
     PROXY_API_KEY
 )
+from src.rate_limiter import RateLimiter
 
 class BaseScraper:
     def __init__(self):
         self.session = requests.Session()
+        self.rate_limiter = RateLimiter()
         self.user_agent = UserAgent()
         self.setup_logging()
 
@@ -69,7 +70,7 @@ class BaseScraper:
         for attempt in range(RETRY_TIMES):
             try:
                 # Apply rate limiting
-                time.sleep(RATE_LIMIT['min_time_between_requests'])
+                self.rate_limiter.acquire()
                 
                 # Prepare request
                 kwargs['headers'] = kwargs.get('headers', self.get_headers())
@@ -77,7 +78,12 @@ class BaseScraper:
                 kwargs['timeout'] = kwargs.get('timeout', REQUEST_TIMEOUT)
                 
                 # Make request
-                response = self.session.request(method, url, **kwargs)
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                except RequestException:
+                    self.rate_limiter.record(None)
+                    raise
+                self.rate_limiter.record(response.status_code, response.elapsed.total_seconds())
                 response.raise_for_status()
                 return response
                 
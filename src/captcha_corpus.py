@@ -0,0 +1,84 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from config.settings import CAPTCHA_CORPUS
+
+
+class CaptchaCorpus:
+    """
+    Opt-in, content-addressed store of every captcha the scrapers answer.
+
+    Images are written once under images/<aa>/<sha1>.png and each answer is
+    appended to an index as {sha1, guess, accepted, error, captured_at}, so the
+    corpus records what was guessed and what searchByCNR made of the guess.
+    Appends are single short writes, which keeps the index safe to share
+    between worker processes.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory if directory is not None else CAPTCHA_CORPUS['dir']
+        self.index_path = os.path.join(self.directory, CAPTCHA_CORPUS['index_file']) if self.directory else None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.directory)
+
+    def image_path(self, digest):
+        return os.path.join(self.directory, 'images', digest[:2], f"{digest}.png")
+
+    def add(self, image_bytes, guess, accepted, error=None):
+        """Store a captcha and the server's verdict on our guess"""
+        if not self.enabled or not image_bytes:
+            return None
+        digest = hashlib.sha1(image_bytes).hexdigest()
+        try:
+            path = self.image_path(digest)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.write(image_bytes)
+            entry = {
+                'sha1': digest,
+                'guess': guess,
+                'accepted': accepted,
+                'error': error,
+                'captured_at': time.time()
+            }
+            with self._lock, open(self.index_path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+            return digest
+        except OSError as e:
+            logging.error(f"Failed to capture captcha: {str(e)}")
+            return None
+
+    def entries(self):
+        """Return the latest index entry per captcha, in first-seen order"""
+        entries = {}
+        if not self.enabled or not os.path.exists(self.index_path):
+            return []
+        with open(self.index_path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # a line torn by a crash mid-write
+                previous = entries.get(entry['sha1'])
+                # Once any guess was accepted the captcha's label is known; keep it
+                if previous and previous['accepted'] and not entry['accepted']:
+                    continue
+                entries[entry['sha1']] = entry
+        return list(entries.values())
+
+    def samples(self):
+        """Yield (image_bytes, entry) for every captcha in the corpus"""
+        for entry in self.entries():
+            try:
+                with open(self.image_path(entry['sha1']), 'rb') as f:
+                    yield f.read(), entry
+            except OSError:
+                logging.warning(f"Captcha image {entry['sha1']} missing from corpus")
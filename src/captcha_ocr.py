@@ -0,0 +1,124 @@
+import logging
+import threading
+
+import pytesseract
+from PIL import ImageEnhance
+
+from config.settings import OCR_BACKEND
+
+try:
+    import tesserocr
+except ImportError:  # optional: only needed for the resident tesserocr backend
+    tesserocr = None
+
+CAPTCHA_CHARSET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+
+
+class OCRBackend:
+    """Interface for captcha OCR engines used by the scrapers"""
+
+    name = None
+
+    def image_to_string(self, img, psm):
+        """OCR a preprocessed PIL image with the given page segmentation mode"""
+        raise NotImplementedError
+
+    def close(self):
+        """Release engine resources"""
+        pass
+
+
+class PytesseractBackend(OCRBackend):
+    """Runs the tesseract binary once per call through pytesseract"""
+
+    name = 'pytesseract'
+
+    def image_to_string(self, img, psm):
+        config = f'--oem 3 --psm {psm} -c tessedit_char_whitelist={CAPTCHA_CHARSET}'
+        return pytesseract.image_to_string(img, config=config).strip()
+
+
+class TesserocrBackend(OCRBackend):
+    """
+    Keeps Tesseract resident in-process through the tesserocr C-API binding.
+
+    The language model is loaded once per thread instead of once per call, and no
+    process is spawned nor temp file written. TessBaseAPI is not thread-safe, so
+    each thread (OCR executor, prefetch producer) gets its own handle.
+    """
+
+    name = 'tesserocr'
+
+    def __init__(self):
+        if tesserocr is None:
+            raise ImportError("tesserocr is not installed; pip install tesserocr or use OCR_BACKEND=pytesseract")
+        self._local = threading.local()
+        self._apis = []
+        self._apis_lock = threading.Lock()
+
+    def _api(self):
+        api = getattr(self._local, 'api', None)
+        if api is None:
+            api = tesserocr.PyTessBaseAPI(oem=tesserocr.OEM.DEFAULT)
+            api.SetVariable('tessedit_char_whitelist', CAPTCHA_CHARSET)
+            self._local.api = api
+            with self._apis_lock:
+                self._apis.append(api)
+        return api
+
+    def image_to_string(self, img, psm):
+        api = self._api()
+        api.SetPageSegMode(psm)
+        api.SetImage(img)
+        return api.GetUTF8Text().strip()
+
+    def close(self):
+        with self._apis_lock:
+            for api in self._apis:
+                api.End()
+            self._apis = []
+        self._local = threading.local()
+
+
+OCR_BACKENDS = {
+    PytesseractBackend.name: PytesseractBackend,
+    TesserocrBackend.name: TesserocrBackend,
+}
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_ocr_backend(name=None):
+    """Return the process-wide instance of the named backend (OCR_BACKEND by default)"""
+    name = name or OCR_BACKEND
+    if name not in OCR_BACKENDS:
+        raise ValueError(f"Unknown OCR backend '{name}'; choose from {', '.join(OCR_BACKENDS)}")
+    with _instances_lock:
+        if name not in _instances:
+            _instances[name] = OCR_BACKENDS[name]()
+            logging.info(f"Loaded {name} OCR backend")
+        return _instances[name]
+
+
+def preprocess_captcha(img, contrast=2.0, brightness=1.5, threshold=128):
+    """Grayscale, enhance and binarise a captcha image for OCR"""
+    img = img.convert('L')
+    if contrast:
+        img = ImageEnhance.Contrast(img).enhance(contrast)
+    if brightness:
+        img = ImageEnhance.Brightness(img).enhance(brightness)
+    return img.point(lambda x: 255 if x > threshold else 0)
+
+
+def ocr_captcha(ocr, img, psm_modes=(7, 8, 13), min_length=4):
+    """
+    OCR a preprocessed captcha, trying each PSM mode in turn.
+
+    Returns (text, psm) for the first plausible answer, or (None, None).
+    """
+    for psm in psm_modes:
+        captcha_text = ocr.image_to_string(img, psm)
+        if captcha_text and len(captcha_text) >= min_length:  # Most CAPTCHAs are at least 4 chars
+            return captcha_text, psm
+    return None, None
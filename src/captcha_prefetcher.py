@@ -0,0 +1,155 @@
+import logging
+import queue
+import threading
+import time
+
+from config.settings import CAPTCHA_PREFETCH
+from src.metrics import QUEUE_DEPTH
+
+
+class ArmedSession:
+    """A requests session holding cookies, an app token and a solved captcha"""
+
+    def __init__(self, session, app_token, captcha_text):
+        self.session = session
+        self.app_token = app_token
+        self.captcha_text = captcha_text
+        self.captcha_image = None
+        self.armed_at = time.monotonic()
+
+    def is_fresh(self, ttl):
+        return time.monotonic() - self.armed_at < ttl
+
+
+class CaptchaPrefetcher:
+    """
+    Background producer of armed sessions for ECourtsScraper.
+
+    Producer threads keep a bounded pool of sessions that already hold an app token
+    and an OCR'd captcha, so a worker can go straight to the searchByCNR POST while
+    the captcha for its next CNR is fetched and solved in the background.
+    """
+
+    def __init__(self, scraper, pool_size=None, producers=None, ttl=None):
+        self.scraper = scraper
+        self.pool_size = pool_size or CAPTCHA_PREFETCH['pool_size']
+        self.producers = producers or CAPTCHA_PREFETCH['producers']
+        self.ttl = ttl or CAPTCHA_PREFETCH['ttl']
+        self._pool = queue.Queue(maxsize=self.pool_size)
+        # Used sessions that came back with a token only need a new captcha
+        self._returned = queue.Queue()
+        self._stop = threading.Event()
+        self._threads = []
+        QUEUE_DEPTH.set_function(self._pool.qsize, queue='captcha_pool')
+
+    def start(self):
+        """Start the producer threads"""
+        self._stop.clear()
+        for i in range(self.producers):
+            thread = threading.Thread(target=self._produce, name=f"captcha-prefetch-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logging.info(f"Captcha prefetcher started with {self.producers} producers, pool size {self.pool_size}")
+
+    def stop(self):
+        """Stop the producers and close every pooled session"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+        for pending in (self._pool, self._returned):
+            while True:
+                try:
+                    pending.get_nowait().session.close()
+                except queue.Empty:
+                    break
+
+    def take(self, timeout=None):
+        """Return a fresh armed session, or None if none becomes ready within timeout"""
+        timeout = CAPTCHA_PREFETCH['take_timeout'] if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                armed = self._pool.get(timeout=remaining)
+            except queue.Empty:
+                logging.warning("No armed session ready; falling back to arming inline")
+                return None
+            if armed.is_fresh(self.ttl):
+                return armed
+            logging.debug("Discarding stale armed session")
+            armed.session.close()
+
+    def recycle(self, armed):
+        """Give a used session back; it is re-armed if it still holds an app token"""
+        if armed.app_token and not self._stop.is_set():
+            self._returned.put(armed)
+        else:
+            armed.session.close()
+
+    def _produce(self):
+        while not self._stop.is_set():
+            try:
+                armed = self._returned.get_nowait()
+            except queue.Empty:
+                armed = None
+
+            armed = self._arm(armed)
+            if not armed:
+                # Back off briefly so a failing portal is not hammered
+                self._stop.wait(2)
+                continue
+
+            # Blocks while the pool is full, which bounds how far ahead we arm
+            while not self._stop.is_set():
+                try:
+                    self._pool.put(armed, timeout=1)
+                    break
+                except queue.Full:
+                    continue
+            else:
+                armed.session.close()
+
+    def _arm(self, armed=None):
+        """Arm a returned session with a new captcha, or a brand new session from the homepage"""
+        scraper = self.scraper
+        try:
+            if armed is None:
+                session = scraper._build_session()
+                scraper.setup_session(session)
+                response = session.get(scraper.base_url, timeout=(15, 30))
+                app_token = scraper._extract_app_token(response.text)
+                if not app_token:
+                    logging.error("Prefetch: could not find app token in page")
+                    session.close()
+                    return None
+                armed = ArmedSession(session, app_token, None)
+
+            # An OCR miss leaves the token good, so the next captcha is fetched on
+            # the same session at once; HTTP and token failures back off, and so
+            # does an OCR that keeps missing
+            for _ in range(CAPTCHA_PREFETCH['max_ocr_misses']):
+                if self._stop.is_set():
+                    break
+                captcha_response = scraper._fetch_captcha_image(armed.session)
+                if captcha_response.status_code != 200 or not captcha_response.headers.get('content-type', '').startswith('image/'):
+                    logging.error(f"Prefetch: failed to get CAPTCHA image: HTTP {captcha_response.status_code}")
+                    armed.session.close()
+                    return None
+
+                armed.captcha_image = captcha_response.content
+                armed.captcha_text = scraper._solve_captcha(captcha_response.content)
+                if armed.captcha_text:
+                    armed.armed_at = time.monotonic()
+                    return armed
+            else:
+                logging.warning(f"Prefetch: could not read {CAPTCHA_PREFETCH['max_ocr_misses']} captchas in a row")
+            armed.session.close()
+            return None
+        except Exception as e:
+            logging.error(f"Prefetch: failed to arm session: {str(e)}")
+            if armed:
+                armed.session.close()
+            return None
@@ -0,0 +1,195 @@
+import glob
+import hashlib
+import io
+import logging
+import os
+
+import numpy as np
+from PIL import Image
+
+from config.settings import CAPTCHA_SOLVER
+
+GLYPH_SIZE = 16  # glyphs are normalised to GLYPH_SIZE x GLYPH_SIZE before matching
+
+
+def harvest_captcha(image_bytes, text, directory=None):
+    """
+    Keep a captcha the server accepted as a labelled training sample.
+
+    Files are named <text>_<sha1 prefix>.png, so the label travels with the image
+    and the same captcha is never stored twice. Disabled when no directory is set.
+    """
+    directory = directory or CAPTCHA_SOLVER['harvest_dir']
+    if not directory or not image_bytes or not text:
+        return None
+    try:
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha1(image_bytes).hexdigest()[:12]
+        path = os.path.join(directory, f"{text}_{digest}.png")
+        if not os.path.exists(path):
+            with open(path, 'wb') as f:
+                f.write(image_bytes)
+        return path
+    except OSError as e:
+        logging.error(f"Failed to harvest captcha: {str(e)}")
+        return None
+
+
+class CaptchaSolver:
+    """
+    Lightweight solver for the eCourts securimage captchas.
+
+    The captchas use one font at one size on a plain background, so characters can
+    be cut apart with vectorised thresholding and column projections, normalised to
+    small glyphs and classified by k-nearest-neighbour cosine similarity against
+    glyphs cut from captchas the server accepted.
+    """
+
+    def __init__(self, features=None, labels=None, k=None, threshold=None):
+        self.features = features if features is not None else np.zeros((0, GLYPH_SIZE * GLYPH_SIZE), dtype=np.float32)
+        self.labels = labels if labels is not None else np.array([], dtype='<U1')
+        self.k = k or CAPTCHA_SOLVER['k']
+        self.threshold = threshold or CAPTCHA_SOLVER['threshold']
+
+    @property
+    def is_trained(self):
+        return len(self.labels) > 0
+
+    @classmethod
+    def load(cls, model_path=None):
+        """Load a model written by save(); returns None if there is no model file"""
+        model_path = model_path or CAPTCHA_SOLVER['model_path']
+        if not os.path.exists(model_path):
+            return None
+        with np.load(model_path) as model:
+            solver = cls(model['features'], model['labels'], k=int(model['k']), threshold=int(model['threshold']))
+        logging.info(f"Loaded captcha solver with {len(solver.labels)} glyphs from {model_path}")
+        return solver
+
+    def save(self, model_path=None):
+        model_path = model_path or CAPTCHA_SOLVER['model_path']
+        model_dir = os.path.dirname(model_path)
+        if model_dir:
+            os.makedirs(model_dir, exist_ok=True)
+        np.savez_compressed(model_path, features=self.features, labels=self.labels, k=self.k, threshold=self.threshold)
+
+    def _binarize(self, image_bytes):
+        pixels = np.asarray(Image.open(io.BytesIO(image_bytes)).convert('L'))
+        return pixels < self.threshold
+
+    def segment(self, image_bytes):
+        """Cut a captcha into per-character boolean glyph arrays, left to right"""
+        ink = self._binarize(image_bytes)
+        columns = ink.sum(axis=0)
+
+        # Runs of columns that contain ink are candidate characters
+        has_ink = np.concatenate(([False], columns > 0, [False]))
+        edges = np.flatnonzero(has_ink[1:] != has_ink[:-1])
+        spans = [(start, end) for start, end in zip(edges[::2], edges[1::2])]
+
+        # Drop specks of noise that are too thin or too light to be a character
+        min_pixels = CAPTCHA_SOLVER['min_glyph_pixels']
+        spans = [(start, end) for start, end in spans if end - start > 1 and columns[start:end].sum() >= min_pixels]
+        if not spans:
+            return []
+
+        # Touching characters show up as one wide run; split it evenly
+        widths = np.array([end - start for start, end in spans])
+        typical = np.median(widths)
+        split_spans = []
+        for (start, end), width in zip(spans, widths):
+            parts = max(1, int(round(width / typical))) if width > 1.6 * typical else 1
+            bounds = np.linspace(start, end, parts + 1).astype(int)
+            split_spans.extend(zip(bounds[:-1], bounds[1:]))
+
+        glyphs = []
+        for start, end in split_spans:
+            glyph = ink[:, start:end]
+            rows = np.flatnonzero(glyph.any(axis=1))
+            glyphs.append(glyph[rows[0]:rows[-1] + 1])
+        return glyphs
+
+    def _features(self, glyphs):
+        """Resize glyphs to a fixed grid and L2-normalise them into one matrix"""
+        vectors = np.empty((len(glyphs), GLYPH_SIZE * GLYPH_SIZE), dtype=np.float32)
+        for i, glyph in enumerate(glyphs):
+            img = Image.fromarray(glyph.astype(np.uint8) * 255).resize((GLYPH_SIZE, GLYPH_SIZE), Image.BILINEAR)
+            vectors[i] = np.asarray(img, dtype=np.float32).ravel()
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-6)
+
+    def solve(self, image_bytes):
+        """
+        Return (text, confidence) for a captcha image.
+
+        confidence is the weakest per-character similarity, in [0, 1]; an untrained
+        solver or an image that cannot be segmented yields ('', 0.0).
+        """
+        if not self.is_trained:
+            return '', 0.0
+        try:
+            glyphs = self.segment(image_bytes)
+        except Exception as e:
+            logging.error(f"Error segmenting captcha: {str(e)}")
+            return '', 0.0
+        if not glyphs:
+            return '', 0.0
+
+        similarities = self._features(glyphs) @ self.features.T
+        k = min(self.k, similarities.shape[1])
+        nearest = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+
+        text = []
+        confidences = []
+        for row, candidates in enumerate(nearest):
+            # Vote among the k nearest glyphs, weighting each vote by similarity
+            votes = {}
+            for idx in candidates:
+                votes[self.labels[idx]] = votes.get(self.labels[idx], 0.0) + similarities[row, idx]
+            label = max(votes, key=votes.get)
+            text.append(str(label))
+            confidences.append(similarities[row, candidates][self.labels[candidates] == label].max())
+        return ''.join(text), float(min(confidences))
+
+    def train(self, samples):
+        """
+        Fit the solver from (image_bytes, text) pairs.
+
+        Captchas whose segmentation does not yield one glyph per character are
+        skipped rather than guessed at. Returns the number of captchas used.
+        """
+        glyphs = []
+        labels = []
+        used = 0
+        for image_bytes, text in samples:
+            segmented = self.segment(image_bytes)
+            if len(segmented) != len(text):
+                continue
+            glyphs.extend(segmented)
+            labels.extend(text)
+            used += 1
+        if glyphs:
+            self.features = self._features(glyphs)
+            self.labels = np.array(labels)
+        return used
+
+
+def is_held_out(image_bytes, holdout=None):
+    """
+    Whether a harvested captcha belongs to the held-out share that training
+    skips. Decided by the image's sha1, so a captcha stays on the same side
+    however the harvest directory grows.
+    """
+    holdout = CAPTCHA_SOLVER['holdout'] if holdout is None else holdout
+    return int(hashlib.sha1(image_bytes).hexdigest()[:8], 16) < holdout * 0x100000000
+
+
+def load_harvested_samples(directory=None):
+    """Yield (image_bytes, text) pairs from files written by harvest_captcha; nothing if no directory is set"""
+    directory = directory or CAPTCHA_SOLVER['harvest_dir']
+    if not directory:
+        return
+    for path in sorted(glob.glob(os.path.join(directory, '*.png'))):
+        text = os.path.basename(path).rsplit('_', 1)[0]
+        with open(path, 'rb') as f:
+            yield f.read(), text
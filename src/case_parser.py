@@ -0,0 +1,270 @@
+import logging
+
+import lxml.html
+from lxml import etree
+
+from config.settings import PARSER_BACKEND, PARSER_KEEP_HTML
+
+NOT_FOUND_TEXT = 'This Case Code does not exists'
+
+# Tables the case page is made of, matched the way BeautifulSoup matches them:
+# (attribute, value) -> key; a class matches any one of an element's classes
+CASE_TABLES = {
+    ('class', 'case_details_table'): 'details',
+    ('class', 'case_status_table'): 'status',
+    ('class', 'Petitioner_Advocate_table'): 'petitioner',
+    ('class', 'Respondent_Advocate_table'): 'respondent',
+    ('class', 'history_table'): 'history',
+    ('class', 'transfer_table'): 'transfer',
+    ('class', 'IAheading'): 'ia',
+    ('id', 'act_table'): 'acts',
+}
+
+PARSER_BACKENDS = ('beautifulsoup', 'lxml')
+
+
+def get_parser_backend(name=None):
+    """Validate and return a parser backend name (PARSER_BACKEND by default)"""
+    name = name or PARSER_BACKEND
+    if name not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown parser backend '{name}'; choose from {', '.join(PARSER_BACKENDS)}")
+    return name
+
+
+def _text(element):
+    """Equivalent of BeautifulSoup's get_text(strip=True) once _prune() has run"""
+    return ''.join(text.strip() for text in element.itertext())
+
+
+def _cells(row):
+    return list(row.iter('td'))
+
+
+def _prune(root):
+    """Drop nodes whose text BeautifulSoup's get_text() leaves out, keeping the text after them"""
+    etree.strip_elements(root, 'script', 'style', 'template', etree.Comment, etree.ProcessingInstruction,
+                         with_tail=False)
+
+
+def _locate(root):
+    """
+    Walk the tree once, returning the first element of each kind the parser needs.
+
+    Like soup.find(), the first match in document order wins.
+    """
+    found = {}
+    for element in root.iter(etree.Element):
+        tag = element.tag
+        if tag == 'table':
+            for attribute, value in CASE_TABLES:
+                key = CASE_TABLES[(attribute, value)]
+                if key in found:
+                    continue
+                attr = element.get(attribute)
+                if attr is None:
+                    continue
+                if (value in attr.split()) if attribute == 'class' else attr == value:
+                    found[key] = element
+        elif tag == 'h2' and 'heading' not in found:
+            if element.get('id') == 'chHeading' and 'h4' in (element.get('class') or '').split():
+                found['heading'] = element
+        elif tag == 'span' and 'not_found' not in found:
+            # soup.find('span', text=...) matches on .string: the span's only text, with no child tags
+            if len(element) == 0 and element.text == NOT_FOUND_TEXT:
+                found['not_found'] = element
+    return found
+
+
+def _parse_party(table):
+    name = advocate = None
+    for row in table.iter('tr'):
+        cols = _cells(row)
+        if len(cols) >= 1:
+            text = _text(cols[0])
+            parts = text.split('Advocate-')
+            if len(parts) >= 2:
+                name = parts[0].strip()
+                advocate = parts[1].strip()
+            else:
+                name = text
+    return name, advocate
+
+
+def _parse_ia(table):
+    ia_entries = []
+    for row in list(table.iter('tr'))[1:]:  # Skip header row
+        cols = _cells(row)
+        if len(cols) >= 5:
+            next_date_purpose = _text(cols[3])
+            next_date = ""
+            purpose = ""
+            if next_date_purpose:
+                parts = next_date_purpose.split('(', 1)
+                next_date = parts[0].strip()
+                purpose = parts[1].rstrip(')').strip() if len(parts) > 1 else ""
+            ia_entries.append({
+                'ia_no': _text(cols[0]),
+                'party': _text(cols[1]).replace('<br/>', ' ').strip(),
+                'dt_filing': _text(cols[2]),
+                'next_date': next_date,
+                'purpose': purpose,
+                'ia_status': _text(cols[4]),
+                'classification': 'General'
+            })
+    return ia_entries
+
+
+def parse_case_details(html_content):
+    """
+    lxml implementation of ECourtsScraper._parse_case_details.
+
+    One traversal locates every table of the page, then each table is read
+    once. The result is field-for-field identical to the BeautifulSoup parser;
+    returns None if the case does not exist or the page cannot be parsed.
+    """
+    try:
+        root = lxml.html.document_fromstring(html_content)
+        _prune(root)
+        found = _locate(root)
+        if 'not_found' in found:
+            return None
+
+        case_details = {
+            'cnr_number': None,
+            'case_type': None,
+            'filing_number': None,
+            'filing_date': None,
+            'registration_number': None,
+            'registration_date': None,
+            'case_status': None,
+            'disposal_nature': None,
+            'disposal_date': None,
+            'decision_date': None,
+            'court_number_and_judge': None,
+            'petitioner_name': None,
+            'petitioner_advocate': None,
+            'respondent_name': None,
+            'respondent_advocate': None,
+            'under_acts': None,
+            'under_sections': None,
+            'first_hearing_date': None,
+            'case_history': [],
+            'transfer_details': [],
+            'ia_details': [],
+            'court_name': None
+        }
+        if PARSER_KEEP_HTML:
+            case_details['html_content'] = html_content
+
+        if 'heading' in found:
+            case_details['court_name'] = _text(found['heading'])
+
+        if 'Case Details' not in html_content:
+            logging.error("No case details found in the response")
+            return None
+
+        if 'details' in found:
+            for row in found['details'].iter('tr'):
+                cols = _cells(row)
+                if len(cols) >= 2:
+                    label = _text(cols[0]).lower()
+                    if 'case type' in label:
+                        case_details['case_type'] = _text(cols[1])
+                    elif 'filing number' in label:
+                        case_details['filing_number'] = _text(cols[1])
+                        if len(cols) >= 4:
+                            case_details['filing_date'] = _text(cols[3])
+                    elif 'registration number' in label:
+                        case_details['registration_number'] = _text(cols[1])
+                        if len(cols) >= 4:
+                            case_details['registration_date'] = _text(cols[3])
+                    elif 'cnr number' in label:
+                        case_details['cnr_number'] = _text(cols[1])[:16]
+
+        if 'status' in found:
+            for row in found['status'].iter('tr'):
+                cols = _cells(row)
+                if len(cols) >= 2:
+                    label = _text(cols[0]).lower()
+                    if 'first hearing date' in label:
+                        case_details['first_hearing_date'] = _text(cols[1])
+                    elif 'decision date' in label:
+                        case_details['decision_date'] = _text(cols[1])
+                        # For disposed cases, set disposal_date to decision_date
+                        if case_details['case_status'] == 'Case disposed':
+                            case_details['disposal_date'] = case_details['decision_date']
+                    elif 'case status' in label:
+                        case_details['case_status'] = _text(cols[1])
+                    elif 'nature of disposal' in label:
+                        case_details['disposal_nature'] = _text(cols[1])
+                    elif 'court number and judge' in label:
+                        case_details['court_number_and_judge'] = _text(cols[1])
+
+        if 'petitioner' in found:
+            name, advocate = _parse_party(found['petitioner'])
+            case_details['petitioner_name'] = name
+            if advocate is not None:
+                case_details['petitioner_advocate'] = advocate
+
+        if 'respondent' in found:
+            name, advocate = _parse_party(found['respondent'])
+            case_details['respondent_name'] = name
+            if advocate is not None:
+                case_details['respondent_advocate'] = advocate
+
+        if 'acts' in found:
+            acts = []
+            sections = []
+            for row in list(found['acts'].iter('tr'))[1:]:  # Skip header row
+                cols = _cells(row)
+                if len(cols) >= 2:
+                    act = _text(cols[0]).rstrip('\\')
+                    section = _text(cols[1])
+                    if act:
+                        acts.append(act)
+                    if section:
+                        sections.append(section)
+            case_details['under_acts'] = ','.join(acts) if acts else None
+            case_details['under_sections'] = ','.join(sections) if sections else None
+
+        if 'history' in found:
+            for row in list(found['history'].iter('tr'))[1:]:  # Skip header row
+                cols = _cells(row)
+                if len(cols) >= 4:
+                    history_entry = {
+                        "judge": _text(cols[0]),
+                        "business_date": _text(cols[1]).split('\n')[0],
+                        "hearing_date": _text(cols[2]),
+                        "purpose": _text(cols[3])
+                    }
+                    if any(history_entry.values()):
+                        case_details['case_history'].append(history_entry)
+            logging.info(f"Found {len(case_details['case_history'])} case history entries")
+
+        if 'transfer' in found:
+            for row in list(found['transfer'].iter('tr'))[1:]:  # Skip header row
+                cols = _cells(row)
+                if len(cols) >= 4:
+                    case_details['transfer_details'].append({
+                        "registration_number": _text(cols[0]),
+                        "transfer_date": _text(cols[1]),
+                        "from_court": _text(cols[2]),
+                        "to_court": _text(cols[3])
+                    })
+            logging.info(f"Found {len(case_details['transfer_details'])} case transfer entries")
+
+        if 'ia' in found:
+            case_details['ia_details'] = _parse_ia(found['ia'])
+        logging.info(f"Found {len(case_details['ia_details'])} IA entries")
+
+        return case_details
+    except Exception as e:
+        logging.error(f"Error parsing case details: {str(e)}")
+        return None
+
+
+def diff_case_details(expected, actual):
+    """Return the names of the fields on which two parsed cases differ"""
+    if expected is None or actual is None:
+        return [] if expected is actual else ['<case>']
+    return sorted(key for key in set(expected) | set(actual) if expected.get(key) != actual.get(key))
@@ -0,0 +1,223 @@
+import asyncio
+import itertools
+import logging
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from config.settings import PIPELINE
+from src.ecourts_scraper import ECourtsScraper
+from src.metrics import QUEUE_DEPTH, STAGE_SECONDS
+from src.tracing import span
+
+
+class PageParser:
+    """The CPU-only page parsing of ECourtsScraper, without its sessions, for parse worker processes"""
+
+    _parse_case_details = ECourtsScraper._parse_case_details
+    _parse_case_details_soup = ECourtsScraper._parse_case_details_soup
+    _extract_ia_details = ECourtsScraper._extract_ia_details
+    _extract_acts_and_sections = ECourtsScraper._extract_acts_and_sections
+
+    def __init__(self, parser_backend):
+        self.parser_backend = parser_backend
+
+
+_page_parser = None
+
+
+def _init_parse_worker(parser_backend):
+    global _page_parser
+    _page_parser = PageParser(parser_backend)
+    # Ctrl-C is handled by the crawler, which shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _parse_page(page):
+    return _page_parser._parse_case_details(page)
+
+
+class StageMetrics:
+    """Items through one pipeline stage, the time its workers spent on them and the depth of its input queue"""
+
+    def __init__(self, name, workers, queue=None):
+        self.name = name
+        self.workers = workers
+        self.queue = queue
+        self.processed = 0
+        self.busy = 0.0
+        self.started = time.monotonic()
+
+    def record(self, seconds):
+        self.processed += 1
+        self.busy += seconds
+
+    def as_dict(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return {
+            'stage': self.name,
+            'workers': self.workers,
+            'queue_depth': self.queue.qsize() if self.queue else None,
+            'queue_size': self.queue.maxsize if self.queue else None,
+            'processed': self.processed,
+            'per_second': self.processed / elapsed,
+            'utilisation': self.busy / (elapsed * self.workers)
+        }
+
+    def __str__(self):
+        metrics = self.as_dict()
+        text = f"{self.name} {metrics['per_second']:.2f}/s, {metrics['utilisation']:.0%} busy"
+        if self.queue:
+            text += f", queue {metrics['queue_depth']}/{metrics['queue_size']}"
+        return text
+
+
+class CasePipeline:
+    """
+    Fetch, parse and persist CNRs as three stages joined by bounded queues.
+
+    `fetchers` coroutines download case pages over the scraper's sessions,
+    `parsers` worker processes parse them, and a single persist stage hands
+    each (cnr, case_details) to persist(), normally a batched CaseWriter. A
+    full queue makes the stage feeding it wait, so a slow database slows
+    parsing, which slows fetching, and no stage runs ahead by more than its
+    queue. case_details follows AsyncECourtsScraper.get_case_details: a
+    dict, or None on failure.
+
+    Nothing that may block on the database runs on the event loop: persist()
+    runs on a thread of its own, so it should write over its own connection,
+    and CNRs are taken from cnr_numbers source_chunk_size at a time in another
+    thread, ahead of the fetchers. The two threads never run at once (both
+    hold self.lock), as the frontier and run statistics behind them are
+    shared.
+    """
+
+    def __init__(self, scraper, persist, fetchers=None, parsers=None, parse_queue_size=None,
+                 persist_queue_size=None, metrics_interval=None, source_chunk_size=None):
+        self.scraper = scraper
+        self.persist = persist
+        self.fetchers = fetchers or scraper.concurrency
+        self.parsers = parsers or PIPELINE['parse_workers']
+        self.metrics_interval = metrics_interval or PIPELINE['metrics_interval']
+        self.source_chunk_size = source_chunk_size or PIPELINE['source_chunk_size']
+        self.lock = threading.RLock()
+        # Holds the next chunk while the one after it is pulled
+        self.cnr_queue = asyncio.Queue(maxsize=self.source_chunk_size)
+        self.parse_queue = asyncio.Queue(maxsize=parse_queue_size or PIPELINE['parse_queue_size'])
+        self.persist_queue = asyncio.Queue(maxsize=persist_queue_size or PIPELINE['persist_queue_size'])
+        self.stages = {
+            'fetch': StageMetrics('fetch', self.fetchers),
+            'parse': StageMetrics('parse', self.parsers, self.parse_queue),
+            'persist': StageMetrics('persist', 1, self.persist_queue)
+        }
+        QUEUE_DEPTH.set_function(self.parse_queue.qsize, queue='parse')
+        QUEUE_DEPTH.set_function(self.persist_queue.qsize, queue='persist')
+
+    def metrics(self):
+        """Per-stage queue depth, throughput and utilisation"""
+        return [stage.as_dict() for stage in self.stages.values()]
+
+    async def run(self, cnr_numbers):
+        """Push every CNR of cnr_numbers (any iterable, consumed lazily) through the pipeline"""
+        cnr_iter = iter(cnr_numbers)
+        pool = ProcessPoolExecutor(max_workers=self.parsers, initializer=_init_parse_worker,
+                                   initargs=(self.scraper.parser_backend,))
+        persister = ThreadPoolExecutor(max_workers=1, thread_name_prefix='persist')
+        tasks = [asyncio.ensure_future(self._source_stage(cnr_iter)),
+                 asyncio.ensure_future(self._fetch_stage()),
+                 asyncio.ensure_future(self._parse_stage(pool)),
+                 asyncio.ensure_future(self._persist_stage(persister))]
+        reporter = asyncio.ensure_future(self._report())
+        logging.info(f"Pipeline running with {self.fetchers} fetchers and {self.parsers} parse processes")
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks + [reporter]:
+                task.cancel()
+            pool.shutdown(wait=False, cancel_futures=True)
+            # Let a write in progress finish rather than leave it half done
+            persister.shutdown(wait=True, cancel_futures=True)
+            logging.info(f"Pipeline: {', '.join(str(stage) for stage in self.stages.values())}")
+
+    def _next_chunk(self, cnr_iter):
+        with self.lock:
+            return list(itertools.islice(cnr_iter, self.source_chunk_size))
+
+    async def _source_stage(self, cnr_iter):
+        while True:
+            chunk = await asyncio.to_thread(self._next_chunk, cnr_iter)
+            if not chunk:
+                break
+            for cnr in chunk:
+                await self.cnr_queue.put(cnr)
+        for _ in range(self.fetchers):
+            await self.cnr_queue.put(None)
+
+    async def _fetch_stage(self):
+        await asyncio.gather(*(self._fetch() for _ in range(self.fetchers)))
+        for _ in range(self.parsers):
+            await self.parse_queue.put(None)
+
+    async def _fetch(self):
+        while True:
+            cnr = await self.cnr_queue.get()
+            if cnr is None:
+                return
+            started = time.monotonic()
+            result = await self.scraper.fetch_case_page(cnr)
+            self.stages['fetch'].record(time.monotonic() - started)
+            # Waits while the parsers are behind
+            await self.parse_queue.put((cnr, result))
+
+    async def _parse_stage(self, pool):
+        await asyncio.gather(*(self._parse(pool) for _ in range(self.parsers)))
+        await self.persist_queue.put(None)
+
+    async def _parse(self, pool):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self.parse_queue.get()
+            if item is None:
+                return
+            cnr, result = item
+            started = time.monotonic()
+            if result and 'page' in result:
+                result = await self._parse_result(loop, pool, cnr, result)
+            self.stages['parse'].record(time.monotonic() - started)
+            await self.persist_queue.put((cnr, result))
+
+    async def _parse_result(self, loop, pool, cnr, result):
+        try:
+            # Metrics recorded in the parse processes are never exported, so time the parse from here
+            with STAGE_SECONDS.time(stage='parse'), span('parse', cnr=cnr):
+                case_details = await loop.run_in_executor(pool, _parse_page, result['page'])
+        except Exception as e:
+            logging.error(f"Error parsing case page for {cnr}: {str(e)}")
+            return None
+        if not case_details:
+            logging.warning(f"Failed to parse case details for {cnr}")
+            return None
+        case_details['exists'] = True
+        case_details['request_stats'] = result['request_stats']
+        return case_details
+
+    def _persist(self, cnr, case_details):
+        with self.lock:
+            self.persist(cnr, case_details)
+
+    async def _persist_stage(self, persister):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self.persist_queue.get()
+            if item is None:
+                return
+            started = time.monotonic()
+            # Off the event loop, so fetching and parsing carry on while a batch is written
+            await loop.run_in_executor(persister, self._persist, *item)
+            self.stages['persist'].record(time.monotonic() - started)
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(self.metrics_interval)
+            logging.info(f"Pipeline: {', '.join(str(stage) for stage in self.stages.values())}")
@@ -0,0 +1,115 @@
+from dataclasses import dataclass
+
+
+class Record:
+    """
+    Base of the compact case records: fixed __slots__ instead of a per-object
+    dict, built from and turned back into the dicts the parsers produce.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls, values):
+        return cls(*(values.get(name) for name in cls.__slots__))
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+@dataclass
+class HistoryEntry(Record):
+    __slots__ = ('judge', 'business_date', 'hearing_date', 'purpose')
+    judge: str
+    business_date: str
+    hearing_date: str
+    purpose: str
+
+
+@dataclass
+class TransferEntry(Record):
+    __slots__ = ('registration_number', 'transfer_date', 'from_court', 'to_court')
+    registration_number: str
+    transfer_date: str
+    from_court: str
+    to_court: str
+
+
+@dataclass
+class IaEntry(Record):
+    __slots__ = ('ia_no', 'party', 'dt_filing', 'next_date', 'purpose', 'ia_status', 'classification')
+    ia_no: str
+    party: str
+    dt_filing: str
+    next_date: str
+    purpose: str
+    ia_status: str
+    classification: str
+
+
+ENTRY_TYPES = {
+    'case_history': HistoryEntry,
+    'transfer_details': TransferEntry,
+    'ia_details': IaEntry,
+}
+
+
+@dataclass
+class CaseRecord(Record):
+    """
+    One parsed case, as held between parsing and the database.
+
+    Only the parsed fields are kept: the raw page, which dwarfs them, is left
+    to the response archive.
+    """
+    __slots__ = (
+        'cnr_number', 'court_name', 'case_type', 'filing_number', 'filing_date', 'registration_number',
+        'registration_date', 'case_status', 'disposal_nature', 'disposal_date', 'decision_date',
+        'court_number_and_judge', 'petitioner_name', 'petitioner_advocate', 'respondent_name',
+        'respondent_advocate', 'under_acts', 'under_sections', 'first_hearing_date', 'case_history',
+        'transfer_details', 'ia_details'
+    )
+    cnr_number: str
+    court_name: str
+    case_type: str
+    filing_number: str
+    filing_date: str
+    registration_number: str
+    registration_date: str
+    case_status: str
+    disposal_nature: str
+    disposal_date: str
+    decision_date: str
+    court_number_and_judge: str
+    petitioner_name: str
+    petitioner_advocate: str
+    respondent_name: str
+    respondent_advocate: str
+    under_acts: str
+    under_sections: str
+    first_hearing_date: str
+    case_history: list
+    transfer_details: list
+    ia_details: list
+
+    @classmethod
+    def from_dict(cls, values):
+        record = super().from_dict(values)
+        for name, entry_type in ENTRY_TYPES.items():
+            setattr(record, name, [entry_type.from_dict(entry) for entry in getattr(record, name) or []])
+        return record
+
+    def as_dict(self):
+        values = super().as_dict()
+        for name in ENTRY_TYPES:
+            values[name] = [entry.as_dict() for entry in values[name]]
+        return values
+
+    def summary(self):
+        """The lines printed for a scraped case"""
+        return [
+            f"CNR: {self.cnr_number}",
+            f"Case Type: {self.case_type or 'N/A'}",
+            f"Filing Number: {self.filing_number or 'N/A'}",
+            f"Decision Date: {self.decision_date or 'N/A'}",
+            f"Nature of Disposal: {self.disposal_nature or 'N/A'}",
+        ]
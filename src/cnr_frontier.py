@@ -0,0 +1,338 @@
+import logging
+import time
+from collections import namedtuple
+
+from config.settings import CHECKPOINT, CRAWL, LEASES
+
+MAX_SERIAL = 999999  # CNR serials are six digits
+
+
+class Cnr(namedtuple('Cnr', 'state district establishment serial year')):
+    """
+    A decoded CNR: KLKN010000112019 is state KL, district KN, establishment 01,
+    serial 11, year 2019.
+    """
+    __slots__ = ()
+
+    @property
+    def establishment_code(self):
+        """The six character code naming the court establishment, e.g. KLKN01"""
+        return f"{self.state}{self.district}{self.establishment}"
+
+    def __str__(self):
+        return encode_cnr(self.establishment_code, self.serial, self.year)
+
+
+def decode_cnr(cnr_number):
+    """Decode a CNR string, or return None for anything not shaped like one"""
+    if not cnr_number or len(cnr_number) != 16 or not cnr_number[6:].isdigit():
+        return None
+    return Cnr(cnr_number[0:2], cnr_number[2:4], cnr_number[4:6], int(cnr_number[6:12]), int(cnr_number[12:16]))
+
+
+def check_establishment_code(establishment_code):
+    if len(establishment_code) != 6 or not establishment_code[4:].isdigit():
+        raise ValueError(f"Establishment code must look like KLKN01, got '{establishment_code}'")
+
+
+def encode_cnr(establishment_code, serial, year):
+    """Build a CNR from an establishment code such as KLKN01, a serial and a year"""
+    check_establishment_code(establishment_code)
+    if not 0 < serial <= MAX_SERIAL:
+        raise ValueError(f"Serial must be between 1 and {MAX_SERIAL}, got {serial}")
+    return f"{establishment_code}{serial:06d}{int(year):04d}"
+
+
+def parse_shard(spec):
+    """Parse 'INDEX/COUNT' (e.g. '2/4', zero-based) into (index, count)"""
+    try:
+        index, count = (int(part) for part in spec.split('/'))
+    except ValueError:
+        raise ValueError(f"Shard must look like INDEX/COUNT, e.g. 0/4; got '{spec}'")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Shard index must be between 0 and {count - 1}, got {index}")
+    return index, count
+
+
+class CnrFrontier:
+    """
+    The CNRs a crawler should visit, enumerated lazily.
+
+    Each establishment/year is a stream of serials from its start to its end
+    bound (MAX_SERIAL by default), visited in order. Serials are cut into blocks
+    of block_size dealt round-robin to `shards` workers, so workers given the
+    same establishments and years but different shard indexes never overlap,
+    and each gets an even share of every stream whatever its real length.
+    """
+
+    def __init__(self, establishments=None, years=None, shard=0, shards=1, block_size=None):
+        self.establishments = list(establishments or CRAWL['establishments'])
+        self.years = [int(year) for year in (years or CRAWL['years'])]
+        self.shard = shard
+        self.shards = shards
+        self.block_size = block_size or CRAWL['shard_block_size']
+        self._bounds = {}
+        self._resume = None
+        for establishment in self.establishments:
+            check_establishment_code(establishment)
+
+    @property
+    def streams(self):
+        """The (establishment code, year) pairs crawled, in crawl order"""
+        return [(establishment, year) for establishment in self.establishments for year in self.years]
+
+    def set_bounds(self, establishment, year, start=None, end=None):
+        """Limit one stream to serials start..end (inclusive); None keeps the default"""
+        old_start, old_end = self.bounds(establishment, year)
+        self._bounds[(establishment, year)] = (start or old_start, end or old_end)
+
+    def bounds(self, establishment, year):
+        return self._bounds.get((establishment, year), (1, MAX_SERIAL))
+
+    def resume_after(self, cnr_number):
+        """
+        Pick up after a checkpointed CNR: streams crawled before its own are
+        skipped and its own resumes at the next serial. A CNR outside the
+        frontier is ignored.
+        """
+        cnr = decode_cnr(cnr_number)
+        if cnr and (cnr.establishment_code, cnr.year) in self.streams:
+            self._resume = cnr
+
+    def done(self, cnr_number):
+        """Told once cnr_number needs no more work; a static frontier has nothing to record"""
+
+    def owns(self, cnr_number):
+        """Whether cnr_number falls in this worker's shard"""
+        cnr = decode_cnr(cnr_number)
+        return cnr is not None and ((cnr.serial - 1) // self.block_size) % self.shards == self.shard
+
+    def __iter__(self):
+        streams = self.streams
+        if self._resume:
+            streams = streams[streams.index((self._resume.establishment_code, self._resume.year)):]
+        for establishment, year in streams:
+            start, end = self.bounds(establishment, year)
+            if self._resume and (establishment, year) == (self._resume.establishment_code, self._resume.year):
+                start = max(start, self._resume.serial + 1)
+            yield from self._iter_stream(establishment, year, start, end)
+
+    def _iter_stream(self, establishment, year, start, end):
+        # First block at or after start that belongs to this shard
+        block = (start - 1) // self.block_size
+        block += (self.shard - block) % self.shards
+        while True:
+            first = block * self.block_size + 1
+            if first > end:
+                return
+            for serial in range(max(first, start), min(first + self.block_size - 1, end) + 1):
+                yield encode_cnr(establishment, serial, year)
+            block += self.shards
+
+
+class CheckpointedFrontier:
+    """
+    A CnrFrontier whose progress is saved under worker_key, so a restart
+    carries on exactly where the last run stopped.
+
+    The checkpoint is one small row per worker: the last CNR yielded (the
+    high-water mark) and the CNRs yielded but not yet reported through done().
+    On restore the in-flight CNRs are yielded again first, then the frontier
+    resumes after the high-water mark, so nothing is skipped and at most the
+    in-flight handful is visited twice. Writes are coalesced: the row is saved
+    every `interval` seconds or `every` done CNRs, whichever comes first.
+
+    A CNR whose fetch or save keeps failing is never done, so each in-flight
+    CNR carries the number of runs it has been tried in, saved as
+    'cnr_number:attempts' once it is past the first. A restore stops replaying
+    it after max_attempts, and only the newest max_in_flight CNRs are kept;
+    the failures dropped stay in the crawl's outcome log.
+    """
+
+    def __init__(self, frontier, db, worker_key, interval=None, every=None, max_attempts=None, max_in_flight=None):
+        self.frontier = frontier
+        self.db = db
+        self.worker_key = worker_key
+        self.interval = CHECKPOINT['interval'] if interval is None else interval
+        self.every = every or CHECKPOINT['every']
+        self.max_attempts = max_attempts or CHECKPOINT['max_attempts']
+        self.max_in_flight = max_in_flight or CHECKPOINT['max_in_flight']
+        self.high_water = None
+        self._in_flight = {}  # cnr_number -> runs it has been tried in, kept in the order yielded
+        self._replay = []
+        self._unsaved = 0
+        self._last_save = time.monotonic()
+
+    @property
+    def streams(self):
+        return self.frontier.streams
+
+    def restore(self):
+        """Load the saved checkpoint; returns False if this worker has none yet"""
+        saved = self.db.load_checkpoint(self.worker_key)
+        if saved is None:
+            return False
+        high_water, in_flight = saved
+        if high_water:
+            self.high_water = high_water
+            self.frontier.resume_after(high_water)
+        self._replay = []
+        given_up = 0
+        for entry in in_flight:
+            cnr_number, _, attempts = entry.partition(':')
+            attempts = int(attempts or 1)
+            # A checkpoint saved under a different crawl config may name CNRs this frontier does not cover
+            if not self._covers(cnr_number) or not self.frontier.owns(cnr_number):
+                continue
+            if attempts >= self.max_attempts:
+                given_up += 1
+                continue
+            self._replay.append((cnr_number, attempts + 1))
+        if given_up:
+            logging.warning(f"Checkpoint {self.worker_key}: gave up on {given_up} CNRs "
+                            f"that failed in {self.max_attempts} runs")
+        logging.info(f"Checkpoint {self.worker_key}: resuming after {high_water}, "
+                     f"{len(self._replay)} CNRs in flight")
+        return True
+
+    def _covers(self, cnr_number):
+        cnr = decode_cnr(cnr_number)
+        return cnr is not None and (cnr.establishment_code, cnr.year) in self.frontier.streams
+
+    def __iter__(self):
+        replay, self._replay = self._replay, []
+        for cnr_number, attempts in replay:
+            self._track(cnr_number, attempts)
+            yield cnr_number
+        for cnr_number in self.frontier:
+            self._track(cnr_number, 1)
+            self.high_water = cnr_number
+            yield cnr_number
+
+    def _track(self, cnr_number, attempts):
+        self._in_flight[cnr_number] = attempts
+        if len(self._in_flight) > self.max_in_flight:
+            # The oldest are the failures; the CNRs still being worked on were yielded last
+            dropped = next(iter(self._in_flight))
+            del self._in_flight[dropped]
+            logging.warning(f"Checkpoint {self.worker_key}: more than {self.max_in_flight} CNRs in flight, "
+                            f"no longer tracking {dropped}")
+
+    def done(self, cnr_number):
+        if self._in_flight.pop(cnr_number, None) is not None:
+            self._unsaved += 1
+        if self._unsaved >= self.every or time.monotonic() - self._last_save >= self.interval:
+            self.save()
+
+    def owns(self, cnr_number):
+        return self.frontier.owns(cnr_number)
+
+    def save(self):
+        self._last_save = time.monotonic()
+        in_flight = [cnr_number if attempts == 1 else f"{cnr_number}:{attempts}"
+                     for cnr_number, attempts in self._in_flight.items()]
+        if self.db.save_checkpoint(self.worker_key, self.high_water, in_flight):
+            self._unsaved = 0
+
+    def close(self):
+        self.save()
+
+
+class LeasedFrontier:
+    """
+    The CNRs of the leases a worker claims from CrawlLeases, one lease after another.
+
+    Used like a CnrFrontier, except the caller must report every CNR it yields
+    through done() once it is saved or skipped. A lease is only marked done when
+    all of its CNRs have been, and heartbeats record the lowest CNR still
+    outstanding, so a worker that dies mid-lease costs nothing but the lease's
+    ttl: the next worker carries on from exactly where it stopped. Once there
+    is nothing left to claim, the iterator keeps waiting while other workers
+    still hold leases, so a range whose holder dies is never left unfinished.
+    """
+
+    def __init__(self, leases, worker_id, heartbeat_interval=None):
+        self.leases = leases
+        self.worker_id = worker_id
+        self.heartbeat_interval = heartbeat_interval or LEASES['heartbeat_interval']
+        # (establishment, year, first_serial) -> {'lease', 'outstanding' serials, 'next' serial to yield}
+        self._active = {}
+        self._owner = {}  # cnr_number -> key of the lease it was yielded from
+        self._last_heartbeat = time.monotonic()
+
+    @property
+    def streams(self):
+        return self.leases.streams
+
+    def __iter__(self):
+        while True:
+            lease = self.leases.claim(self.worker_id)
+            if lease is None:
+                if self._wait_for_other_workers():
+                    continue
+                logging.info(f"Worker {self.worker_id}: no ranges left to lease")
+                return
+            key = (lease.establishment, lease.year, lease.first_serial)
+            state = self._active[key] = {'lease': lease, 'outstanding': set(), 'next': lease.next_serial}
+            while key in self._active and state['next'] <= lease.last_serial:
+                serial = state['next']
+                cnr_number = encode_cnr(lease.establishment, serial, lease.year)
+                state['outstanding'].add(serial)
+                state['next'] = serial + 1
+                self._owner[cnr_number] = key
+                yield cnr_number
+                self._heartbeat_if_due()
+            self._finish_if_done(key)
+
+    def _wait_for_other_workers(self):
+        """
+        Wait, heartbeating our own leases, until the first lease another worker
+        holds expires or changes hands, so it can be claimed if its holder died.
+        Returns False at once if other workers hold none.
+        """
+        expires_at = self.leases.next_expiry(self.worker_id)
+        if expires_at is None:
+            return False
+        logging.info(f"Worker {self.worker_id}: waiting up to {max(expires_at - time.time(), 0):.0f}s "
+                     f"for ranges other workers still hold")
+        while time.time() < expires_at:
+            time.sleep(max(min(self.heartbeat_interval, expires_at - time.time()), 0))
+            self.heartbeat()
+            if self.leases.next_expiry(self.worker_id) != expires_at:
+                break  # finished, released or extended: look again
+        return True
+
+    def done(self, cnr_number):
+        key = self._owner.pop(cnr_number, None)
+        if key not in self._active:
+            return
+        self._active[key]['outstanding'].discard(decode_cnr(cnr_number).serial)
+        self._finish_if_done(key)
+        self._heartbeat_if_due()
+
+    def _resume_point(self, state):
+        """The lowest serial of the lease that is not done yet"""
+        return min(state['outstanding']) if state['outstanding'] else state['next']
+
+    def _finish_if_done(self, key):
+        state = self._active.get(key)
+        if state and self._resume_point(state) > state['lease'].last_serial:
+            del self._active[key]
+            self.leases.complete(state['lease'])
+
+    def _heartbeat_if_due(self):
+        if time.monotonic() - self._last_heartbeat >= self.heartbeat_interval:
+            self.heartbeat()
+
+    def heartbeat(self):
+        """Extend every held lease and record its progress, dropping any another worker has taken over"""
+        self._last_heartbeat = time.monotonic()
+        for key, state in list(self._active.items()):
+            if not self.leases.heartbeat(state['lease'], self._resume_point(state)):
+                del self._active[key]
+
+    def close(self):
+        """Hand back unfinished leases so other workers can pick them up without waiting for them to expire"""
+        for key, state in list(self._active.items()):
+            del self._active[key]
+            self.leases.release(state['lease'], self._resume_point(state))
@@ -0,0 +1,218 @@
+import json
+import logging
+import os
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+
+from config.settings import EXISTENCE_INDEX
+from src.cnr_frontier import decode_cnr
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves by concurrent workers are not serialised
+    fcntl = None
+
+ARRAY_LIMIT = 4096  # past this many values a 64 Ki chunk is cheaper as an 8 KiB bitmap
+
+
+class RoaringBitmap:
+    """
+    Compressed set of non-negative integers, after the Roaring bitmap layout.
+
+    Values are split into 64 Ki chunks by their high bits. A sparse chunk is a
+    sorted array of 16-bit values, a dense one a fixed 8 KiB bitmap, so both a
+    handful of scattered serials and long contiguous runs stay small.
+    """
+
+    def __init__(self, values=()):
+        self._chunks = {}
+        for value in values:
+            self.add(value)
+
+    def add(self, value):
+        high, low = value >> 16, value & 0xFFFF
+        chunk = self._chunks.get(high)
+        if chunk is None:
+            chunk = self._chunks[high] = array('H')
+        if isinstance(chunk, array):
+            i = bisect_left(chunk, low)
+            if i < len(chunk) and chunk[i] == low:
+                return
+            if len(chunk) < ARRAY_LIMIT:
+                chunk.insert(i, low)
+                return
+            chunk = self._chunks[high] = self._to_bitmap(chunk)
+        chunk[low >> 3] |= 1 << (low & 7)
+
+    def __contains__(self, value):
+        chunk = self._chunks.get(value >> 16)
+        if chunk is None:
+            return False
+        low = value & 0xFFFF
+        if isinstance(chunk, array):
+            i = bisect_left(chunk, low)
+            return i < len(chunk) and chunk[i] == low
+        return bool(chunk[low >> 3] & (1 << (low & 7)))
+
+    def __iter__(self):
+        for high in sorted(self._chunks):
+            chunk = self._chunks[high]
+            base = high << 16
+            if isinstance(chunk, array):
+                for low in chunk:
+                    yield base | low
+            else:
+                for byte_index, byte in enumerate(chunk):
+                    while byte:
+                        bit = byte & -byte
+                        yield base | (byte_index << 3) | (bit.bit_length() - 1)
+                        byte ^= bit
+
+    def __len__(self):
+        return sum(len(chunk) if isinstance(chunk, array) else bin(int.from_bytes(chunk, 'little')).count('1')
+                   for chunk in self._chunks.values())
+
+    @staticmethod
+    def _to_bitmap(values):
+        bitmap = bytearray(1 << 13)
+        for low in values:
+            bitmap[low >> 3] |= 1 << (low & 7)
+        return bitmap
+
+    def runs(self):
+        """The values as sorted [first, last] runs, the form they are saved in"""
+        runs = []
+        for value in self:
+            if runs and runs[-1][1] == value - 1:
+                runs[-1][1] = value
+            else:
+                runs.append([value, value])
+        return runs
+
+    def add_runs(self, runs):
+        for first, last in runs:
+            for value in range(first, last + 1):
+                self.add(value)
+
+    @classmethod
+    def from_runs(cls, runs):
+        bitmap = cls()
+        bitmap.add_runs(runs)
+        return bitmap
+
+
+def split_cnr(cnr_number):
+    """Split a CNR like KLKN010000112019 into ('KLKN01', 2019, 11), or None if it is not one"""
+    cnr = decode_cnr(cnr_number)
+    if cnr is None:
+        return None
+    return cnr.establishment_code, cnr.year, cnr.serial
+
+
+class CnrExistenceIndex:
+    """
+    In-memory record of which CNRs are in the database and which do not exist.
+
+    Each establishment/year keeps two RoaringBitmaps of serials: CNRs known to
+    be stored and CNRs the portal confirmed do not exist. Both answer in
+    microseconds, so whole ranges can be skipped without asking the database.
+    Confirmed misses from past years are saved to missing_file across runs;
+    the current year's are kept for the run only, since its serials are still
+    being handed out.
+    """
+
+    def __init__(self, missing_file=None):
+        self.missing_file = EXISTENCE_INDEX['missing_file'] if missing_file is None else missing_file
+        self._existing = {}
+        self._missing = {}
+        self._load_missing()
+
+    def _bitmap(self, bitmaps, cnr_number):
+        parts = split_cnr(cnr_number)
+        if parts is None:
+            return None, None
+        establishment, year, serial = parts
+        return bitmaps.setdefault((establishment, year), RoaringBitmap()), serial
+
+    def _contains(self, bitmaps, cnr_number):
+        parts = split_cnr(cnr_number)
+        if parts is None:
+            return False
+        bitmap = bitmaps.get(parts[:2])
+        return bitmap is not None and parts[2] in bitmap
+
+    def add_existing(self, cnr_numbers):
+        for cnr_number in cnr_numbers:
+            bitmap, serial = self._bitmap(self._existing, cnr_number)
+            if bitmap is not None:
+                bitmap.add(serial)
+
+    def add_missing(self, cnr_number):
+        bitmap, serial = self._bitmap(self._missing, cnr_number)
+        if bitmap is not None:
+            bitmap.add(serial)
+
+    def exists(self, cnr_number):
+        return self._contains(self._existing, cnr_number)
+
+    def is_missing(self, cnr_number):
+        return self._contains(self._missing, cnr_number)
+
+    def unknown(self, cnr_numbers):
+        """The CNRs the index cannot settle, in order"""
+        return [cnr_number for cnr_number in cnr_numbers
+                if not self.exists(cnr_number) and not self.is_missing(cnr_number)]
+
+    def load_existing(self, db):
+        """Fill the existing bitmaps from every CNR in the cases table"""
+        self.add_existing(db.iter_cnrs())
+        logging.info(f"Existence index holds {sum(len(b) for b in self._existing.values())} stored CNRs "
+                     f"and {sum(len(b) for b in self._missing.values())} known missing")
+
+    def _load_missing(self):
+        if not self.missing_file or not os.path.exists(self.missing_file):
+            return
+        try:
+            with open(self.missing_file) as f:
+                saved = json.load(f)
+            for key, runs in saved.items():
+                establishment, year = key.split('/')
+                self._missing.setdefault((establishment, int(year)), RoaringBitmap()).add_runs(runs)
+        except (OSError, ValueError) as e:
+            logging.error(f"Failed to load known missing CNRs from {self.missing_file}: {str(e)}")
+
+    def save(self):
+        """
+        Write the confirmed misses of past years to missing_file, along with
+        any that other workers have saved there since it was loaded.
+
+        The load, merge and replace run under an exclusive lock on a
+        missing_file.lock beside it, so two workers saving at once cannot each
+        write over the misses the other just added.
+        """
+        if not self.missing_file:
+            return
+        try:
+            missing_dir = os.path.dirname(self.missing_file)
+            if missing_dir:
+                os.makedirs(missing_dir, exist_ok=True)
+            with open(f"{self.missing_file}.lock", 'a') as lock:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    self._load_missing()
+                    current_year = datetime.now().year
+                    saved = {f"{establishment}/{year}": bitmap.runs()
+                             for (establishment, year), bitmap in sorted(self._missing.items())
+                             if year < current_year}
+                    # Replace the file in one step so a worker loading it never sees half of it
+                    temp_file = f"{self.missing_file}.{os.getpid()}.tmp"
+                    with open(temp_file, 'w') as f:
+                        json.dump(saved, f)
+                    os.replace(temp_file, self.missing_file)
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock, fcntl.LOCK_UN)
+        except OSError as e:
+            logging.error(f"Failed to save known missing CNRs to {self.missing_file}: {str(e)}")
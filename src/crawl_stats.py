@@ -0,0 +1,210 @@
+import logging
+import os
+import time
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+
+import psutil
+
+from config.settings import CRAWL_STATS
+from src.metrics import CASES
+
+OUTCOMES = ('successful', 'non_existent', 'failed', 'skipped')
+COUNTERS = ('total_attempted',) + OUTCOMES
+
+
+class RollingCounter:
+    """Events counted in bucket_seconds wide buckets, kept for the last `span` seconds only"""
+
+    def __init__(self, span, bucket_seconds=10):
+        self.bucket_seconds = bucket_seconds
+        self._buckets = deque(maxlen=span // bucket_seconds + 1)  # [bucket number, count]
+
+    def add(self, count=1, now=None):
+        bucket = int((now or time.time()) // self.bucket_seconds)
+        if self._buckets and self._buckets[-1][0] == bucket:
+            self._buckets[-1][1] += count
+        else:
+            self._buckets.append([bucket, count])
+
+    def total(self, window, now=None):
+        """Events in the last `window` seconds"""
+        first = int(((now or time.time()) - window) // self.bucket_seconds) + 1
+        return sum(count for bucket, count in self._buckets if bucket >= first)
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram of per-CNR latencies, in seconds"""
+
+    BOUNDS = (0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+
+    def __init__(self, counts=None, total=0.0):
+        self.counts = list(counts) if counts else [0] * (len(self.BOUNDS) + 1)
+        self.total = total
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def observe(self, seconds):
+        self.counts[bisect_left(self.BOUNDS, seconds)] += 1
+        self.total += seconds
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile (inf past the last bound), or None if empty"""
+        if not self.count:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for bound, count in zip(self.BOUNDS + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+
+    def as_dict(self):
+        return {'counts': list(self.counts), 'total': self.total}
+
+
+class OutcomeLog:
+    """Append-only log of every CNR's outcome, one 'timestamp<TAB>outcome<TAB>cnr' line each"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def write(self, outcome, cnr):
+        if self._file is None:
+            log_dir = os.path.dirname(self.path)
+            if log_dir:
+                os.makedirs(log_dir, exist_ok=True)
+            self._file = open(self.path, 'a', buffering=1)  # line buffered, so a crash loses nothing
+        self._file.write(f"{datetime.now().isoformat(timespec='seconds')}\t{outcome}\t{cnr}\n")
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+class MemoryWatchdog:
+    """
+    Watches the process's resident memory: logs a warning past warn_mb and
+    reports True from check() past limit_mb (0 disables the limit), at most
+    once every `interval` seconds.
+    """
+
+    def __init__(self, warn_mb=None, limit_mb=None, interval=None):
+        self.warn_mb = CRAWL_STATS['memory_warn_mb'] if warn_mb is None else warn_mb
+        self.limit_mb = CRAWL_STATS['memory_limit_mb'] if limit_mb is None else limit_mb
+        self.interval = CRAWL_STATS['memory_check_interval'] if interval is None else interval
+        self._process = psutil.Process()
+        self._last_check = time.monotonic()
+
+    def rss_mb(self):
+        return self._process.memory_info().rss / (1024 * 1024)
+
+    def check(self):
+        now = time.monotonic()
+        if now - self._last_check < self.interval:
+            return False
+        self._last_check = now
+        rss = self.rss_mb()
+        if self.limit_mb and rss >= self.limit_mb:
+            logging.error(f"Memory use {rss:.0f} MiB is past the {self.limit_mb} MiB limit")
+            return True
+        if self.warn_mb and rss >= self.warn_mb:
+            logging.warning(f"Memory use {rss:.0f} MiB is past {self.warn_mb} MiB")
+        return False
+
+
+class CrawlStats:
+    """
+    Run statistics that stay the same size however long the crawl runs.
+
+    Totals are plain counters, recent rates come from RollingCounters over
+    each of `windows` seconds, and latencies go into a LatencyHistogram.
+    Which CNR had which outcome is appended to an OutcomeLog on disk rather
+    than kept in memory. Reading stats['successful'] etc. gives the totals.
+    """
+
+    def __init__(self, outcome_log=None, windows=None, watchdog=None):
+        self.start_time = time.time()
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.windows = tuple(windows or CRAWL_STATS['windows'])
+        self.latency = LatencyHistogram()
+        self.outcome_log = outcome_log
+        self.outcome_logs = [outcome_log.path] if outcome_log else []
+        self.watchdog = watchdog
+        self.memory_exceeded = False
+        self._recent = {outcome: RollingCounter(max(self.windows)) for outcome in OUTCOMES}
+        self._fixed_rates = None
+
+    def __getitem__(self, key):
+        return self.counters[key]
+
+    def attempted(self, count=1):
+        self.counters['total_attempted'] += count
+
+    def record(self, outcome, cnr):
+        self.counters[outcome] += 1
+        self._recent[outcome].add()
+        CASES.inc(outcome=outcome)
+        if self.outcome_log:
+            self.outcome_log.write(outcome, cnr)
+        if self.watchdog and self.watchdog.check():
+            # Tells the crawl loops to wind down so the process can be restarted with a clean heap
+            self.memory_exceeded = True
+
+    def observe_latency(self, seconds):
+        self.latency.observe(seconds)
+
+    def rates(self):
+        """{window seconds: {outcome: CNRs per minute over that window}}"""
+        if self._fixed_rates is not None:
+            return self._fixed_rates
+        now = time.time()
+        elapsed = max(now - self.start_time, 1.0)
+        return {window: {outcome: counter.total(window, now) * 60 / min(window, elapsed)
+                         for outcome, counter in self._recent.items()}
+                for window in self.windows}
+
+    def report(self, finished=False):
+        """Everything a supervisor needs to combine this with other workers' stats"""
+        return {
+            'finished': finished,
+            'counters': dict(self.counters),
+            'latency': self.latency.as_dict(),
+            'rates': self.rates(),
+            'outcome_log': self.outcome_log.path if self.outcome_log else None,
+            'memory_exceeded': self.memory_exceeded
+        }
+
+    @classmethod
+    def from_reports(cls, reports, start_time):
+        """Combine the report() of several workers"""
+        stats = cls()
+        stats.start_time = start_time
+        rates = {}
+        for report in reports:
+            for key, value in report['counters'].items():
+                stats.counters[key] += value
+            stats.latency.merge(LatencyHistogram(**report['latency']))
+            # A worker that has stopped no longer adds to the current rate
+            for window, outcome_rates in ({} if report['finished'] else report['rates']).items():
+                combined = rates.setdefault(window, dict.fromkeys(OUTCOMES, 0.0))
+                for outcome, rate in outcome_rates.items():
+                    combined[outcome] += rate
+            if report['outcome_log'] and report['outcome_log'] not in stats.outcome_logs:
+                stats.outcome_logs.append(report['outcome_log'])
+        stats._fixed_rates = rates
+        return stats
+
+    def close(self):
+        if self.outcome_log:
+            self.outcome_log.close()
@@ -12,28 +12,176 @@ import json
 import mysql.connector
 from mysql.connector import Error
 import re
+import sqlite3
+import time
+from collections import OrderedDict
 
-from config.settings import MYSQL_DATABASE
+from config.settings import DB_WRITER, DIMENSION_CACHE, LEASES, MYSQL_DATABASE
+from src.case_records import CaseRecord
+from src.cnr_frontier import MAX_SERIAL
+from src.metrics import DB_STATEMENTS, DB_STATEMENTS_PER_CASE, QUEUE_DEPTH, STAGE_SECONDS
+from src.tracing import span
+
+# Child tables of a case and the columns written after case_id. executemany()
+# sends each table as one multi-row INSERT; timestamps are bound as parameters
+# so every row written together carries the same time.
+CASE_CHILD_COLUMNS = {
+    'case_litigants': ('litigant_id', 'advocate_id', 'party_type', 'created_at', 'updated_at'),
+    'case_acts': ('act_id', 'act_section_id', 'created_at', 'updated_at'),
+    'case_history': ('judge', 'business_date', 'hearing_date', 'purpose', 'created_at', 'updated_at'),
+    'case_transfers': ('registration_number', 'transfer_date', 'from_court', 'to_court', 'created_at', 'updated_at'),
+    'case_ias': ('ia_no', 'classification', 'ia_status', 'dt_filing', 'dt_reg', 'ia_party_id', 'party',
+                 'status', 'created_at', 'updated_at'),
+}
+
+# Dimensions resolved in bulk for a whole batch of cases: table, ID column and
+# natural key column. Only acts and sections have a unique key on that column,
+# so the others are looked up before inserting to avoid duplicate rows.
+BULK_DIMENSIONS = {
+    'act': {'table': 'acts', 'id': 'id', 'key': 'name', 'unique': True},
+    'section': {'table': 'sections', 'id': 'section_id', 'key': 'section_number', 'unique': True},
+    'advocate': {'table': 'advocates', 'id': 'advocate_id', 'key': 'advocate_name', 'unique': False},
+    'litigant': {'table': 'litigants', 'id': 'litigant_id', 'key': 'litigant_name', 'unique': False},
+}
+
+INSERT_CASE_QUERY = """
+    INSERT INTO cases (
+        cnr_number, case_type_id, filing_number, filing_date,
+        registration_number, registration_date, case_status,
+        first_hearing_date, decision_date, disposal_date,
+        disposal_nature, court_hall_id, created_at, updated_at
+    ) VALUES (
+        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+    )
+"""
+
+class DimensionCache:
+    """
+    Maps a dimension's natural key (name, or name plus parent IDs) to its row ID.
+
+    IDs learnt inside a transaction are staged and only become visible to other
+    transactions on commit(), so a rollback can never leave the cache pointing
+    at rows that were never written. With max_size set, the least recently used
+    keys are evicted first.
+    """
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        self._ids = OrderedDict()
+        self._staged = {}
+
+    def get(self, key):
+        if key in self._staged:
+            return self._staged[key]
+        value = self._ids.get(key)
+        if value is not None and self.max_size:
+            self._ids.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        if value is not None:
+            self._staged[key] = value
+
+    def preload(self, items):
+        """Fill with committed (key, id) pairs; the first ID seen for a key wins"""
+        for key, value in items:
+            if key not in self._ids:
+                self._ids[key] = value
+        self._evict()
+
+    def commit(self):
+        self._ids.update(self._staged)
+        self._staged = {}
+        self._evict()
+
+    def rollback(self):
+        self._staged = {}
+
+    def _evict(self):
+        while self.max_size and len(self._ids) > self.max_size:
+            self._ids.popitem(last=False)
+
+    def __len__(self):
+        return len(self._ids)
+
+STATEMENT_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE|TABLE)\s+`?(\w+)', re.IGNORECASE)
+
+def _statement_label(operation):
+    """'INSERT case_history' and the like: enough to tell statements apart in a trace"""
+    words = operation.split(None, 1)
+    table = STATEMENT_TABLE.search(operation)
+    return ' '.join(filter(None, [words[0].upper() if words else '', table.group(1) if table else '']))
+
+class CountingCursor:
+    """
+    Wraps a cursor, counting and tracing the statements sent through it;
+    everything else passes straight through.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.statements = 0
+
+    def execute(self, operation, *args, **kwargs):
+        self.statements += 1
+        DB_STATEMENTS.inc()
+        with span('sql', statement=_statement_label(operation)):
+            return self._cursor.execute(operation, *args, **kwargs)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        self.statements += 1
+        DB_STATEMENTS.inc()
+        with span('sql', statement=_statement_label(operation), rows=len(seq_params)):
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
 
 class Database:
     def __init__(self):
         """Initialize database connection"""
         try:
-            self.connection = mysql.connector.connect(
-                host="localhost",
-                user="root",
-                password="password",
-                database="ecourts",
-                consume_results=True  # Auto-consume unread results
-            )
-            self.cursor = self.connection.cursor(dictionary=True)
+            self.connection = self._connect()
+            self.cursor = CountingCursor(self.connection.cursor(dictionary=True))
             self.setup_database()
             self.create_tables()  # Create tables after database setup
             logging.info("Database tables created successfully")
+            self.check_cnr_index()
+            
+            # Lookup tables rarely change, so their IDs are kept in memory
+            self.dimension_caches = {
+                'state_district': DimensionCache(),
+                'court': DimensionCache(),
+                'court_hall': DimensionCache(),
+                'case_type': DimensionCache(),
+                'act': DimensionCache(),
+                'section': DimensionCache(),
+                'act_section': DimensionCache(),
+                'litigant': DimensionCache(DIMENSION_CACHE['max_litigants']),
+                'advocate': DimensionCache(DIMENSION_CACHE['max_advocates']),
+            }
+            if DIMENSION_CACHE['preload']:
+                self.preload_dimension_caches()
         except Error as e:
             logging.error(f"Error connecting to MySQL: {e}")
             raise
 
+    @staticmethod
+    def _connect():
+        return mysql.connector.connect(
+            host="localhost",
+            user="root",
+            password="password",
+            database="ecourts",
+            consume_results=True  # Auto-consume unread results
+        )
+
+    def open_leases(self, streams, ends=None):
+        """CrawlLeases over the given (establishment, year) streams, on a connection of their own"""
+        connection = self._connect()
+        connection.autocommit = True
+        return CrawlLeases(connection, streams, ends)
+
     def setup_database(self):
         """Create database tables if they don't exist"""
         try:
@@ -58,6 +206,38 @@ class Database:
             logging.error(f"Error setting up database: {e}")
             raise
 
+    def preload_dimension_caches(self):
+        """Load the small lookup tables into the dimension caches"""
+        preload_queries = {
+            'court': ("SELECT id, name, state_id, district_id FROM courts ORDER BY id",
+                      lambda row: (row['name'], row['state_id'], row['district_id'])),
+            'court_hall': ("SELECT id, name, court_id FROM court_halls ORDER BY id",
+                           lambda row: (row['name'], row['court_id'])),
+            'case_type': ("SELECT case_type_id AS id, short_form FROM case_types ORDER BY case_type_id",
+                          lambda row: row['short_form']),
+            'act': ("SELECT id, name FROM acts", lambda row: row['name']),
+            'section': ("SELECT section_id AS id, section_number FROM sections", lambda row: row['section_number']),
+            'act_section': ("SELECT id, act_id, section_id FROM act_sections",
+                            lambda row: (row['act_id'], row['section_id'])),
+        }
+        for name, (query, key) in preload_queries.items():
+            self.cursor.execute(query)
+            self.dimension_caches[name].preload((key(row), row['id']) for row in self.cursor.fetchall())
+        logging.info("Preloaded dimension caches: " + ", ".join(
+            f"{name}={len(self.dimension_caches[name])}" for name in preload_queries))
+
+    def _commit(self):
+        """Commit the transaction and publish the dimension IDs it created"""
+        self.connection.commit()
+        for cache in self.dimension_caches.values():
+            cache.commit()
+
+    def _rollback(self):
+        """Roll back the transaction and forget the dimension IDs it created"""
+        self.connection.rollback()
+        for cache in self.dimension_caches.values():
+            cache.rollback()
+
     def _parse_date(self, date_str):
         """Parse date string into MySQL format"""
         if not date_str:
@@ -101,13 +281,19 @@ class Database:
         short_form = parts[0].strip()
         expanded_form = parts[1].strip() if len(parts) > 1 else None
         
+        cache = self.dimension_caches['case_type']
+        case_type_id = cache.get(short_form)
+        if case_type_id:
+            return case_type_id
+        
         query = "INSERT IGNORE INTO case_types (short_form, expanded_form) VALUES (%s, %s)"
         self.cursor.execute(query, (short_form, expanded_form))
-        self.connection.commit()
         
         self.cursor.execute("SELECT case_type_id FROM case_types WHERE short_form = %s", (short_form,))
         result = self.cursor.fetchone()
-        return result['case_type_id'] if result else None
+        case_type_id = result['case_type_id'] if result else None
+        cache.put(short_form, case_type_id)
+        return case_type_id
 
     def _clean_litigant_name(self, name):
         """Clean litigant name by removing special characters and extra whitespace"""
@@ -139,13 +325,17 @@ class Database:
         state_name = "Kerala"  # Static for now as per requirement
         district_name = "Kannur"  # Static for now as per requirement
         
+        cache = self.dimension_caches['state_district']
+        ids = cache.get((state_name, district_name))
+        if ids:
+            return ids
+        
         # Insert state if not exists
         query = """
             INSERT IGNORE INTO states (name, created_at, updated_at)
             VALUES (%s, NOW(), NOW())
         """
         self.cursor.execute(query, (state_name,))
-        self.connection.commit()
         
         # Get state ID
         self.cursor.execute("SELECT id FROM states WHERE name = %s", (state_name,))
@@ -157,12 +347,12 @@ class Database:
             VALUES (%s, %s, NOW(), NOW())
         """
         self.cursor.execute(query, (district_name, state_id))
-        self.connection.commit()
         
         # Get district ID
         self.cursor.execute("SELECT id FROM districts WHERE name = %s", (district_name,))
         district_id = self.cursor.fetchone()['id']
         
+        cache.put((state_name, district_name), (state_id, district_id))
         return state_id, district_id
 
     def _get_or_create_court(self, court_name, state_id, district_id):
@@ -173,19 +363,25 @@ class Database:
         # Category ID for District Courts is 3
         category_id = 3
         
+        cache = self.dimension_caches['court']
+        court_id = cache.get((court_name, state_id, district_id))
+        if court_id:
+            return court_id
+        
         query = """
             INSERT IGNORE INTO courts (name, state_id, district_id, category_id, created_at, updated_at)
             VALUES (%s, %s, %s, %s, NOW(), NOW())
         """
         self.cursor.execute(query, (court_name, state_id, district_id, category_id))
-        self.connection.commit()
         
         self.cursor.execute(
             "SELECT id FROM courts WHERE name = %s AND state_id = %s AND district_id = %s",
             (court_name, state_id, district_id)
         )
         result = self.cursor.fetchone()
-        return result['id'] if result else None
+        court_id = result['id'] if result else None
+        cache.put((court_name, state_id, district_id), court_id)
+        return court_id
 
     def _get_or_create_court_hall(self, court_number_and_judge, court_id):
         """Get or create court hall and return its ID and judge name"""
@@ -198,19 +394,25 @@ class Database:
             court_hall_number = match.group(1)
             judge_name = match.group(2).strip()
             
+            cache = self.dimension_caches['court_hall']
+            court_hall_id = cache.get((court_hall_number, court_id))
+            if court_hall_id:
+                return court_hall_id, judge_name
+            
             query = """
                 INSERT IGNORE INTO court_halls (name, court_id, created_at, updated_at)
                 VALUES (%s, %s, NOW(), NOW())
             """
             self.cursor.execute(query, (court_hall_number, court_id))
-            self.connection.commit()
             
             self.cursor.execute(
                 "SELECT id FROM court_halls WHERE name = %s AND court_id = %s",
                 (court_hall_number, court_id)
             )
             result = self.cursor.fetchone()
-            return result['id'] if result else None, judge_name
+            court_hall_id = result['id'] if result else None
+            cache.put((court_hall_number, court_id), court_hall_id)
+            return court_hall_id, judge_name
         return None, None
 
     def _get_or_create_litigant(self, name):
@@ -224,19 +426,25 @@ class Database:
             if not cleaned_name:
                 return None
             
+            cache = self.dimension_caches['litigant']
+            litigant_id = cache.get(cleaned_name)
+            if litigant_id:
+                return litigant_id
+            
             # Check if litigant exists
             query = "SELECT litigant_id FROM litigants WHERE litigant_name = %s"
             self.cursor.execute(query, (cleaned_name,))
             result = self.cursor.fetchone()
             
             if result:
-                return result['litigant_id']
-            
-            # Create new litigant
-            query = "INSERT INTO litigants (litigant_name) VALUES (%s)"
-            self.cursor.execute(query, (cleaned_name,))
-            self.connection.commit()
-            return self.cursor.lastrowid
+                litigant_id = result['litigant_id']
+            else:
+                # Create new litigant
+                query = "INSERT INTO litigants (litigant_name) VALUES (%s)"
+                self.cursor.execute(query, (cleaned_name,))
+                litigant_id = self.cursor.lastrowid
+            cache.put(cleaned_name, litigant_id)
+            return litigant_id
             
         except Exception as e:
             logging.error(f"Error in _get_or_create_litigant: {e}")
@@ -247,13 +455,63 @@ class Database:
         if not name:
             return None
             
+        cache = self.dimension_caches['advocate']
+        advocate_id = cache.get(name)
+        if advocate_id:
+            return advocate_id
+        
         query = "INSERT IGNORE INTO advocates (advocate_name) VALUES (%s)"
         self.cursor.execute(query, (name,))
-        self.connection.commit()
         
         self.cursor.execute("SELECT advocate_id FROM advocates WHERE advocate_name = %s", (name,))
         result = self.cursor.fetchone()
-        return result['advocate_id'] if result else None
+        advocate_id = result['advocate_id'] if result else None
+        cache.put(name, advocate_id)
+        return advocate_id
+
+    def _normalize_act_name(self, act_name):
+        """Bring an act name to the form stored in acts.name ("Name, Year")"""
+        # Convert to string if needed
+        if isinstance(act_name, (int, float)):
+            act_name = str(act_name)
+        elif not isinstance(act_name, str):
+            try:
+                act_name = str(act_name)
+            except:
+                return None
+        
+        # Clean up act name
+        act_name = act_name.strip()
+        
+        # Remove trailing backslash and whitespace
+        act_name = act_name.rstrip('\\').strip()
+        
+        # Handle act name with year - combine them properly
+        parts = [part.strip() for part in act_name.split(',')]
+        if len(parts) > 1 and parts[1].strip().isdigit():
+            act_name = f"{parts[0].strip()}, {parts[1].strip()}"
+        else:
+            # Check if the act name contains a year at the end
+            parts = act_name.split()
+            if len(parts) > 1 and parts[-1].isdigit():
+                year = parts[-1]
+                name = ' '.join(parts[:-1])
+                act_name = f"{name}, {year}"
+        return act_name
+
+    def _normalize_section_number(self, section_number):
+        """Bring a section number to the form stored in sections.section_number"""
+        # Convert to string if needed
+        if isinstance(section_number, (int, float)):
+            section_number = str(section_number)
+        elif not isinstance(section_number, str):
+            try:
+                section_number = str(section_number)
+            except:
+                return None
+        
+        # Clean up section number
+        return section_number.strip()
 
     def _get_or_create_act(self, act_name):
         """Get or create act and return its ID"""
@@ -261,32 +519,14 @@ class Database:
             return None
             
         try:
-            # Convert to string if needed
-            if isinstance(act_name, (int, float)):
-                act_name = str(act_name)
-            elif not isinstance(act_name, str):
-                try:
-                    act_name = str(act_name)
-                except:
-                    return None
-            
-            # Clean up act name
-            act_name = act_name.strip()
-            
-            # Remove trailing backslash and whitespace
-            act_name = act_name.rstrip('\\').strip()
-            
-            # Handle act name with year - combine them properly
-            parts = [part.strip() for part in act_name.split(',')]
-            if len(parts) > 1 and parts[1].strip().isdigit():
-                act_name = f"{parts[0].strip()}, {parts[1].strip()}"
-            else:
-                # Check if the act name contains a year at the end
-                parts = act_name.split()
-                if len(parts) > 1 and parts[-1].isdigit():
-                    year = parts[-1]
-                    name = ' '.join(parts[:-1])
-                    act_name = f"{name}, {year}"
+            act_name = self._normalize_act_name(act_name)
+            if not act_name:
+                return None
+                
+            cache = self.dimension_caches['act']
+            act_id = cache.get(act_name)
+            if act_id:
+                return act_id
                 
             current_timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                 
@@ -296,11 +536,12 @@ class Database:
                 ON DUPLICATE KEY UPDATE id=LAST_INSERT_ID(id), updated_at=%s
             """
             self.cursor.execute(query, (act_name, current_timestamp, current_timestamp, current_timestamp))
-            self.connection.commit()
             
             self.cursor.execute("SELECT id FROM acts WHERE name = %s", (act_name,))
             result = self.cursor.fetchone()
-            return result['id'] if result else None
+            act_id = result['id'] if result else None
+            cache.put(act_name, act_id)
+            return act_id
             
         except Exception as e:
             logging.error(f"Error in _get_or_create_act: {e}")
@@ -312,17 +553,14 @@ class Database:
             return None
             
         try:
-            # Convert to string if needed
-            if isinstance(section_number, (int, float)):
-                section_number = str(section_number)
-            elif not isinstance(section_number, str):
-                try:
-                    section_number = str(section_number)
-                except:
-                    return None
+            section_number = self._normalize_section_number(section_number)
+            if not section_number:
+                return None
             
-            # Clean up section number
-            section_number = section_number.strip()
+            cache = self.dimension_caches['section']
+            section_id = cache.get(section_number)
+            if section_id:
+                return section_id
             
             query = """
                 INSERT INTO sections (section_number, created_at, updated_at)
@@ -330,11 +568,12 @@ class Database:
                 ON DUPLICATE KEY UPDATE section_id=LAST_INSERT_ID(section_id)
             """
             self.cursor.execute(query, (section_number,))
-            self.connection.commit()
             
             self.cursor.execute("SELECT section_id FROM sections WHERE section_number = %s", (section_number,))
             result = self.cursor.fetchone()
-            return result['section_id'] if result else None
+            section_id = result['section_id'] if result else None
+            cache.put(section_number, section_id)
+            return section_id
             
         except Exception as e:
             logging.error(f"Error in _get_or_create_section: {e}")
@@ -351,6 +590,11 @@ class Database:
             if not section_id:
                 return None
             
+            cache = self.dimension_caches['act_section']
+            act_section_id = cache.get((act_id, section_id))
+            if act_section_id:
+                return act_section_id
+            
             current_timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                 
             query = """
@@ -359,223 +603,367 @@ class Database:
                 ON DUPLICATE KEY UPDATE id=LAST_INSERT_ID(id), updated_at=%s
             """
             self.cursor.execute(query, (act_id, section_id, current_timestamp, current_timestamp, current_timestamp))
-            self.connection.commit()
             
             self.cursor.execute(
                 "SELECT id FROM act_sections WHERE act_id = %s AND section_id = %s",
                 (act_id, section_id)
             )
             result = self.cursor.fetchone()
-            return result['id'] if result else None
+            act_section_id = result['id'] if result else None
+            cache.put((act_id, section_id), act_section_id)
+            return act_section_id
             
         except Exception as e:
             logging.error(f"Error in _get_or_create_act_section: {e}")
             return None
 
-    def insert_case(self, case_details):
-        """Insert case details into database"""
-        try:
-            # Log case details for debugging
-            logging.debug(f"Case details: {json.dumps(case_details, indent=2, default=str)}")
-            
-            # Get state and district IDs from CNR
-            state_id, district_id = self._get_or_create_state_district(case_details['cnr_number'])
-            
-            # Get or create court using the court name from case details
-            court_id = self._get_or_create_court(case_details['court_name'], state_id, district_id)
-            
-            # Get or create court hall and judge
-            court_hall_id, judge_name = self._get_or_create_court_hall(
-                case_details['court_number_and_judge'],
-                court_id
+    def _split_acts_and_sections(self, case_details):
+        """Pair each act in under_acts with the matching section in under_sections"""
+        # Convert acts to string if needed
+        acts_str = str(case_details['under_acts']) if not isinstance(case_details['under_acts'], str) else case_details['under_acts']
+        acts = [act.strip() for act in acts_str.split(',') if act.strip()]
+        
+        sections = []
+        if case_details['under_sections']:
+            # Convert sections to string if needed
+            sections_str = str(case_details['under_sections']) if not isinstance(case_details['under_sections'], str) else case_details['under_sections']
+            sections = [section.strip() for section in sections_str.split(',') if section.strip()]
+        
+        # Handle case where act might contain the year
+        if len(acts) == 2 and acts[1].isdigit():
+            acts = [f"{acts[0]}, {acts[1]}"]
+        
+        # Ensure sections list is at least as long as acts list
+        while len(sections) < len(acts):
+            sections.append(None)
+        
+        return [(act, section) for act, section in zip(acts, sections) if act]
+
+    def _bulk_get_or_create(self, dimension, keys, now):
+        """
+        Resolve the IDs of many values of one dimension into its cache.
+
+        Values already cached cost nothing; the rest are written with one
+        multi-row INSERT and read back with one SELECT ... IN (...), plus a
+        SELECT beforehand for tables whose key column is not unique.
+        """
+        spec = BULK_DIMENSIONS[dimension]
+        cache = self.dimension_caches[dimension]
+        missing = [key for key in dict.fromkeys(keys) if key and not cache.get(key)]
+        if not missing:
+            return
+        
+        def select_ids(values):
+            placeholders = ', '.join(['%s'] * len(values))
+            self.cursor.execute(
+                f"SELECT {spec['id']} AS id, {spec['key']} AS value FROM {spec['table']} "
+                f"WHERE {spec['key']} IN ({placeholders}) ORDER BY {spec['id']}",
+                values
             )
-            
-            # Get or create case type
-            case_type_id = self._get_or_create_case_type(case_details['case_type'])
-            
-            # Parse dates
-            filing_date = self._parse_date(case_details['filing_date'])
-            registration_date = self._parse_date(case_details['registration_date'])
-            first_hearing_date = self._parse_date(case_details['first_hearing_date'])
-            decision_date = self._parse_date(case_details['decision_date'])
-            disposal_date = self._parse_date(case_details['disposal_date'])
-            
-            # Insert case
-            query = """
-                INSERT INTO cases (
-                    cnr_number, case_type_id, filing_number, filing_date,
-                    registration_number, registration_date, case_status,
-                    first_hearing_date, decision_date, disposal_date,
-                    disposal_nature, court_hall_id, created_at, updated_at
-                ) VALUES (
-                    %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW()
+            found = {}
+            for row in self.cursor.fetchall():
+                found.setdefault(row['value'], row['id'])  # the oldest row wins, as with fetchone()
+            return found
+        
+        if spec['unique']:
+            placeholders = ', '.join(['(%s, %s, %s)'] * len(missing))
+            self.cursor.execute(
+                f"INSERT INTO {spec['table']} ({spec['key']}, created_at, updated_at) VALUES {placeholders} "
+                f"ON DUPLICATE KEY UPDATE updated_at = VALUES(updated_at)",
+                [value for key in missing for value in (key, now, now)]
+            )
+            found = select_ids(missing)
+        else:
+            found = select_ids(missing)
+            new_keys = [key for key in missing if key not in found]
+            if new_keys:
+                placeholders = ', '.join(['(%s)'] * len(new_keys))
+                self.cursor.execute(
+                    f"INSERT INTO {spec['table']} ({spec['key']}) VALUES {placeholders}", new_keys
                 )
-            """
-            self.cursor.execute(query, (
-                case_details['cnr_number'], case_type_id, case_details['filing_number'],
-                filing_date, case_details['registration_number'], registration_date,
-                case_details['case_status'], first_hearing_date, decision_date,
-                disposal_date, case_details['disposal_nature'], court_hall_id
+                found.update(select_ids(new_keys))
+        
+        # Values the collation matched to a differently written row are left
+        # uncached; the per-value helper resolves them later
+        for key in missing:
+            cache.put(key, found.get(key))
+
+    def _bulk_get_or_create_act_sections(self, pairs, now):
+        """Resolve (act_id, section_id) pairs into the act_section cache in two statements"""
+        cache = self.dimension_caches['act_section']
+        missing = [pair for pair in dict.fromkeys(pairs) if not cache.get(pair)]
+        if not missing:
+            return
+        values = [value for pair in missing for value in pair]
+        placeholders = ', '.join(['(%s, %s, %s, %s)'] * len(missing))
+        self.cursor.execute(
+            f"INSERT INTO act_sections (act_id, section_id, created_at, updated_at) VALUES {placeholders} "
+            f"ON DUPLICATE KEY UPDATE updated_at = VALUES(updated_at)",
+            [value for act_id, section_id in missing for value in (act_id, section_id, now, now)]
+        )
+        placeholders = ', '.join(['(%s, %s)'] * len(missing))
+        self.cursor.execute(
+            f"SELECT id, act_id, section_id FROM act_sections WHERE (act_id, section_id) IN ({placeholders})",
+            values
+        )
+        for row in self.cursor.fetchall():
+            cache.put((row['act_id'], row['section_id']), row['id'])
+
+    def _resolve_dimensions(self, batch, now):
+        """
+        Resolve the acts, sections, advocates and litigants of a batch of cases.
+
+        Distinct values are collected across the batch and each dimension is
+        resolved in bulk, so _prepare_case then finds every ID in the caches
+        and dimension work costs a fixed number of round trips per batch.
+        """
+        acts = []
+        sections = []
+        act_sections = []
+        advocates = []
+        litigants = []
+        for case_details in batch:
+            for name_key, advocate_key in (('petitioner_name', 'petitioner_advocate'),
+                                           ('respondent_name', 'respondent_advocate')):
+                if case_details[name_key]:
+                    # _prepare_case cleans the name and _get_or_create_litigant cleans it again
+                    litigants.append(self._clean_litigant_name(self._clean_litigant_name(case_details[name_key])))
+                    advocates.append(case_details[advocate_key])
+            for ia in case_details.get('ia_details') or []:
+                if ia.get('party'):
+                    litigants.append(self._clean_litigant_name(str(ia['party'])))
+            if case_details['under_acts']:
+                for act, section in self._split_acts_and_sections(case_details):
+                    act_name = self._normalize_act_name(act)
+                    section_number = self._normalize_section_number(section) if section else None
+                    acts.append(act_name)
+                    sections.append(section_number)
+                    if act_name and section_number:
+                        act_sections.append((act_name, section_number))
+        
+        self._bulk_get_or_create('act', acts, now)
+        self._bulk_get_or_create('section', sections, now)
+        self._bulk_get_or_create('advocate', advocates, now)
+        self._bulk_get_or_create('litigant', litigants, now)
+        
+        act_cache = self.dimension_caches['act']
+        section_cache = self.dimension_caches['section']
+        pairs = [(act_cache.get(act_name), section_cache.get(section_number))
+                 for act_name, section_number in act_sections]
+        self._bulk_get_or_create_act_sections([pair for pair in pairs if all(pair)], now)
+
+    def _prepare_case(self, case_details, now):
+        """
+        Resolve every dimension a case refers to and build its rows.
+
+        Returns the `cases` row and the child rows, each still without case_id,
+        so that callers can insert them with as few statements as possible.
+        """
+        # Get state and district IDs from CNR
+        state_id, district_id = self._get_or_create_state_district(case_details['cnr_number'])
+        
+        # Get or create court using the court name from case details
+        court_id = self._get_or_create_court(case_details['court_name'], state_id, district_id)
+        
+        # Get or create court hall and judge
+        court_hall_id, judge_name = self._get_or_create_court_hall(
+            case_details['court_number_and_judge'],
+            court_id
+        )
+        
+        # Get or create case type
+        case_type_id = self._get_or_create_case_type(case_details['case_type'])
+        
+        case_row = (
+            case_details['cnr_number'], case_type_id, case_details['filing_number'],
+            self._parse_date(case_details['filing_date']), case_details['registration_number'],
+            self._parse_date(case_details['registration_date']), case_details['case_status'],
+            self._parse_date(case_details['first_hearing_date']), self._parse_date(case_details['decision_date']),
+            self._parse_date(case_details['disposal_date']), case_details['disposal_nature'], court_hall_id,
+            now, now
+        )
+        
+        # Petitioner, respondent and their advocates
+        litigant_rows = []
+        for party_type, name_key, advocate_key in (('Petitioner', 'petitioner_name', 'petitioner_advocate'),
+                                                   ('Respondent', 'respondent_name', 'respondent_advocate')):
+            if case_details[name_key]:
+                litigant_id = self._get_or_create_litigant(self._clean_litigant_name(case_details[name_key]))
+                advocate_id = self._get_or_create_advocate(case_details[advocate_key])
+                litigant_rows.append((litigant_id, advocate_id, party_type, now, now))
+        
+        # Acts and sections
+        act_rows = []
+        if case_details['under_acts']:
+            try:
+                for act, section in self._split_acts_and_sections(case_details):
+                    act_id = self._get_or_create_act(act)
+                    if act_id:
+                        act_section_id = self._get_or_create_act_section(act_id, section) if section else None
+                        act_rows.append((act_id, act_section_id, now, now))
+            except Exception as e:
+                logging.error(f"Error processing acts and sections: {e}")
+        
+        history_rows = [
+            (entry['judge'], self._parse_date(entry['business_date']), self._parse_date(entry['hearing_date']),
+             entry['purpose'], now, now)
+            for entry in case_details['case_history'] or []
+        ]
+        
+        transfer_rows = [
+            (transfer['registration_number'], self._parse_date(transfer['transfer_date']),
+             transfer['from_court'], transfer['to_court'], now, now)
+            for transfer in case_details['transfer_details'] or []
+        ]
+        
+        ia_rows = []
+        for ia in case_details.get('ia_details') or []:
+            # Get or create litigant for IA party
+            ia_party_id = None
+            party_name = None
+            if ia.get('party'):
+                party_name = str(ia['party'])  # Convert to string if it's a number
+                ia_party_id = self._get_or_create_litigant(party_name)
+            ia_rows.append((
+                ia['ia_no'], ia.get('classification', 'General'), ia['ia_status'],
+                self._parse_date(ia.get('dt_filing')),
+                self._parse_date(ia.get('next_date')),  # Use next_date as dt_reg
+                ia_party_id, party_name, ia.get('ia_status', ''), now, now
             ))
-            self.connection.commit()
-            
-            # Get case ID
-            self.cursor.execute("SELECT LAST_INSERT_ID() as id")
-            case_id = self.cursor.fetchone()['id']
-            
-            # Insert petitioner and advocate
-            if case_details['petitioner_name']:
-                petitioner_id = self._get_or_create_litigant(
-                    self._clean_litigant_name(case_details['petitioner_name'])
-                )
-                petitioner_advocate_id = self._get_or_create_advocate(case_details['petitioner_advocate'])
-                
-                # Insert into case_litigants
-                query = """
-                    INSERT INTO case_litigants (
-                        case_id, litigant_id, advocate_id, party_type,
-                        created_at, updated_at
-                    ) VALUES (%s, %s, %s, %s, NOW(), NOW())
-                """
-                self.cursor.execute(query, (
-                    case_id, petitioner_id, petitioner_advocate_id, 'Petitioner'
-                ))
-                self.connection.commit()
-            
-            # Insert respondent and advocate
-            if case_details['respondent_name']:
-                respondent_id = self._get_or_create_litigant(
-                    self._clean_litigant_name(case_details['respondent_name'])
+        
+        return {
+            'case': case_row,
+            'case_litigants': litigant_rows,
+            'case_acts': act_rows,
+            'case_history': history_rows,
+            'case_transfers': transfer_rows,
+            'case_ias': ia_rows
+        }
+
+    def _insert_case_children(self, table, rows):
+        """Insert (case_id, *columns) rows into one child table with a single statement"""
+        if not rows:
+            return
+        columns = ('case_id',) + CASE_CHILD_COLUMNS[table]
+        query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+        self.cursor.executemany(query, rows)
+
+    def _delete_cases(self, case_ids):
+        """Delete cases and their child rows, inside the current transaction"""
+        if not case_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(case_ids))
+        for table in CASE_CHILD_COLUMNS:
+            self.cursor.execute(f"DELETE FROM {table} WHERE case_id IN ({placeholders})", case_ids)
+        self.cursor.execute(f"DELETE FROM cases WHERE case_id IN ({placeholders})", case_ids)
+
+    def _delete_stored_cases(self, cnr_numbers):
+        """Delete the cases already stored under these CNRs, so they can be written again"""
+        cnr_numbers = list(dict.fromkeys(cnr_numbers))
+        placeholders = ', '.join(['%s'] * len(cnr_numbers))
+        self.cursor.execute(f"SELECT case_id FROM cases WHERE cnr_number IN ({placeholders})", cnr_numbers)
+        self._delete_cases([row['case_id'] for row in self.cursor.fetchall()])
+
+    def _observe_insert(self, started, statements, cases):
+        """Charge a committed write's time and statements evenly to the cases it saved"""
+        seconds = (time.perf_counter() - started) / cases
+        statements = (self.cursor.statements - statements) / cases
+        for _ in range(cases):
+            STAGE_SECONDS.observe(seconds, stage='insert')
+            DB_STATEMENTS_PER_CASE.observe(statements)
+
+    def insert_case(self, case_details, replace=False):
+        """
+        Insert case details into database.
+
+        The case, its dimensions and every child row are written in one
+        transaction; on any error the whole case is rolled back. cnr_number is
+        unique, so a stored case is only overwritten when replace is set.
+        """
+        started, statements = time.perf_counter(), self.cursor.statements
+        with span('db_write', cnrs=[case_details['cnr_number']]):
+            try:
+                # Log case details for debugging
+                logging.debug(f"Case details: {json.dumps(case_details, indent=2, default=str)}")
+                
+                if replace:
+                    self._delete_stored_cases([case_details['cnr_number']])
+                
+                now = datetime.now()
+                self._resolve_dimensions([case_details], now)
+                prepared = self._prepare_case(case_details, now)
+                
+                # Insert case
+                self.cursor.execute(INSERT_CASE_QUERY, prepared['case'])
+                case_id = self.cursor.lastrowid
+                
+                for table in CASE_CHILD_COLUMNS:
+                    self._insert_case_children(table, [(case_id,) + row for row in prepared[table]])
+                
+                self._commit()
+                self._observe_insert(started, statements, 1)
+                logging.info(f"Successfully saved case {case_details['cnr_number']} to database")
+                return case_id
+                
+            except Exception as e:
+                logging.error(f"Failed to save case {case_details['cnr_number']} to database: {str(e)}")
+                self._rollback()
+                raise
+
+    def insert_cases(self, batch, replace=False):
+        """
+        Insert many cases in one transaction and return their IDs, in order.
+
+        All `cases` rows go out as one multi-row INSERT and each child table as
+        another, so a batch costs a handful of statements however many cases it
+        holds. IDs are mapped back by CNR; if anything fails the whole batch is
+        rolled back. With replace, cases already stored under the same CNRs are
+        deleted first, and a CNR the batch holds more than once is stored once,
+        as its last copy.
+        """
+        if not batch:
+            return []
+        started, statements = time.perf_counter(), self.cursor.statements
+        with span('db_write', cnrs=[case_details['cnr_number'] for case_details in batch]):
+            try:
+                cases = batch
+                if replace:
+                    cases = list({case_details['cnr_number']: case_details for case_details in batch}.values())
+                    self._delete_stored_cases([case_details['cnr_number'] for case_details in cases])
+                
+                now = datetime.now()
+                self._resolve_dimensions(cases, now)
+                prepared = [self._prepare_case(case_details, now) for case_details in cases]
+                
+                self.cursor.executemany(INSERT_CASE_QUERY, [case['case'] for case in prepared])
+                
+                # Auto-increment IDs of a multi-row INSERT are not guaranteed to be
+                # consecutive, so look them up; ordering by ID lets the newest row win
+                cnr_numbers = list({case_details['cnr_number'] for case_details in batch})
+                placeholders = ', '.join(['%s'] * len(cnr_numbers))
+                self.cursor.execute(
+                    f"SELECT case_id, cnr_number FROM cases WHERE cnr_number IN ({placeholders}) ORDER BY case_id",
+                    cnr_numbers
                 )
-                respondent_advocate_id = self._get_or_create_advocate(case_details['respondent_advocate'])
-                
-                # Insert into case_litigants
-                query = """
-                    INSERT INTO case_litigants (
-                        case_id, litigant_id, advocate_id, party_type,
-                        created_at, updated_at
-                    ) VALUES (%s, %s, %s, %s, NOW(), NOW())
-                """
-                self.cursor.execute(query, (
-                    case_id, respondent_id, respondent_advocate_id, 'Respondent'
-                ))
-                self.connection.commit()
-            
-            # Insert acts and sections
-            if case_details['under_acts']:
-                try:
-                    # Convert acts to string if needed
-                    acts_str = str(case_details['under_acts']) if not isinstance(case_details['under_acts'], str) else case_details['under_acts']
-                    acts = [act.strip() for act in acts_str.split(',') if act.strip()]
-                    
-                    sections = []
-                    if case_details['under_sections']:
-                        # Convert sections to string if needed
-                        sections_str = str(case_details['under_sections']) if not isinstance(case_details['under_sections'], str) else case_details['under_sections']
-                        sections = [section.strip() for section in sections_str.split(',') if section.strip()]
-                    
-                    # Handle case where act might contain the year
-                    if len(acts) == 2 and acts[1].isdigit():
-                        acts = [f"{acts[0]}, {acts[1]}"]
-                    
-                    # Ensure sections list is at least as long as acts list
-                    while len(sections) < len(acts):
-                        sections.append(None)
-                    
-                    for act, section in zip(acts, sections):
-                        if act:  # Only process if act is not empty
-                            act_id = self._get_or_create_act(act)
-                            if act_id:
-                                act_section_id = None
-                                if section:
-                                    # Get or create act_section relationship
-                                    act_section_id = self._get_or_create_act_section(act_id, section)
-                                
-                                # Insert case-act relationship
-                                query = """
-                                    INSERT INTO case_acts (
-                                        case_id, act_id, act_section_id, created_at, updated_at
-                                    ) VALUES (%s, %s, %s, NOW(), NOW())
-                                """
-                                self.cursor.execute(query, (case_id, act_id, act_section_id))
-                                self.connection.commit()
-                except Exception as e:
-                    logging.error(f"Error processing acts and sections: {e}")
-            
-            # Insert case history
-            if case_details['case_history']:
-                for entry in case_details['case_history']:
-                    business_date = self._parse_date(entry['business_date'])
-                    hearing_date = self._parse_date(entry['hearing_date'])
-                    
-                    query = """
-                        INSERT INTO case_history (
-                            case_id, judge, business_date, hearing_date,
-                            purpose, created_at, updated_at
-                        ) VALUES (%s, %s, %s, %s, %s, NOW(), NOW())
-                    """
-                    self.cursor.execute(query, (
-                        case_id, entry['judge'], business_date,
-                        hearing_date, entry['purpose']
-                    ))
-                    self.connection.commit()
-            
-            # Insert case transfers
-            if case_details['transfer_details']:
-                for transfer in case_details['transfer_details']:
-                    transfer_date = self._parse_date(transfer['transfer_date'])
-                    
-                    query = """
-                        INSERT INTO case_transfers (
-                            case_id, registration_number, transfer_date,
-                            from_court, to_court, created_at, updated_at
-                        ) VALUES (%s, %s, %s, %s, %s, NOW(), NOW())
-                    """
-                    self.cursor.execute(query, (
-                        case_id, transfer['registration_number'],
-                        transfer_date, transfer['from_court'],
-                        transfer['to_court']
-                    ))
-                    self.connection.commit()
-
-            # Insert IA details
-            if case_details.get('ia_details'):
-                for ia in case_details['ia_details']:
-                    dt_filing = self._parse_date(ia.get('dt_filing'))
-                    dt_reg = self._parse_date(ia.get('next_date'))  # Use next_date as dt_reg
-                    
-                    # Get or create litigant for IA party
-                    ia_party_id = None
-                    party_name = None
-                    if ia.get('party'):
-                        party_name = str(ia['party'])  # Convert to string if it's a number
-                        ia_party_id = self._get_or_create_litigant(party_name)
-                    
-                    query = """
-                        INSERT INTO case_ias (
-                            case_id, ia_no, classification, ia_status,
-                            dt_filing, dt_reg, ia_party_id, party,
-                            status, created_at, updated_at
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
-                    """
-                    self.cursor.execute(query, (
-                        case_id, ia['ia_no'], ia.get('classification', 'General'),
-                        ia['ia_status'], dt_filing, dt_reg,
-                        ia_party_id, party_name, ia.get('ia_status', '')
-                    ))
-                    self.connection.commit()
-                    
-                    # Ensure all results are read
-                    while self.cursor.nextset():
-                        pass
-            
-            logging.info(f"Successfully saved case {case_details['cnr_number']} to database")
-            return case_id
-            
-        except Exception as e:
-            logging.error(f"Failed to save case {case_details['cnr_number']} to database: {str(e)}")
-            self.connection.rollback()
-            raise
+                ids_by_cnr = {row['cnr_number']: row['case_id'] for row in self.cursor.fetchall()}
+                case_ids = [ids_by_cnr[case_details['cnr_number']] for case_details in cases]
+                
+                for table in CASE_CHILD_COLUMNS:
+                    self._insert_case_children(table, [
+                        (case_id,) + row
+                        for case_id, case in zip(case_ids, prepared)
+                        for row in case[table]
+                    ])
+                
+                self._commit()
+                self._observe_insert(started, statements, len(cases))
+                logging.info(f"Successfully saved {len(cases)} cases to database")
+                return [ids_by_cnr[case_details['cnr_number']] for case_details in batch]
+                
+            except Exception as e:
+                logging.error(f"Failed to save batch of {len(batch)} cases to database: {str(e)}")
+                self._rollback()
+                raise
 
     def __del__(self):
         """Close database connection"""
@@ -585,15 +973,116 @@ class Database:
 
     def case_exists(self, cnr_number):
         """Check if a case with the given CNR number already exists in the database"""
+        return cnr_number in self.existing_cnrs([cnr_number])
+
+    def existing_cnrs(self, cnr_numbers):
+        """Return the CNR numbers among cnr_numbers that are already stored, one query per 1000"""
+        cnr_numbers = list(dict.fromkeys(cnr_numbers))
+        existing = set()
         try:
             with self.connection.cursor() as cursor:
-                cursor.execute("SELECT COUNT(*) FROM cases WHERE cnr_number = %s", (cnr_number,))
-                count = cursor.fetchone()[0]
-                return count > 0
+                for start in range(0, len(cnr_numbers), 1000):
+                    chunk = cnr_numbers[start:start + 1000]
+                    placeholders = ', '.join(['%s'] * len(chunk))
+                    cursor.execute(f"SELECT cnr_number FROM cases WHERE cnr_number IN ({placeholders})", chunk)
+                    existing.update(row[0] for row in cursor.fetchall())
         except Exception as e:
-            logging.error(f"Error checking if case exists: {str(e)}")
+            logging.error(f"Error checking which cases exist: {str(e)}")
+        return existing
+
+    def iter_cnrs(self, chunk_size=10000):
+        """Yield the CNR number of every stored case"""
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT cnr_number FROM cases")
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row[0]
+
+    def max_stored_serial(self, establishment, year):
+        """Highest serial stored for an establishment/year (e.g. 'KLKN01', 2019), or 0"""
+        self.cursor.execute(
+            "SELECT MAX(SUBSTRING(cnr_number, 7, 6)) AS serial FROM cases WHERE cnr_number LIKE %s",
+            (f"{establishment}______{year}",)
+        )
+        result = self.cursor.fetchone()
+        return int(result['serial']) if result and result['serial'] else 0
+
+    def _count_duplicate_cnrs(self):
+        self.cursor.execute("""
+            SELECT COUNT(*) AS count FROM (
+                SELECT cnr_number FROM cases GROUP BY cnr_number HAVING COUNT(*) > 1
+            ) AS duplicates
+        """)
+        return self.cursor.fetchone()['count']
+
+    def has_cnr_index(self):
+        """Whether cases.cnr_number carries a unique index"""
+        self.cursor.execute("""
+            SELECT COUNT(*) AS count FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = 'cases'
+              AND column_name = 'cnr_number' AND non_unique = 0
+        """)
+        return self.cursor.fetchone()['count'] > 0
+
+    def check_cnr_index(self):
+        """Warn at startup if cases.cnr_number is not yet uniquely indexed; migrate_cnr_index.py adds the index"""
+        try:
+            if self.has_cnr_index():
+                return True
+            logging.warning("cases.cnr_number has no unique index, so a case can be stored more than once; "
+                            "run python migrate_cnr_index.py")
+        except Exception as e:
+            logging.error(f"Error checking the index on cases.cnr_number: {str(e)}")
+        return False
+
+    def ensure_cnr_index(self):
+        """
+        Add the unique index on cases.cnr_number to tables created before it.
+
+        Tables holding a CNR more than once cannot take the index; they are left
+        alone with a warning until migrate_cnr_index.py removes the duplicates.
+        """
+        try:
+            if self.has_cnr_index():
+                return True
+            duplicates = self._count_duplicate_cnrs()
+            if duplicates:
+                logging.warning(f"{duplicates} CNR numbers are stored more than once, so cases.cnr_number "
+                                f"cannot be indexed; run python migrate_cnr_index.py")
+                return False
+            logging.info("Adding unique index on cases.cnr_number")
+            self.cursor.execute("ALTER TABLE cases ADD UNIQUE KEY unique_cnr_number (cnr_number)")
+            self.connection.commit()
+            return True
+        except Exception as e:
+            logging.error(f"Error adding index on cases.cnr_number: {str(e)}")
             return False
 
+    def remove_duplicate_cases(self, dry_run=False):
+        """
+        Delete every stored copy of a case but the newest, per CNR number.
+
+        Returns the number of cases deleted (or that would be, on a dry run).
+        """
+        self.cursor.execute("""
+            SELECT DISTINCT older.case_id FROM cases older
+            JOIN cases newer ON newer.cnr_number = older.cnr_number AND newer.case_id > older.case_id
+        """)
+        case_ids = [row['case_id'] for row in self.cursor.fetchall()]
+        if dry_run or not case_ids:
+            return len(case_ids)
+        try:
+            for start in range(0, len(case_ids), 1000):
+                self._delete_cases(case_ids[start:start + 1000])
+            self._commit()
+        except Exception:
+            self._rollback()
+            raise
+        return len(case_ids)
+
     def create_tables(self):
         """Create all required database tables if they don't exist."""
         try:
@@ -831,6 +1320,19 @@ class Database:
                     )
                 """)
                 
+                # Create crawl_leases table
+                cursor.execute(CrawlLeases.CREATE_TABLE)
+                
+                # Create crawl_checkpoints table
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS crawl_checkpoints (
+                        worker_key VARCHAR(100) NOT NULL PRIMARY KEY,
+                        high_water VARCHAR(16),
+                        in_flight TEXT,
+                        updated_at TIMESTAMP NULL DEFAULT NULL
+                    )
+                """)
+                
                 # Insert default categories
                 cursor.execute("""
                     INSERT IGNORE INTO categories (name) VALUES 
@@ -846,30 +1348,330 @@ class Database:
             raise
 
     def get_last_case_number(self):
-        """Get the last scraped case number from the database"""
+        """Get the last case number recorded in the legacy last_case_number log"""
         try:
             self.cursor.execute("SELECT cnr_number FROM last_case_number ORDER BY id DESC LIMIT 1")
             result = self.cursor.fetchone()
-            return result[0] if result else None
+            return result['cnr_number'] if result else None
         except Exception as e:
             logging.error(f"Error getting last case number: {str(e)}")
             return None
 
-    def update_last_case_number(self, cnr_number):
-        """Update the last scraped case number in the database"""
+    def load_checkpoint(self, worker_key):
+        """Return (high-water CNR, in-flight CNRs) saved for worker_key, or None if it has none"""
+        try:
+            self.cursor.execute(
+                "SELECT high_water, in_flight FROM crawl_checkpoints WHERE worker_key = %s", (worker_key,)
+            )
+            result = self.cursor.fetchone()
+            self.connection.commit()  # end the read so the next one sees fresh data
+            if not result:
+                return None
+            in_flight = result['in_flight'].split(',') if result['in_flight'] else []
+            return result['high_water'], in_flight
+        except Exception as e:
+            logging.error(f"Error loading checkpoint for {worker_key}: {str(e)}")
+            return None
+
+    def save_checkpoint(self, worker_key, high_water, in_flight):
+        """Replace worker_key's checkpoint: one row per worker, however long it runs"""
         try:
             self.cursor.execute("""
-                INSERT INTO last_case_number (cnr_number) 
-                VALUES (%s) 
-                ON DUPLICATE KEY UPDATE cnr_number = VALUES(cnr_number)
-            """, (cnr_number,))
+                INSERT INTO crawl_checkpoints (worker_key, high_water, in_flight, updated_at)
+                VALUES (%s, %s, %s, NOW())
+                ON DUPLICATE KEY UPDATE high_water = VALUES(high_water), in_flight = VALUES(in_flight),
+                                        updated_at = VALUES(updated_at)
+            """, (worker_key, high_water, ','.join(in_flight)))
             self.connection.commit()
             return True
         except Exception as e:
-            logging.error(f"Error updating last case number: {str(e)}")
+            logging.error(f"Error saving checkpoint for {worker_key}: {str(e)}")
             self.connection.rollback()
             return False
 
+class CaseWriter:
+    """
+    Buffers parsed cases and writes them with Database.insert_cases.
+
+    Buffered cases are held as compact CaseRecords, so a batch costs only its
+    parsed fields whatever else the case dicts carried.
+
+    A batch is flushed once it holds batch_size cases or its oldest case has
+    waited flush_interval_ms; callers poll flush_if_due() between cases so a
+    slow trickle is not held back. on_saved(case_details, case_id, error) is
+    called for every case once its batch has been written. If a batch fails,
+    its cases are retried one by one so a single bad case only loses itself.
+    With replace, cases already stored under the same CNR are overwritten.
+    """
+
+    def __init__(self, db, batch_size=None, flush_interval_ms=None, on_saved=None, replace=False, checkpoint=None):
+        self.db = db
+        self.replace = replace
+        self.batch_size = batch_size or DB_WRITER['batch_size']
+        self.flush_interval = (flush_interval_ms or DB_WRITER['flush_interval_ms']) / 1000.0
+        self.on_saved = on_saved
+        # checkpoint(cnr_numbers) is told which CNRs are done, in the order they finished
+        self.checkpoint = checkpoint
+        self.pending = []
+        self._oldest = None
+        self._progress = []
+        self._unsaved = set()  # CNRs whose save failed; they must stay in flight
+        QUEUE_DEPTH.set_function(lambda: len(self.pending), queue='writer')
+
+    def add(self, case_details):
+        """Queue a case, flushing if the batch is full or has waited long enough"""
+        if not self.pending:
+            self._oldest = time.monotonic()
+        self.pending.append(CaseRecord.from_dict(case_details))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def flush_if_due(self):
+        if self.pending and time.monotonic() - self._oldest >= self.flush_interval:
+            self.flush()
+
+    def advance(self, cnr_number):
+        """
+        Record cnr_number as processed.
+
+        While cases are buffered the checkpoint waits for them to be written, so
+        a crash never moves the checkpoint past cases that were not saved; a
+        case whose save failed is never passed to the checkpoint at all.
+        """
+        if not self.checkpoint:
+            return
+        if self.pending:
+            self._progress.append(cnr_number)
+        else:
+            self._checkpoint_saved([cnr_number])
+
+    def _checkpoint_saved(self, cnr_numbers):
+        saved = [cnr_number for cnr_number in cnr_numbers if cnr_number not in self._unsaved]
+        self._unsaved.difference_update(cnr_numbers)
+        if saved:
+            self.checkpoint(saved)
+
+    def flush(self):
+        """Write every buffered case"""
+        if not self.pending:
+            return
+        batch = [record.as_dict() for record in self.pending]
+        self.pending = []
+        try:
+            results = [(case_details, case_id, None)
+                       for case_details, case_id in zip(batch, self.db.insert_cases(batch, self.replace))]
+        except Exception as e:
+            logging.warning(f"Batch insert failed ({str(e)}); saving {len(batch)} cases one at a time")
+            results = []
+            for case_details in batch:
+                try:
+                    results.append((case_details, self.db.insert_case(case_details, self.replace), None))
+                except Exception as case_error:
+                    results.append((case_details, None, case_error))
+
+        if self.checkpoint:
+            self._unsaved.update(case_details['cnr_number'] for case_details, case_id, _ in results if not case_id)
+        if self._progress:
+            progress, self._progress = self._progress, []
+            self._checkpoint_saved(progress)
+        if self.on_saved:
+            for case_details, case_id, error in results:
+                self.on_saved(case_details, case_id, error)
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+class Lease:
+    """A range of serials of one establishment/year held by a worker"""
+
+    def __init__(self, establishment, year, first_serial, last_serial, next_serial, version, worker_id):
+        self.establishment = establishment
+        self.year = year
+        self.first_serial = first_serial
+        self.last_serial = last_serial
+        self.next_serial = next_serial
+        self.version = version
+        self.worker_id = worker_id
+
+    def __repr__(self):
+        return f"Lease({self.establishment}/{self.year} {self.next_serial}-{self.last_serial}, {self.worker_id})"
+
+
+class CrawlLeases:
+    """
+    Hands out CNR ranges to workers on any number of hosts through the crawl_leases table.
+
+    Each row is a range of lease_size serials of one establishment/year. A
+    worker claims a range, heartbeats while it works through it (recording how
+    far it got) and marks it done; a range whose holder stops heartbeating for
+    ttl seconds is handed to the next worker that asks, from where the last one
+    got to. Every state change is a single compare-and-set UPDATE on the row's
+    version, or an INSERT that the primary key lets only one worker win, so no
+    range is ever held by two workers at once.
+
+    Works on a MySQL connection (see Database.open_leases) or a sqlite3 one,
+    in autocommit mode. Expiry uses the workers' clocks, which must agree.
+    """
+
+    CREATE_TABLE = """
+        CREATE TABLE IF NOT EXISTS crawl_leases (
+            establishment VARCHAR(6) NOT NULL,
+            year INT NOT NULL,
+            first_serial INT NOT NULL,
+            last_serial INT NOT NULL,
+            next_serial INT NOT NULL,
+            status VARCHAR(10) NOT NULL,
+            worker_id VARCHAR(100),
+            version INT NOT NULL DEFAULT 0,
+            claimed_at DOUBLE,
+            heartbeat_at DOUBLE,
+            expires_at DOUBLE,
+            completed_at DOUBLE,
+            PRIMARY KEY (establishment, year, first_serial)
+        )
+    """
+
+    def __init__(self, connection, streams, ends=None, lease_size=None, ttl=None):
+        self.connection = connection
+        self.sqlite = isinstance(connection, sqlite3.Connection)
+        self.streams = list(streams)
+        self.ends = ends or {}  # (establishment, year) -> last serial worth leasing
+        self.lease_size = lease_size or LEASES['lease_size']
+        self.ttl = ttl or LEASES['ttl']
+        self._execute(self.CREATE_TABLE)
+
+    def _execute(self, query, params=()):
+        cursor = self.connection.cursor()
+        cursor.execute(query.replace('%s', '?') if self.sqlite else query, params)
+        return cursor
+
+    def _stream_filter(self):
+        placeholders = ', '.join(['(%s, %s)'] * len(self.streams))
+        return f"(establishment, year) IN ({placeholders})", [value for stream in self.streams for value in stream]
+
+    def claim(self, worker_id, max_attempts=50):
+        """
+        Claim a range for worker_id: a released or expired one first, otherwise
+        the next unleased range of the first stream that has one. Returns a
+        Lease, or None if there is nothing to claim right now: every stream is
+        leased out to its end, though ranges other workers hold may still come
+        back (see next_expiry).
+        """
+        if not self.streams:
+            return None
+        stream_filter, stream_params = self._stream_filter()
+        for attempt in range(max_attempts):
+            now = time.time()
+            cursor = self._execute(
+                f"SELECT establishment, year, first_serial, last_serial, next_serial, version FROM crawl_leases "
+                f"WHERE {stream_filter} AND (status = 'pending' OR (status = 'leased' AND expires_at < %s)) "
+                f"ORDER BY first_serial LIMIT 1",
+                stream_params + [now]
+            )
+            row = cursor.fetchone()
+            cursor.close()
+            if row:
+                establishment, year, first_serial, last_serial, next_serial, version = row
+                cursor = self._execute(
+                    "UPDATE crawl_leases SET status = 'leased', worker_id = %s, version = version + 1, "
+                    "claimed_at = %s, heartbeat_at = %s, expires_at = %s "
+                    "WHERE establishment = %s AND year = %s AND first_serial = %s AND version = %s",
+                    (worker_id, now, now, now + self.ttl, establishment, year, first_serial, version)
+                )
+                if cursor.rowcount == 1:
+                    logging.info(f"Worker {worker_id} reclaimed {establishment}/{year} from serial {next_serial}")
+                    return Lease(establishment, year, first_serial, last_serial, next_serial, version + 1, worker_id)
+                continue  # another worker got there first
+            
+            lease = self._claim_new_range(worker_id, now)
+            if lease is not False:
+                return lease
+        raise RuntimeError(f"Worker {worker_id} could not claim a lease in {max_attempts} attempts")
+
+    def _claim_new_range(self, worker_id, now):
+        """Insert and hold the next range of the first unfinished stream; False if another worker won the race"""
+        for establishment, year in self.streams:
+            end = self.ends.get((establishment, year), MAX_SERIAL)
+            cursor = self._execute(
+                "SELECT MAX(last_serial) FROM crawl_leases WHERE establishment = %s AND year = %s",
+                (establishment, year)
+            )
+            leased_to = cursor.fetchone()[0] or 0
+            cursor.close()
+            first_serial = leased_to + 1
+            if first_serial > end:
+                continue
+            last_serial = min(first_serial + self.lease_size - 1, end)
+            try:
+                self._execute(
+                    "INSERT INTO crawl_leases (establishment, year, first_serial, last_serial, next_serial, status, "
+                    "worker_id, version, claimed_at, heartbeat_at, expires_at) "
+                    "VALUES (%s, %s, %s, %s, %s, 'leased', %s, 1, %s, %s, %s)",
+                    (establishment, year, first_serial, last_serial, first_serial, worker_id, now, now, now + self.ttl)
+                ).close()
+            except (sqlite3.IntegrityError, mysql.connector.IntegrityError):
+                return False
+            logging.info(f"Worker {worker_id} leased {establishment}/{year} serials {first_serial}-{last_serial}")
+            return Lease(establishment, year, first_serial, last_serial, first_serial, 1, worker_id)
+        return None
+
+    def next_expiry(self, worker_id):
+        """When the first lease another worker holds in these streams runs out; None if they hold none"""
+        if not self.streams:
+            return None
+        stream_filter, stream_params = self._stream_filter()
+        cursor = self._execute(
+            f"SELECT MIN(expires_at) FROM crawl_leases "
+            f"WHERE {stream_filter} AND status = 'leased' AND worker_id <> %s",
+            stream_params + [worker_id]
+        )
+        expires_at = cursor.fetchone()[0]
+        cursor.close()
+        return expires_at
+
+    def _update(self, lease, assignments, params, status='leased'):
+        cursor = self._execute(
+            f"UPDATE crawl_leases SET {assignments}, version = version + 1 "
+            f"WHERE establishment = %s AND year = %s AND first_serial = %s AND version = %s AND status = %s",
+            tuple(params) + (lease.establishment, lease.year, lease.first_serial, lease.version, status)
+        )
+        if cursor.rowcount != 1:
+            logging.warning(f"{lease} was lost to another worker")
+            return False
+        lease.version += 1
+        return True
+
+    def heartbeat(self, lease, next_serial=None):
+        """Extend the lease and record progress; False if it expired and was claimed by someone else"""
+        now = time.time()
+        if next_serial is not None:
+            lease.next_serial = next_serial
+        return self._update(lease, "next_serial = %s, heartbeat_at = %s, expires_at = %s",
+                            (lease.next_serial, now, now + self.ttl))
+
+    def complete(self, lease):
+        """Mark every serial of the lease done"""
+        return self._update(lease, "status = 'done', next_serial = %s, completed_at = %s",
+                            (lease.last_serial + 1, time.time()))
+
+    def release(self, lease, next_serial=None):
+        """Give the lease back unfinished so another worker can carry on from next_serial at once"""
+        if next_serial is not None:
+            lease.next_serial = next_serial
+        return self._update(lease, "status = 'pending', worker_id = NULL, next_serial = %s, expires_at = NULL",
+                            (lease.next_serial,))
+
+    def close(self):
+        self.connection.close()
+
 class DatabaseHandler:
     def __init__(self):
         self.setup_logging()
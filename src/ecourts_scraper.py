@@ -4,9 +4,9 @@ import time
 import logging
 from datetime import datetime
 from urllib.parse import urljoin
+import random
 import re
 import io
-import pytesseract
 from PIL import Image, ImageEnhance
 from bs4 import BeautifulSoup
 from io import BytesIO
@@ -14,15 +14,82 @@ from selenium.webdriver.common.by import By
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
-from src.database import Database
+from src.captcha_corpus import CaptchaCorpus
+from src.captcha_ocr import get_ocr_backend, ocr_captcha, preprocess_captcha
+from src.captcha_prefetcher import CaptchaPrefetcher
+from src.captcha_solver import CaptchaSolver, harvest_captcha
+from src.case_parser import diff_case_details, get_parser_backend, parse_case_details
+from config.settings import CAPTCHA_SOLVER, DEBUG_DUMPS, PARSER_KEEP_HTML, PARSER_VERIFY_RATE
+from src.database import CaseWriter, Database
+from src.metrics import CAPTCHA_ANSWERS, HTTP_BYTES, HTTP_RESPONSES, RETRIES, STAGE_SECONDS
+from src.rate_limiter import RateLimiter, RateLimitedAdapter
+from src.response_archive import ResponseArchive
+from src.tracing import set_attempt, trace_case, traced
+
+class RequestStats:
+    """HTTP round trips and payload bytes spent on one CNR"""
+
+    def __init__(self):
+        self.round_trips = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.started = time.monotonic()
+
+    def record(self, bytes_sent, bytes_received):
+        self.round_trips += 1
+        self.bytes_sent += bytes_sent
+        self.bytes_received += bytes_received
+
+    def as_dict(self):
+        return {
+            'round_trips': self.round_trips,
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'seconds': time.monotonic() - self.started
+        }
+
+    def __str__(self):
+        return f"{self.round_trips} round trips, {self.bytes_sent} bytes sent, {self.bytes_received} bytes received"
 
 class ECourtsScraper:
-    def __init__(self, db=None):
+    def __init__(self, db=None, rate_limiter=None, prefetch=False, ocr_backend=None, parser_backend=None):
         """Initialize scraper with database connection"""
         self.base_url = "https://services.ecourts.gov.in/ecourtindia_v6/"
-        self.session = requests.Session()
         self.db = db if db else Database()
         self.app_token = None
+        self.parser_backend = get_parser_backend(parser_backend)
+        
+        # Captcha OCR engine, loaded once per process
+        self.ocr = get_ocr_backend(ocr_backend)
+        # Trained securimage solver, tried before OCR when a model exists
+        self.captcha_solver = CaptchaSolver.load()
+        self.captcha_image = None
+        # Opt-in record of every captcha answered and whether it was accepted
+        self.captcha_corpus = CaptchaCorpus()
+        # Opt-in archive of raw case pages for re-parsing without the network
+        self.response_archive = ResponseArchive()
+        
+        # Pacing is shared with every other worker on this host
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.session = self._build_session()
+        
+        # Count round trips and bytes per CNR
+        self.request_stats = RequestStats()
+        self.last_request_stats = self.request_stats
+        self.session.hooks['response'].append(self._record_response)
+        
+        # Initialize components
+        self.setup_session()
+        
+        # Optionally keep sessions with a solved captcha ready ahead of demand
+        self.prefetcher = None
+        if prefetch:
+            self.prefetcher = CaptchaPrefetcher(self)
+            self.prefetcher.start()
+
+    def _build_session(self):
+        """Create a requests session with retries and shared rate limiting mounted"""
+        session = requests.Session()
         
         # Configure retry strategy
         retry_strategy = Retry(
@@ -32,26 +99,34 @@ class ECourtsScraper:
             allowed_methods=["HEAD", "GET", "POST"]
         )
         
-        # Configure adapter with retry strategy
-        adapter = HTTPAdapter(
-            max_retries=retry_strategy,
+        # The adapter makes the retries itself, so each one goes through the rate limiter
+        adapter = RateLimitedAdapter(
+            self.rate_limiter,
+            retry=retry_strategy,
             pool_connections=5,
             pool_maxsize=10
         )
         
         # Mount adapter to both HTTP and HTTPS
-        self.session.mount("http://", adapter)
-        self.session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
         
         # Set default timeouts
-        self.session.timeout = (15, 30)  # (connect timeout, read timeout)
-        
-        # Initialize components
-        self.setup_session()
-
-    def setup_session(self):
+        session.timeout = (15, 30)  # (connect timeout, read timeout)
+        return session
+
+    def _record_response(self, response, *args, **kwargs):
+        """requests response hook: charge every round trip to the current CNR"""
+        body = response.request.body or b''
+        self.request_stats.record(len(body), len(response.content))
+        HTTP_RESPONSES.inc(status=response.status_code)
+        HTTP_BYTES.inc(len(body), direction='sent')
+        HTTP_BYTES.inc(len(response.content), direction='received')
+
+    def setup_session(self, session=None):
         """Setup requests session with headers"""
-        self.session.headers.update({
+        session = session or self.session
+        session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Accept': 'application/json, text/javascript, */*; q=0.01',
             'Accept-Language': 'en-US,en;q=0.9',
@@ -61,58 +136,38 @@ class ECourtsScraper:
         })
         logging.info("Session setup successful")
 
-    def _get_app_token_and_captcha(self, max_retries=3):
-        """Get a fresh app token and CAPTCHA from the homepage"""
+    def _get_app_token_and_captcha(self, max_retries=3, refresh_token=True):
+        """
+        Get an app token and a solved CAPTCHA.
+
+        The homepage is only fetched when refresh_token is set or no token is held;
+        otherwise the token handed back by the last searchByCNR response is reused.
+        """
         for attempt in range(max_retries):
             try:
-                # First get the main page to get cookies and app token
-                response = self.session.get(self.base_url, timeout=(15, 30))
-                
-                # Extract app token
-                if 'app_token' in response.text:
-                    token_start = response.text.find('app_token') + len('app_token') + 2
-                    token_end = response.text.find('"', token_start)
-                    self.app_token = response.text[token_start:token_end]
-                    logging.info("Successfully retrieved new app token")
-                    
-                    # Get CAPTCHA directly
-                    captcha_url = urljoin(self.base_url, "vendor/securimage/securimage_show.php")
-                    captcha_response = self.session.post(
-                        captcha_url,
-                        headers={
-                            'Referer': self.base_url,
-                            'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
-                            'Accept-Language': 'en-US,en;q=0.9',
-                            'Connection': 'keep-alive',
-                            'Sec-Fetch-Site': 'same-origin',
-                            'Sec-Fetch-Mode': 'no-cors',
-                            'Sec-Fetch-Dest': 'image',
-                        },
-                        timeout=(15, 30)
-                    )
+                if refresh_token or not self.app_token:
+                    # First get the main page to get cookies and app token
+                    with STAGE_SECONDS.time(stage='homepage'):
+                        response = self.session.get(self.base_url, timeout=(15, 30))
                     
-                    if captcha_response.status_code == 200 and captcha_response.headers.get('content-type', '').startswith('image/'):
-                        # Process CAPTCHA image
-                        img = Image.open(io.BytesIO(captcha_response.content))
-                        
-                        # Save for debugging
-                        img.save('last_captcha.png')
-                        
-                        # Enhance image for better OCR
-                        img = img.convert('L')  # Convert to grayscale
-                        enhancer = ImageEnhance.Contrast(img)
-                        img = enhancer.enhance(2)  # Increase contrast
-                        
-                        # OCR the CAPTCHA
-                        custom_config = r'--oem 3 --psm 8 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
-                        captcha_text = pytesseract.image_to_string(img, config=custom_config).strip()
-                        
-                        logging.info(f"Successfully extracted CAPTCHA text: {captcha_text}")
-                        return True, captcha_text
-                    else:
-                        logging.error(f"Failed to get CAPTCHA image: HTTP {captcha_response.status_code}")
+                    # Extract app token
+                    self.app_token = self._extract_app_token(response.text)
+                    if not self.app_token:
+                        logging.error("Could not find app token in page")
+                        continue
+                    logging.info("Successfully retrieved new app token")
+                
+                # Get CAPTCHA directly
+                with STAGE_SECONDS.time(stage='captcha_fetch'):
+                    captcha_response = self._fetch_captcha_image()
+                
+                if captcha_response.status_code == 200 and captcha_response.headers.get('content-type', '').startswith('image/'):
+                    # OCR the CAPTCHA; this answer is the one sent with the search
+                    self.captcha_image = captcha_response.content
+                    captcha_text = self._solve_captcha(captcha_response.content, debug_dump=DEBUG_DUMPS)
+                    return True, captcha_text
                 else:
-                    logging.error("Could not find app token in page")
+                    logging.error(f"Failed to get CAPTCHA image: HTTP {captcha_response.status_code}")
                 
             except requests.exceptions.Timeout:
                 logging.error(f"Request timed out (attempt {attempt+1}/{max_retries})")
@@ -132,11 +187,53 @@ class ECourtsScraper:
                 
         return False, None
 
+    def _fetch_captcha_image(self, session=None):
+        """Request a new securimage CAPTCHA for the session and return the raw response"""
+        session = session or self.session
+        captcha_url = urljoin(self.base_url, "vendor/securimage/securimage_show.php")
+        return session.post(
+            captcha_url,
+            headers={
+                'Referer': self.base_url,
+                'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
+                'Accept-Language': 'en-US,en;q=0.9',
+                'Connection': 'keep-alive',
+                'Sec-Fetch-Site': 'same-origin',
+                'Sec-Fetch-Mode': 'no-cors',
+                'Sec-Fetch-Dest': 'image',
+            },
+            timeout=(15, 30)
+        )
+
+    def _extract_app_token(self, page_html):
+        """Pull the app_token value out of the homepage HTML"""
+        if 'app_token' not in page_html:
+            return None
+        token_start = page_html.find('app_token') + len('app_token') + 2
+        token_end = page_html.find('"', token_start)
+        return page_html[token_start:token_end]
+
+    @STAGE_SECONDS.timed(stage='parse')
+    @traced('parse')
     def _parse_case_details(self, html_content):
         """
-        Parse case details from the HTML response.
+        Parse case details from the HTML response with the configured backend.
         Returns None if the case does not exist.
         """
+        if self.parser_backend != 'lxml':
+            return self._parse_case_details_soup(html_content)
+
+        case_details = parse_case_details(html_content)
+        if PARSER_VERIFY_RATE and random.random() < PARSER_VERIFY_RATE:
+            # Spot-check the fast parser against the reference one on live pages
+            mismatched = diff_case_details(self._parse_case_details_soup(html_content), case_details)
+            if mismatched:
+                logging.warning(f"lxml parser disagrees with BeautifulSoup on: {', '.join(mismatched)}")
+        return case_details
+
+    def _parse_case_details_soup(self, html_content):
+        """Reference BeautifulSoup implementation of _parse_case_details"""
+        soup = None
         try:
             soup = BeautifulSoup(html_content, 'html.parser')
             
@@ -146,7 +243,6 @@ class ECourtsScraper:
                 return None
             
             case_details = {
-                'html_content': html_content,  # Store the HTML content
                 'cnr_number': None,
                 'case_type': None,
                 'filing_number': None,
@@ -170,6 +266,8 @@ class ECourtsScraper:
                 'ia_details': [],  # Add ia_details list
                 'court_name': None  # Add court_name field
             }
+            if PARSER_KEEP_HTML:
+                case_details['html_content'] = html_content  # Store the HTML content
 
             # Extract court name from the heading
             court_heading = soup.find('h2', class_='h4', id='chHeading')
@@ -322,6 +420,10 @@ class ECourtsScraper:
         except Exception as e:
             logging.error(f"Error parsing case details: {str(e)}")
             return None
+        finally:
+            # The tree is full of parent/child cycles; break them now rather than at the next GC pass
+            if soup is not None:
+                soup.decompose()
 
     def fetch_case_history(self, cnr):
         """Fetch case history using the history API endpoint"""
@@ -414,85 +516,122 @@ class ECourtsScraper:
             return None
 
     def get_case_details(self, cnr, max_attempts=3):
-        """Get case details for a given CNR number with enhanced error handling"""
-        if not self.app_token:
-            success, _ = self._get_app_token_and_captcha()
-            if not success:
-                logging.error("Failed to get initial app token")
-                return None
-            
+        """
+        Get case details for a given CNR number with enhanced error handling.
+
+        Each attempt costs a captcha fetch and the search POST; the homepage is
+        only fetched when no usable app token is held. The HTTP cost of the call
+        is left in self.last_request_stats.
+        """
+        self.request_stats = RequestStats()
+        try:
+            with trace_case(cnr):
+                return self._get_case_details(cnr, max_attempts)
+        finally:
+            self.last_request_stats = self.request_stats
+            logging.info(f"CNR {cnr} cost {self.last_request_stats}")
+
+    def _get_case_details(self, cnr, max_attempts):
         for attempt in range(max_attempts):
+            # An armed session from the prefetcher lets us go straight to the search POST
+            armed = self.prefetcher.take() if self.prefetcher else None
             try:
                 logging.info(f"Attempt {attempt + 1}/{max_attempts} for CNR {cnr}")
+                if attempt:
+                    RETRIES.inc()
+                set_attempt(attempt + 1)
                 
-                # Get fresh token and CAPTCHA
-                success, _ = self._get_app_token_and_captcha()
-                if not success:
-                    logging.warning(f"Failed to get app token on attempt {attempt + 1}")
-                    continue
+                if armed:
+                    session, app_token, captcha_text = armed.session, armed.app_token, armed.captcha_text
+                    captcha_image = armed.captcha_image
+                    # Armed sessions are not hooked, so charge the search to this CNR explicitly
+                    hooks = {'response': self._record_response}
+                    armed.app_token = None
+                else:
+                    # Get token (if needed) and a solved CAPTCHA
+                    success, captcha_text = self._get_app_token_and_captcha(refresh_token=False)
+                    if not success:
+                        logging.warning(f"Failed to get app token on attempt {attempt + 1}")
+                        continue
+                    session, app_token, hooks = self.session, self.app_token, None
+                    captcha_image = self.captcha_image
                 
-                # Extract CAPTCHA text
-                captcha_text = self._extract_captcha_text()
                 if not captcha_text:
                     logging.warning(f"Failed to solve CAPTCHA on attempt {attempt + 1}")
                     continue
                 
                 logging.info(f"Using CAPTCHA text: {captcha_text}")
                 
-                # Make initial request to set up session
-                self.session.get(self.base_url)
-                
                 # Prepare request data
                 data = {
                     'cino': cnr,
                     'fcaptcha_code': captcha_text,
                     'ajax_req': 'true',
-                    'app_token': self.app_token
+                    'app_token': app_token
                 }
                 
                 # Make request with detailed logging
                 logging.info(f"Sending request with data: {json.dumps(data)}")
-                response = self.session.post(
-                    f"{self.base_url}?p=cnr_status/searchByCNR",
-                    data=data,
-                    headers={
-                        'Content-Type': 'application/x-www-form-urlencoded',
-                        'X-Requested-With': 'XMLHttpRequest',
-                        'Origin': 'https://services.ecourts.gov.in',
-                        'Referer': self.base_url + '?p=cnr_status/searchByCNR',
-                        'Sec-Fetch-Site': 'same-origin',
-                        'Sec-Fetch-Mode': 'cors',
-                        'Sec-Fetch-Dest': 'empty'
-                    }
-                )
+                with STAGE_SECONDS.time(stage='search'):
+                    response = session.post(
+                        f"{self.base_url}?p=cnr_status/searchByCNR",
+                        data=data,
+                        headers={
+                            'Content-Type': 'application/x-www-form-urlencoded',
+                            'X-Requested-With': 'XMLHttpRequest',
+                            'Origin': 'https://services.ecourts.gov.in',
+                            'Referer': self.base_url + '?p=cnr_status/searchByCNR',
+                            'Sec-Fetch-Site': 'same-origin',
+                            'Sec-Fetch-Mode': 'cors',
+                            'Sec-Fetch-Dest': 'empty'
+                        },
+                        hooks=hooks
+                    )
                 
                 logging.info(f"Response status: {response.status_code}")
                 
                 if response.status_code == 200:
                     try:
                         result = response.json()
+                        
+                        # The portal rotates app_token with every answer; without one
+                        # the next attempt has to go back to the homepage
+                        if armed:
+                            armed.app_token = result.get('app_token')
+                        else:
+                            self.app_token = result.get('app_token')
+                        
                         if 'errormsg' in result:
                             logging.warning(f"Error in response (attempt {attempt + 1}): {result['errormsg']}")
-                            # Save failed response for debugging
-                            with open(f'failed_response_{attempt + 1}.json', 'w') as f:
-                                json.dump(result, f, indent=2)
+                            if DEBUG_DUMPS and not armed:
+                                with open(f'failed_response_{attempt + 1}.json', 'w') as f:
+                                    json.dump(result, f, indent=2)
+                            self.captcha_corpus.add(captcha_image, captcha_text, False, result['errormsg'])
+                            CAPTCHA_ANSWERS.inc(result='rejected')
                             continue
+                        
+                        # The server accepted the captcha, so its answer is a trustworthy label
+                        CAPTCHA_ANSWERS.inc(result='accepted')
+                        harvest_captcha(captcha_image, captcha_text)
+                        self.captcha_corpus.add(captcha_image, captcha_text, True)
                             
-                        # Save HTML response for debugging
                         html_content = result.get('casetype_list', '')
-                        with open('last_response.html', 'w') as f:
-                            f.write(html_content)
-                        logging.info("Saved HTML response to last_response.html")
+                        if DEBUG_DUMPS and not armed:
+                            with open('last_response.html', 'w') as f:
+                                f.write(html_content)
+                            logging.info("Saved HTML response to last_response.html")
+                        self.response_archive.put(cnr, html_content)
                             
                         # Check if case exists
                         if 'This Case Code does not exists' in html_content:
                             logging.info(f"Case {cnr} does not exist")
-                            return {'cnr_number': cnr, 'exists': False}
+                            return {'cnr_number': cnr, 'exists': False, 'request_stats': self.request_stats.as_dict()}
                             
                         # Parse case details from HTML response
                         case_details = self._parse_case_details(html_content)
                         if case_details:
                             case_details['exists'] = True
+                            case_details['request_stats'] = self.request_stats.as_dict()
                             logging.info(f"Successfully fetched data for CNR {cnr} on attempt {attempt + 1}")
                             return case_details
                         else:
@@ -500,142 +639,118 @@ class ECourtsScraper:
                             
                     except json.JSONDecodeError as e:
                         logging.error(f"Invalid JSON response on attempt {attempt + 1}: {str(e)}")
+                        self.app_token = None
                         continue
                     except Exception as e:
                         logging.error(f"Error parsing response on attempt {attempt + 1}: {str(e)}")
                         continue
                 else:
                     logging.error(f"HTTP {response.status_code} error on attempt {attempt + 1}")
+                    self.app_token = None
                     
             except requests.exceptions.RequestException as e:
                 logging.error(f"Request error on attempt {attempt + 1}: {str(e)}")
+                self.app_token = None
                 continue
             except Exception as e:
                 logging.error(f"Unexpected error on attempt {attempt + 1}: {str(e)}")
                 continue
-                
-            # Add delay between attempts
-            if attempt < max_attempts - 1:
-                time.sleep(2)
+            finally:
+                if armed:
+                    # Re-armed with a new captcha if the portal handed back a token, else dropped
+                    self.prefetcher.recycle(armed)
                 
         logging.error(f"Failed to fetch case details for {cnr} after {max_attempts} attempts")
         return None
 
     def run(self, cnr_numbers):
-        """Run the scraper for multiple CNR numbers"""
-        results = []
+        """
+        Run the scraper for multiple CNR numbers, printing each case as it is
+        scraped rather than holding them all; returns the number scraped.
+        """
         total_cases = len(cnr_numbers)
         successful_cases = 0
         
         print(f"\nStarting to scrape {total_cases} cases...")
         
-        for idx, cnr in enumerate(cnr_numbers, 1):
-            print(f"\nProcessing case {idx}/{total_cases}: {cnr}")
-            case_details = self.get_case_details(cnr)
-            
-            if case_details:
-                successful_cases += 1
-                results.append(case_details)
-                if self.db:
-                    try:
-                        self.db.insert_case(case_details)
-                    except Exception as e:
-                        logging.error(f"Failed to store case {cnr}: {str(e)}")
-            
-            # Add delay between cases
-            if idx < total_cases:
-                time.sleep(2)
-        
-        # Print scraped data in a readable format
-        print(f"\n=== Scraped Case Details ({successful_cases}/{total_cases} successful) ===")
-        for case in results:
-            print(f"\nCase CNR: {case['cnr_number']}")
-            print("-" * 50)
-            for key, value in sorted(case.items()):
-                if value is not None and key not in ['created_at', 'updated_at']:
-                    print(f"{key}: {value}")
+        # Cases are stored in batches rather than one transaction each
+        writer = CaseWriter(self.db, on_saved=self._log_saved_case) if self.db else None
+        try:
+            for idx, cnr in enumerate(cnr_numbers, 1):
+                print(f"\nProcessing case {idx}/{total_cases}: {cnr}")
+                case_details = self.get_case_details(cnr)
+                
+                if case_details and case_details.get('exists', True):
+                    successful_cases += 1
+                    print(f"\nCase CNR: {case_details['cnr_number']}")
+                    print("-" * 50)
+                    for key, value in sorted(case_details.items()):
+                        if value is not None and key not in ['created_at', 'updated_at', 'html_content']:
+                            print(f"{key}: {value}")
+                    if writer:
+                        writer.add(case_details)
+                elif writer:
+                    writer.flush_if_due()
+        finally:
+            if writer:
+                writer.close()
         
-        return results
+        print(f"\n=== Scraped {successful_cases}/{total_cases} cases ===")
+        return successful_cases
+
+    def _log_saved_case(self, case_details, case_id, error):
+        if error:
+            logging.error(f"Failed to store case {case_details['cnr_number']}: {str(error)}")
 
     def __enter__(self):
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Cleanup resources"""
-        if self.session:
-            self.session.close()
+        self.cleanup()
             
     def cleanup(self):
         """Cleanup resources"""
+        if self.prefetcher:
+            self.prefetcher.stop()
         if self.session:
             self.session.close()
 
-    def _extract_captcha_text(self):
-        """Extract text from CAPTCHA image with enhanced preprocessing"""
-        try:
-            # Get CAPTCHA image
-            captcha_url = urljoin(self.base_url, "vendor/securimage/securimage_show.php")
-            captcha_response = self.session.post(
-                captcha_url,
-                headers={
-                    'Referer': self.base_url,
-                    'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
-                    'Accept-Language': 'en-US,en;q=0.9',
-                    'Connection': 'keep-alive',
-                    'Sec-Fetch-Site': 'same-origin',
-                    'Sec-Fetch-Mode': 'no-cors',
-                    'Sec-Fetch-Dest': 'image',
-                }
-            )
-            
-            if captcha_response.status_code != 200:
-                logging.error(f"Failed to get CAPTCHA image: HTTP {captcha_response.status_code}")
-                return None
-                
-            if not captcha_response.headers.get('content-type', '').startswith('image/'):
-                logging.error("Response is not an image")
-                return None
-            
-            # Process CAPTCHA image
-            img = Image.open(io.BytesIO(captcha_response.content))
-            
-            # Save original for debugging
+    @STAGE_SECONDS.timed(stage='captcha_solve')
+    @traced('ocr')
+    def _solve_captcha(self, image_bytes, debug_dump=False):
+        """
+        Solve a CAPTCHA with the trained solver, falling back to OCR over several
+        PSM modes. debug_dump writes the OCR's input images to the working
+        directory, so only a single-threaded caller may set it.
+        """
+        if self.captcha_solver:
+            captcha_text, confidence = self.captcha_solver.solve(image_bytes)
+            if captcha_text and confidence >= CAPTCHA_SOLVER['min_confidence']:
+                logging.info(f"Solved CAPTCHA with trained solver: {captcha_text} (confidence {confidence:.2f})")
+                return captcha_text
+            logging.debug(f"Trained solver not confident ({confidence:.2f}), falling back to OCR")
+        
+        # Process CAPTCHA image
+        img = Image.open(io.BytesIO(image_bytes))
+
+        if debug_dump:
             img.save('last_captcha_original.png')
-            
-            # Enhanced image processing
-            img = img.convert('L')  # Convert to grayscale
-            
-            # Increase contrast
-            enhancer = ImageEnhance.Contrast(img)
-            img = enhancer.enhance(2)
-            
-            # Increase brightness
-            enhancer = ImageEnhance.Brightness(img)
-            img = enhancer.enhance(1.5)
-            
-            # Threshold to make it black and white
-            threshold = 128
-            img = img.point(lambda x: 255 if x > threshold else 0)
-            
-            # Save processed image for debugging
+
+        # Grayscale, contrast, brightness and threshold to black and white
+        img = preprocess_captcha(img)
+
+        if debug_dump:
             img.save('last_captcha_processed.png')
-            
-            # OCR with different PSM modes
-            psm_modes = [7, 8, 13]  # Different page segmentation modes to try
-            for psm in psm_modes:
-                custom_config = f'--oem 3 --psm {psm} -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
-                captcha_text = pytesseract.image_to_string(img, config=custom_config).strip()
-                
-                if captcha_text and len(captcha_text) >= 4:  # Most CAPTCHAs are at least 4 chars
-                    logging.info(f"Successfully extracted CAPTCHA text with PSM {psm}: {captcha_text}")
-                    return captcha_text
-            
-            logging.warning("Failed to extract valid CAPTCHA text with any PSM mode")
-            return None
-            
-        except Exception as e:
-            logging.error(f"Error processing CAPTCHA: {str(e)}")
-            return None
+
+        # OCR with different PSM modes
+        captcha_text, psm = ocr_captcha(self.ocr, img)
+        if captcha_text:
+            logging.info(f"Successfully extracted CAPTCHA text with PSM {psm}: {captcha_text}")
+            return captcha_text
+
+        logging.warning("Failed to extract valid CAPTCHA text with any PSM mode")
+        return None
 
     def test_parse_html(self, html_content):
         """Test function to parse HTML content directly"""
@@ -0,0 +1,217 @@
+import functools
+import inspect
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config.settings import METRICS
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """A named family of values, one per combination of label values"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    def samples(self):
+        """(suffix, label values, extra labels, value) for every value of the family"""
+        with self._lock:
+            return [('', key, (), value) for key, value in self._values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """A value that goes up and down; set_function() reads it afresh on every scrape"""
+
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = function
+
+    def samples(self):
+        samples = []
+        for suffix, key, extra, value in super().samples():
+            if callable(value):
+                try:
+                    value = value()
+                except Exception as e:
+                    logging.debug(f"Gauge {self.name}{key} could not be read: {str(e)}")
+                    continue
+            samples.append((suffix, key, extra, value))
+        return samples
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # One count per bucket, one past the last bound, then the sum
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[bisect_left(self.buckets, value)] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the seconds the with-block takes"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def timed(self, **labels):
+        """Decorator observing the seconds every call takes; works on coroutine functions too"""
+        def decorate(function):
+            if inspect.iscoroutinefunction(function):
+                @functools.wraps(function)
+                async def wrapper(*args, **kwargs):
+                    with self.time(**labels):
+                        return await function(*args, **kwargs)
+            else:
+                @functools.wraps(function)
+                def wrapper(*args, **kwargs):
+                    with self.time(**labels):
+                        return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def samples(self):
+        samples = []
+        for _, key, _, counts in super().samples():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                samples.append(('_bucket', key, (('le', _format_value(float(bound))),), cumulative))
+            samples.append(('_sum', key, (), counts[-1]))
+            samples.append(('_count', key, (), cumulative))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# Where the time of a case goes: homepage, captcha_fetch, captcha_solve, search, parse, insert
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'ecourts_stage_seconds', 'Seconds spent in each stage of scraping a case', ['stage']))
+CAPTCHA_ANSWERS = REGISTRY.register(Counter(
+    'ecourts_captcha_answers_total', 'Captcha answers sent, by whether the portal accepted them', ['result']))
+RETRIES = REGISTRY.register(Counter(
+    'ecourts_retries_total', 'Search attempts after the first for the same CNR'))
+HTTP_RESPONSES = REGISTRY.register(Counter(
+    'ecourts_http_responses_total', 'HTTP responses from the portal, by status code', ['status']))
+HTTP_BYTES = REGISTRY.register(Counter(
+    'ecourts_http_bytes_total', 'Payload bytes exchanged with the portal', ['direction']))
+DB_STATEMENTS = REGISTRY.register(Counter(
+    'ecourts_db_statements_total', 'SQL statements run on the main database cursor'))
+DB_STATEMENTS_PER_CASE = REGISTRY.register(Histogram(
+    'ecourts_db_statements_per_case', 'SQL statements per case saved, averaged over its batch', [],
+    buckets=(1, 2, 3, 5, 10, 20, 50, 100)))
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'ecourts_queue_depth', 'Items waiting in each internal queue', ['queue']))
+CASES = REGISTRY.register(Counter(
+    'ecourts_cases_total', 'CNRs finished, by outcome', ['outcome']))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes every few seconds would drown the crawl log
+
+
+def start_metrics_server(port=None, host=None):
+    """Serve REGISTRY at http://host:port/metrics from a daemon thread; port 0 disables it"""
+    port = METRICS['port'] if port is None else port
+    host = host or METRICS['host']
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logging.error(f"Could not serve metrics on {host}:{port}: {str(e)}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    logging.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
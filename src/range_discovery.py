@@ -0,0 +1,111 @@
+import json
+import logging
+import os
+from datetime import datetime
+
+from config.settings import RANGE_DISCOVERY
+from src.cnr_frontier import MAX_SERIAL
+
+
+def discover_max_serial(probe, start=0, gap_tolerance=None, limit=MAX_SERIAL):
+    """
+    Estimate the highest live serial of one establishment/year.
+
+    probe(serial) returns True if the case exists, False if the portal says it
+    does not and None if that could not be established. Starting from a serial
+    known to exist (0 for none), the step doubles while cases keep turning up,
+    then the boundary is binary searched. Case numbers have holes, so a serial
+    only counts as past the end when it and the gap_tolerance - 1 serials after
+    it are all missing. A probe that fails counts as live: flaky probes can only
+    make the range larger, never hide cases.
+
+    Returns (highest live serial, number of serials probed).
+    """
+    gap_tolerance = gap_tolerance or RANGE_DISCOVERY['gap_tolerance']
+    results = {}
+
+    def exists(serial):
+        if serial not in results:
+            results[serial] = probe(serial) is not False
+        return results[serial]
+
+    def first_live(serial):
+        """The first existing serial in the window starting at serial, or None if the window is empty"""
+        for candidate in range(serial, min(serial + gap_tolerance, limit + 1)):
+            if exists(candidate):
+                return candidate
+        return None
+
+    # Gallop: double the step while cases keep turning up
+    low = start
+    step = 1
+    while True:
+        serial = low + step
+        if serial > limit:
+            high = limit + 1
+            break
+        found = first_live(serial)
+        if found is None:
+            high = serial
+            break
+        low = found
+        step *= 2
+
+    # Binary search between the last live serial and the first empty window
+    while high - low > 1:
+        middle = (low + high) // 2
+        found = first_live(middle)
+        if found is None:
+            high = middle
+        else:
+            low = found
+
+    return low, len(results)
+
+
+class CnrRanges:
+    """
+    Highest live serial found per establishment and year, kept in a JSON file.
+
+    The crawler only enumerates serials up to that estimate plus a margin, so it
+    does not spend a captcha on every empty serial past the last real case.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or RANGE_DISCOVERY['ranges_file']
+        self.ranges = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    self.ranges = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.error(f"Failed to load CNR ranges from {self.path}: {str(e)}")
+
+    @staticmethod
+    def _key(establishment, year):
+        return f"{establishment}/{year}"
+
+    def get(self, establishment, year):
+        return self.ranges.get(self._key(establishment, year))
+
+    def set(self, establishment, year, max_serial, probes):
+        self.ranges[self._key(establishment, year)] = {
+            'max_serial': max_serial,
+            'probes': probes,
+            'discovered_at': datetime.now().isoformat(timespec='seconds')
+        }
+
+    def crawl_limit(self, establishment, year, margin=None):
+        """Last serial worth crawling, or None if the range has not been discovered"""
+        found = self.get(establishment, year)
+        if not found:
+            return None
+        margin = RANGE_DISCOVERY['margin'] if margin is None else margin
+        return min(found['max_serial'] + margin, MAX_SERIAL)
+
+    def save(self):
+        ranges_dir = os.path.dirname(self.path)
+        if ranges_dir:
+            os.makedirs(ranges_dir, exist_ok=True)
+        with open(self.path, 'w') as f:
+            json.dump(self.ranges, f, indent=2)
@@ -0,0 +1,206 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, RequestException, RetryError, Timeout
+from urllib3.exceptions import MaxRetryError
+from urllib3.util.retry import Retry
+
+from config.settings import RATE_LIMIT
+from src.tracing import span
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads in one process are coordinated
+    fcntl = None
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every thread and process on the host.
+
+    The bucket lives in a small JSON file guarded by an exclusive file lock, so all
+    workers draw from one budget. The refill rate adapts with AIMD: it grows by
+    `additive_increase` on each fast, clean response and is multiplied by
+    `multiplicative_decrease` on 429/5xx, connection failures or a latency spike.
+    """
+
+    def __init__(self, state_file=None, settings=None):
+        self.settings = dict(RATE_LIMIT, **(settings or {}))
+        self.state_file = state_file or self.settings['state_file']
+        self.min_rate = self.settings['min_requests_per_minute'] / 60.0
+        self.max_rate = self.settings['max_requests_per_minute'] / 60.0
+        self.initial_rate = min(self.max_rate, 1.0 / self.settings['min_time_between_requests'])
+        self._thread_lock = threading.Lock()
+        self._executor = None  # runs the async callers' file updates, see _update_async
+
+        state_dir = os.path.dirname(self.state_file)
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+
+    def _default_state(self):
+        return {
+            'rate': self.initial_rate,
+            'tokens': 1.0,
+            'updated_at': time.time(),
+            'avg_latency': None,
+            'last_decrease': 0.0
+        }
+
+    def _update(self, func):
+        """Run func(state) under the thread and file locks and persist the result"""
+        with self._thread_lock:
+            with open(self.state_file, 'a+') as f:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    raw = f.read()
+                    try:
+                        state = json.loads(raw) if raw else self._default_state()
+                    except ValueError:
+                        state = self._default_state()
+                    result = func(state)
+                    f.seek(0)
+                    f.truncate()
+                    json.dump(state, f)
+                    f.flush()
+                    return result
+                finally:
+                    if fcntl:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+
+    async def _update_async(self, func):
+        """
+        _update off the event loop. The file lock may be held by another worker,
+        so the update runs on the limiter's own thread; one thread is enough, as
+        updates are serialised by the locks anyway, and it leaves the default
+        executor free for OCR.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rate-limiter')
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._update, func)
+
+    def _reserve(self, state):
+        """Take one token, returning how long the caller must wait before using it"""
+        now = time.time()
+        elapsed = max(0.0, now - state['updated_at'])
+        state['tokens'] = min(self.settings['burst'], state['tokens'] + elapsed * state['rate'])
+        state['updated_at'] = now
+        state['tokens'] -= 1.0
+        if state['tokens'] >= 0:
+            return 0.0
+        # A negative balance is a reservation: later callers queue up behind us
+        return -state['tokens'] / state['rate']
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        wait = self._update(self._reserve)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Wait, without blocking the event loop, until a request may be sent"""
+        wait = await self._update_async(self._reserve)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def record(self, status_code=None, latency=None):
+        """
+        Feed a response back into the AIMD controller.
+
+        status_code is None when the request failed without a response.
+        """
+        return self._update(self._adjuster(status_code, latency))
+
+    async def record_async(self, status_code=None, latency=None):
+        """record() for asyncio callers, without blocking the event loop"""
+        return await self._update_async(self._adjuster(status_code, latency))
+
+    def _adjuster(self, status_code, latency):
+        """The AIMD update for one response, as a function of the shared state"""
+        def adjust(state):
+            now = time.time()
+            avg_latency = state['avg_latency']
+            congested = status_code is None or status_code == 429 or status_code >= 500
+            if latency is not None:
+                if avg_latency and latency > avg_latency * self.settings['latency_factor']:
+                    congested = True
+                # Exponentially weighted moving average of response time
+                state['avg_latency'] = latency if avg_latency is None else 0.8 * avg_latency + 0.2 * latency
+
+            if congested:
+                if now - state['last_decrease'] >= self.settings['decrease_cooldown']:
+                    state['rate'] = max(self.min_rate, state['rate'] * self.settings['multiplicative_decrease'])
+                    state['last_decrease'] = now
+                    logging.info(f"Rate limiter backing off to {state['rate'] * 60:.1f} requests/minute")
+            else:
+                state['rate'] = min(self.max_rate, state['rate'] + self.settings['additive_increase'])
+            return state['rate']
+
+        return adjust
+
+    @property
+    def rate(self):
+        """Current shared rate in requests per second"""
+        return self._update(lambda state: state['rate'])
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that takes a token before every request and reports how it went.
+
+    Retries follow `retry` (a urllib3 Retry) but are made here rather than by
+    urllib3 inside super().send(): every attempt takes its own token and every
+    429, 5xx or failed connection reaches the AIMD controller, instead of a
+    429 that succeeds on a later retry counting as one clean response.
+    """
+
+    def __init__(self, rate_limiter, *args, retry=None, **kwargs):
+        self.rate_limiter = rate_limiter
+        self.retry = retry or Retry(0, read=False)
+        super().__init__(*args, max_retries=0, **kwargs)
+
+    def send(self, request, *args, **kwargs):
+        retry = self.retry
+        while True:
+            try:
+                response = self._send_once(request, *args, **kwargs)
+            except (ConnectionError, Timeout) as e:
+                try:
+                    retry = retry.increment(method=request.method, url=request.url, error=e)
+                except MaxRetryError:
+                    raise e
+                logging.warning(f"Retrying {request.method} {request.path_url} after error: {str(e)}")
+                retry.sleep()
+                continue
+            if not retry.is_retry(request.method, response.status_code, 'Retry-After' in response.headers):
+                return response
+            try:
+                retry = retry.increment(method=request.method, url=request.url, response=response.raw)
+            except MaxRetryError as e:
+                if retry.raise_on_status:
+                    raise RetryError(e, request=request)
+                return response
+            logging.warning(f"Retrying {request.method} {request.path_url} after HTTP {response.status_code}")
+            retry.sleep(response.raw)
+            response.close()
+
+    def _send_once(self, request, *args, **kwargs):
+        # The span includes any wait for a token, so a throttled request shows up as a slow one
+        with span('http', method=request.method, url=request.path_url) as attributes:
+            self.rate_limiter.acquire()
+            try:
+                response = super().send(request, *args, **kwargs)
+            except RequestException:
+                self.rate_limiter.record(None)
+                raise
+            self.rate_limiter.record(response.status_code, response.elapsed.total_seconds())
+            attributes['status'] = response.status_code
+            attributes['bytes'] = len(response.content)
+        return response
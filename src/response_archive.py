@@ -0,0 +1,133 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from config.settings import RESPONSE_ARCHIVE
+
+try:
+    import zstandard
+except ImportError:  # optional: only needed when the archive is enabled
+    zstandard = None
+
+
+class ResponseArchive:
+    """
+    Content-addressed, zstd-compressed store of raw case pages.
+
+    Each casetype_list page is written once to objects/<aa>/<bb>/<sha256>.zst,
+    and every fetch appends {cnr, fetched_at, sha256, size} to an index shard
+    named after the CNR's state and district code (index/KLKN.jsonl), so an
+    unchanged page fetched again costs one index line. The archive is what
+    `reparse_archive.py` replays through the current parser.
+    """
+
+    def __init__(self, directory=None, compression_level=None):
+        self.directory = directory if directory is not None else RESPONSE_ARCHIVE['dir']
+        self.compression_level = compression_level or RESPONSE_ARCHIVE['compression_level']
+        if self.directory and zstandard is None:
+            raise ImportError("zstandard is not installed; pip install zstandard or unset RESPONSE_ARCHIVE_DIR")
+        # Compression contexts are not thread-safe, so each thread keeps its own
+        self._local = threading.local()
+        self._index_lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.directory)
+
+    def _compressor(self):
+        if not hasattr(self._local, 'compressor'):
+            self._local.compressor = zstandard.ZstdCompressor(level=self.compression_level)
+            self._local.decompressor = zstandard.ZstdDecompressor()
+        return self._local.compressor
+
+    def _decompressor(self):
+        self._compressor()
+        return self._local.decompressor
+
+    def object_path(self, digest):
+        return os.path.join(self.directory, 'objects', digest[:2], digest[2:4], f"{digest}.zst")
+
+    def index_path(self, shard):
+        return os.path.join(self.directory, 'index', f"{shard}.jsonl")
+
+    def put(self, cnr, html_content, fetched_at=None):
+        """Archive one fetched page; returns its sha256, or None when disabled or on error"""
+        if not self.enabled or not html_content:
+            return None
+        raw = html_content.encode('utf-8')
+        digest = hashlib.sha256(raw).hexdigest()
+        try:
+            path = self.object_path(digest)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Write then rename so a crash never leaves a truncated object behind
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(self._compressor().compress(raw))
+                os.replace(tmp_path, path)
+
+            entry = {
+                'cnr': cnr,
+                'fetched_at': fetched_at if fetched_at is not None else time.time(),
+                'sha256': digest,
+                'size': len(raw)
+            }
+            index_path = self.index_path(cnr[:4])
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+            with self._index_lock, open(index_path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+            return digest
+        except OSError as e:
+            logging.error(f"Failed to archive response for {cnr}: {str(e)}")
+            return None
+
+    def get(self, digest):
+        """Return the page stored under digest"""
+        with open(self.object_path(digest), 'rb') as f:
+            return self._decompressor().decompress(f.read()).decode('utf-8')
+
+    def shards(self):
+        index_dir = os.path.join(self.directory, 'index')
+        if not self.enabled or not os.path.isdir(index_dir):
+            return []
+        return sorted(name[:-len('.jsonl')] for name in os.listdir(index_dir) if name.endswith('.jsonl'))
+
+    def entries(self, shard, latest_only=True):
+        """Yield index entries of one shard, by default only the latest fetch of each CNR"""
+        latest = {}
+        with open(self.index_path(shard)) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # a line torn by a crash mid-write
+                if not latest_only:
+                    yield entry
+                elif entry['cnr'] not in latest or entry['fetched_at'] >= latest[entry['cnr']]['fetched_at']:
+                    latest[entry['cnr']] = entry
+        if latest_only:
+            yield from latest.values()
+
+    def iter_responses(self, cnr_numbers=None, shards=None, latest_only=True):
+        """
+        Stream (entry, html_content) pairs one shard at a time.
+
+        Only one shard's index is held in memory, so a full archive replays in
+        bounded memory.
+        """
+        wanted = set(cnr_numbers) if cnr_numbers else None
+        if shards is None:
+            shards = sorted({cnr[:4] for cnr in wanted}) if wanted else self.shards()
+        for shard in shards:
+            if not os.path.exists(self.index_path(shard)):
+                continue
+            for entry in self.entries(shard, latest_only):
+                if wanted and entry['cnr'] not in wanted:
+                    continue
+                try:
+                    yield entry, self.get(entry['sha256'])
+                except (OSError, zstandard.ZstdError) as e:
+                    logging.error(f"Archived response {entry['sha256']} for {entry['cnr']} is unreadable: {str(e)}")
@@ -0,0 +1,203 @@
+import contextvars
+import cProfile
+import functools
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+from config.settings import TRACING
+
+# The CNR and attempt spans are charged to; asyncio tasks and threads each see their own
+_cnr = contextvars.ContextVar('trace_cnr', default=None)
+_attempt = contextvars.ContextVar('trace_attempt', default=None)
+
+_span_log = None
+_profiler = None
+
+
+class SpanLog:
+    """
+    Append-only JSONL log of spans, one
+    {"ts", "cnr", "attempt", "span", "seconds", ...attributes} object per line.
+
+    Only the process that opened it writes: a forked child, such as a pipeline
+    parse worker, drops its spans and the parent records the work instead.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._pid = os.getpid()
+        self._file = None
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        if os.getpid() != self._pid:
+            return
+        line = json.dumps(record, default=str) + '\n'
+        with self._lock:
+            if self._file is None:
+                log_dir = os.path.dirname(self.path)
+                if log_dir:
+                    os.makedirs(log_dir, exist_ok=True)
+                self._file = open(self.path, 'a', buffering=1)
+            self._file.write(line)
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+
+def start_tracing(name):
+    """Write this process's spans to TRACING['trace_dir']/<name>.jsonl"""
+    global _span_log
+    _span_log = SpanLog(os.path.join(TRACING['trace_dir'], f"{name}.jsonl"))
+    logging.info(f"Tracing spans to {_span_log.path}")
+    return _span_log.path
+
+
+def stop_tracing():
+    global _span_log
+    if _span_log:
+        _span_log.close()
+        _span_log = None
+
+
+def set_attempt(attempt):
+    """Charge the spans that follow to this attempt (counted from 1) of the current CNR"""
+    _attempt.set(attempt)
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time the with-block as one span of the current CNR and attempt.
+
+    Yields the span's attributes, so values only known at the end, such as an
+    HTTP status, can be added to it. An exception is recorded under 'error'.
+    Costs next to nothing while tracing is off.
+    """
+    if _span_log is None:
+        yield attributes
+        return
+    started_at = time.time()
+    started = time.perf_counter()
+    error = None
+    try:
+        yield attributes
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        record = {
+            'ts': round(started_at, 6),
+            'cnr': _cnr.get(),
+            'attempt': _attempt.get(),
+            'span': name,
+            'seconds': round(time.perf_counter() - started, 6)
+        }
+        record.update(attributes)
+        if error:
+            record['error'] = error
+        _span_log.write(record)
+
+
+def traced(name):
+    """Decorator recording every call of a function as a span"""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def trace_case(cnr):
+    """
+    Charge the spans recorded inside to cnr and record the whole fetch as a
+    'case' span, charged to the attempt it ended on, then count the case
+    towards --profile.
+    """
+    cnr_token = _cnr.set(cnr)
+    attempt_token = _attempt.set(None)
+    try:
+        with span('case') as attributes:
+            yield attributes
+    finally:
+        _attempt.reset(attempt_token)
+        _cnr.reset(cnr_token)
+        if _profiler:
+            _profiler.case_done()
+
+
+class CaseProfiler:
+    """
+    cProfile over the first `cases` CNRs a process scrapes, written to `path`.
+
+    Profiling starts with start(), or on entering a with-block, and stops by
+    itself once that many cases have gone through trace_case. Only the thread
+    that called start() is profiled: the crawl loop, which runs the requests,
+    parsing and database writes (and, for the async scrapers, the whole event
+    loop). OCR in the prefetcher's or the event loop's helper threads is not
+    seen.
+    """
+
+    def __init__(self, cases, path=None):
+        self.cases = cases
+        self.path = path or TRACING['profile_path']
+        self.done = 0
+        self._profile = cProfile.Profile()
+        self._thread = None
+
+    def start(self):
+        global _profiler
+        _profiler = self
+        self._thread = threading.get_ident()
+        self._profile.enable()
+        logging.info(f"Profiling the next {self.cases} cases")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def case_done(self):
+        self.done += 1
+        if self.done >= self.cases:
+            self.stop()
+
+    def stop(self):
+        """Stop profiling and write the profile; does nothing if already stopped or not on the profiled thread"""
+        global _profiler
+        if self._thread != threading.get_ident():
+            return
+        self._profile.disable()
+        self._thread = None
+        _profiler = None
+        profile_dir = os.path.dirname(self.path)
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+        self._profile.dump_stats(self.path)
+        logging.info(f"Profiled {self.done} cases; wrote {self.path}")
+
+
+def merge_profiles(paths, path):
+    """Combine the profiles at `paths` into one at `path`, deleting the parts; returns False if there were none"""
+    paths = [part for part in paths if os.path.exists(part)]
+    if not paths:
+        return False
+    pstats.Stats(*paths).dump_stats(path)
+    for part in paths:
+        if part != path:
+            os.remove(part)
+    logging.info(f"Merged {len(paths)} profiles into {path}")
+    return True
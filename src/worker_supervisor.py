@@ -0,0 +1,160 @@
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+
+from config.settings import WORKERS
+
+RECYCLE_EXIT_CODE = 75  # a worker exiting with this asks to be started again at once, e.g. to shed memory
+
+
+class WorkerReporter:
+    """
+    Sends a worker's progress to its supervisor.
+
+    A background thread sends snapshot() every report_interval seconds, so the
+    supervisor still knows what a worker did if it crashes; final() sends the
+    complete result once the worker is done.
+    """
+
+    def __init__(self, reports, index, generation, snapshot, report_interval=None):
+        self.reports = reports
+        self.index = index
+        self.generation = generation
+        self.snapshot = snapshot
+        self.report_interval = report_interval or WORKERS['report_interval']
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"worker-{index}-reporter", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.report_interval):
+            self.send(self.snapshot())
+
+    def send(self, report):
+        self.reports.put((self.index, self.generation, report))
+
+    def final(self, report):
+        """Stop the periodic reports and send the worker's complete result"""
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self.send(report)
+
+
+class WorkerSupervisor:
+    """
+    Runs `workers` processes of target(index, workers, generation, reports, *args)
+    and keeps them running until each finishes.
+
+    A worker that exits with an error is started again (its generation counts
+    up) after restart_delay seconds, up to max_restarts times; one exiting
+    with RECYCLE_EXIT_CODE is started again straight away. On Ctrl-C the
+    workers, which share the terminal, stop on their own; any still running
+    after shutdown_timeout seconds are terminated. Workers put
+    (index, generation, report) on `reports`; the latest report of every
+    worker generation is kept in self.reports.
+    """
+
+    def __init__(self, target, workers, args=(), max_restarts=None, restart_delay=None, shutdown_timeout=None,
+                 on_progress=None, progress_interval=None):
+        self.target = target
+        self.workers = workers
+        self.args = args
+        self.max_restarts = WORKERS['max_restarts'] if max_restarts is None else max_restarts
+        self.restart_delay = WORKERS['restart_delay'] if restart_delay is None else restart_delay
+        self.shutdown_timeout = shutdown_timeout or WORKERS['shutdown_timeout']
+        self.on_progress = on_progress
+        self.progress_interval = progress_interval or WORKERS['report_interval']
+        self.reports = {}  # (index, generation) -> latest report
+        self._queue = multiprocessing.Queue()
+        self._processes = {}  # index -> running Process
+        self._generations = {}  # index -> generation of the running or last process
+        self._crashes = {}  # index -> times the worker has exited with an error
+        self._restart_at = {}  # index -> monotonic time a crashed worker is due to start again
+
+    def _start(self, index):
+        generation = self._generations.get(index, -1) + 1
+        self._generations[index] = generation
+        process = multiprocessing.Process(
+            target=self.target, name=f"worker-{index}",
+            args=(index, self.workers, generation, self._queue) + tuple(self.args)
+        )
+        process.start()
+        self._processes[index] = process
+        logging.info(f"Started worker {index}/{self.workers} (pid {process.pid}, generation {generation})")
+
+    def _drain(self, timeout=0.0):
+        try:
+            while True:
+                index, generation, report = self._queue.get(timeout=timeout)
+                self.reports[(index, generation)] = report
+                timeout = 0.0
+        except queue.Empty:
+            pass
+
+    def _reap(self):
+        """Forget finished workers and schedule crashed ones for a restart"""
+        for index, process in list(self._processes.items()):
+            if process.is_alive():
+                continue
+            del self._processes[index]
+            if process.exitcode == 0:
+                logging.info(f"Worker {index} finished")
+                continue
+            if process.exitcode == RECYCLE_EXIT_CODE:
+                logging.info(f"Worker {index} asked to be recycled; restarting it")
+                self._restart_at[index] = time.monotonic()
+                continue
+            self._crashes[index] = self._crashes.get(index, 0) + 1
+            if self._crashes[index] <= self.max_restarts:
+                logging.error(f"Worker {index} exited with code {process.exitcode}; "
+                              f"restarting in {self.restart_delay} seconds")
+                self._restart_at[index] = time.monotonic() + self.restart_delay
+            else:
+                logging.error(f"Worker {index} exited with code {process.exitcode}; "
+                              f"giving up after {self.max_restarts} restarts")
+
+    def run(self):
+        """Run the workers until all have finished or given up, or Ctrl-C; returns self.reports"""
+        for index in range(self.workers):
+            self._start(index)
+        last_progress = time.monotonic()
+        try:
+            while self._processes or self._restart_at:
+                self._drain(timeout=1.0)
+                self._reap()
+                now = time.monotonic()
+                for index, due in list(self._restart_at.items()):
+                    if now >= due:
+                        del self._restart_at[index]
+                        self._start(index)
+                if self.on_progress and now - last_progress >= self.progress_interval:
+                    last_progress = now
+                    self.on_progress(self.reports)
+        except KeyboardInterrupt:
+            logging.info("Interrupted; waiting for workers to save their progress")
+            self.shutdown()
+        self._drain()
+        return self.reports
+
+    def shutdown(self):
+        """Wait for the workers to stop, terminating any that outlive shutdown_timeout"""
+        self._restart_at.clear()
+        deadline = time.monotonic() + self.shutdown_timeout
+        while self._processes and time.monotonic() < deadline:
+            try:
+                # Keep reading reports: a worker cannot exit while its queue is unflushed
+                self._drain(timeout=0.5)
+                self._processes = {index: process for index, process in self._processes.items()
+                                   if process.is_alive()}
+            except KeyboardInterrupt:
+                break
+        for index, process in self._processes.items():
+            logging.warning(f"Terminating worker {index}")
+            process.terminate()
+        for process in self._processes.values():
+            process.join(timeout=5)
+        self._processes = {}
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+OCR backend checks against stubbed engines, so no tesseract is needed.
+
+get_ocr_backend hands out one instance per backend and rejects unknown
+names; the tesserocr backend builds one engine per thread, however many
+captchas that thread reads, and ends them all on close.
+"""
+import threading
+import types
+
+import pytest
+
+from src import captcha_ocr
+from src.captcha_ocr import PytesseractBackend, TesserocrBackend, get_ocr_backend, ocr_captcha
+
+
+class StubTessBaseAPI:
+    """Stands in for tesserocr.PyTessBaseAPI, recording which thread built it"""
+
+    created = []
+
+    def __init__(self, oem=None):
+        self.thread = threading.current_thread()
+        self.ended = False
+        self.psm = None
+        StubTessBaseAPI.created.append(self)
+
+    def SetVariable(self, name, value):
+        pass
+
+    def SetPageSegMode(self, psm):
+        self.psm = psm
+
+    def SetImage(self, img):
+        # The engine is not thread-safe, so it must only ever be used by its own thread
+        assert threading.current_thread() is self.thread
+
+    def GetUTF8Text(self):
+        return f"ab{self.psm}\n"
+
+    def End(self):
+        self.ended = True
+
+
+@pytest.fixture
+def stub_tesserocr(monkeypatch):
+    StubTessBaseAPI.created = []
+    monkeypatch.setattr(captcha_ocr, 'tesserocr',
+                        types.SimpleNamespace(PyTessBaseAPI=StubTessBaseAPI, OEM=types.SimpleNamespace(DEFAULT=3)))
+    monkeypatch.setattr(captcha_ocr, '_instances', {})
+
+
+def test_tesserocr_builds_one_engine_per_thread(stub_tesserocr):
+    backend = get_ocr_backend('tesserocr')
+    assert isinstance(backend, TesserocrBackend)
+    assert get_ocr_backend('tesserocr') is backend
+
+    def read_captchas():
+        for psm in (7, 8, 13, 7, 8):
+            assert backend.image_to_string(None, psm) == f"ab{psm}"
+
+    threads = [threading.Thread(target=read_captchas) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    read_captchas()
+
+    assert len(StubTessBaseAPI.created) == 5
+    assert len({api.thread for api in StubTessBaseAPI.created}) == 5
+    backend.close()
+    assert all(api.ended for api in StubTessBaseAPI.created)
+
+
+def test_ocr_captcha_tries_psm_modes_in_turn(stub_tesserocr):
+    backend = get_ocr_backend('tesserocr')
+    # "ab7" and "ab8" are too short to be a captcha, so the cascade reaches PSM 13
+    assert ocr_captcha(backend, None) == ('ab13', 13)
+
+
+def test_pytesseract_passes_psm_and_charset(monkeypatch):
+    calls = []
+    monkeypatch.setattr(captcha_ocr.pytesseract, 'image_to_string',
+                        lambda img, config: calls.append(config) or ' ab12 \n')
+    assert PytesseractBackend().image_to_string(None, 8) == 'ab12'
+    assert '--psm 8' in calls[0]
+    assert f"tessedit_char_whitelist={captcha_ocr.CAPTCHA_CHARSET}" in calls[0]
+
+
+def test_unknown_or_missing_backend_raises(monkeypatch):
+    monkeypatch.setattr(captcha_ocr, '_instances', {})
+    with pytest.raises(ValueError):
+        get_ocr_backend('easyocr')
+    monkeypatch.setattr(captcha_ocr, 'tesserocr', None)
+    with pytest.raises(ImportError):
+        get_ocr_backend('tesserocr')
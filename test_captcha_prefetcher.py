@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Captcha prefetcher checks against a stand-in scraper, without any network.
+
+A captcha the OCR cannot read leaves the session's app token good, so the
+producer must fetch the next captcha on that session at once, up to
+max_ocr_misses times; a failed captcha fetch, or an OCR that keeps missing,
+gives the session up.
+"""
+from config.settings import CAPTCHA_PREFETCH
+from src.captcha_prefetcher import ArmedSession, CaptchaPrefetcher
+
+
+class Response:
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+        self.headers = {'content-type': 'image/png'}
+        self.content = b'captcha'
+
+
+class Session:
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class Scraper:
+    """Stands in for ECourtsScraper's captcha fetch and OCR"""
+
+    def __init__(self, answers, statuses=()):
+        self.answers = list(answers)
+        self.statuses = list(statuses)
+        self.fetches = 0
+
+    def _fetch_captcha_image(self, session):
+        self.fetches += 1
+        return Response(self.statuses.pop(0) if self.statuses else 200)
+
+    def _solve_captcha(self, image_bytes):
+        return self.answers.pop(0)
+
+
+def test_ocr_miss_retries_the_same_session_at_once():
+    scraper = Scraper([None, None, 'ab12'])
+    prefetcher = CaptchaPrefetcher(scraper, pool_size=1, producers=1)
+    session = Session()
+
+    armed = prefetcher._arm(ArmedSession(session, 'token', None))
+
+    assert armed is not None and armed.session is session
+    assert armed.captcha_text == 'ab12'
+    assert scraper.fetches == 3
+    assert prefetcher._returned.empty()
+    assert not session.closed
+
+
+def test_failed_captcha_fetch_gives_the_session_up():
+    scraper = Scraper([None], statuses=[200, 503])
+    prefetcher = CaptchaPrefetcher(scraper, pool_size=1, producers=1)
+    session = Session()
+
+    assert prefetcher._arm(ArmedSession(session, 'token', None)) is None
+    assert session.closed
+
+
+def test_ocr_that_keeps_missing_gives_the_session_up():
+    misses = CAPTCHA_PREFETCH['max_ocr_misses']
+    scraper = Scraper([None] * misses + ['never'])
+    prefetcher = CaptchaPrefetcher(scraper, pool_size=1, producers=1)
+    session = Session()
+
+    assert prefetcher._arm(ArmedSession(session, 'token', None)) is None
+    assert scraper.fetches == misses
+    assert session.closed
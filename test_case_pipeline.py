@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Pipeline checks with the fixture pages standing in for the portal: every CNR
+comes out of the persist stage exactly once, parsed as the parser would, and
+no queue ever holds more than its bound; fetching carries on while a slow
+persist is running.
+"""
+import asyncio
+import itertools
+import time
+
+from src.case_pipeline import CasePipeline
+from test_parser import FIXTURE_NAMES, load_expected, load_page, snapshot
+
+
+class FixtureFetcher:
+    """Stands in for AsyncECourtsScraper.fetch_case_page, serving the fixture pages"""
+
+    parser_backend = 'lxml'
+
+    def __init__(self, concurrency):
+        self.concurrency = concurrency
+
+    async def fetch_case_page(self, cnr):
+        await asyncio.sleep(0.001)
+        name = cnr.split(':')[0]
+        if name == 'not_found':
+            return {'cnr_number': cnr, 'exists': False, 'request_stats': {}}
+        return {'cnr_number': cnr, 'exists': True, 'page': load_page(name), 'request_stats': {}}
+
+
+def test_pipeline_parses_and_persists_every_cnr_once():
+    cnr_numbers = [f"{name}:{i}" for i, name in zip(range(60), itertools.cycle(FIXTURE_NAMES))]
+    persisted = {}
+    depths = []
+
+    def persist(cnr, case_data):
+        assert cnr not in persisted
+        persisted[cnr] = case_data
+        depths.append((pipeline.parse_queue.qsize(), pipeline.persist_queue.qsize()))
+
+    pipeline = CasePipeline(FixtureFetcher(concurrency=8), persist, parsers=2,
+                            parse_queue_size=4, persist_queue_size=3)
+    asyncio.run(pipeline.run(cnr_numbers))
+
+    assert sorted(persisted) == sorted(cnr_numbers)
+    for cnr, case_data in persisted.items():
+        name = cnr.split(':')[0]
+        if name == 'not_found':
+            assert case_data['exists'] is False
+            continue
+        assert case_data['exists'] is True
+        del case_data['exists'], case_data['request_stats']
+        assert snapshot(case_data) == load_expected(name)
+    assert max(parse for parse, _ in depths) <= 4
+    assert max(persist for _, persist in depths) <= 3
+    assert [stage['processed'] for stage in pipeline.metrics()] == [60, 60, 60]
+
+
+def test_slow_persist_does_not_stall_fetching():
+    cnr_numbers = [f"not_found:{i}" for i in range(20)]
+    fetched_during_persist = []
+
+    def persist(cnr, case_data):
+        fetched = pipeline.stages['fetch'].processed
+        time.sleep(0.05)  # a batch being written
+        fetched_during_persist.append(pipeline.stages['fetch'].processed - fetched)
+
+    def pending_cnr_numbers():
+        # A blocking frontier pull, as iter_pending_cnr_numbers makes
+        for cnr in cnr_numbers:
+            time.sleep(0.001)
+            yield cnr
+
+    pipeline = CasePipeline(FixtureFetcher(concurrency=2), persist, parsers=1, source_chunk_size=5)
+    asyncio.run(pipeline.run(pending_cnr_numbers()))
+    assert len(fetched_during_persist) == 20
+    assert sum(fetched_during_persist) > 0
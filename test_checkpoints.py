@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Checkpoint resume checks.
+
+A worker is killed part way through its shard, with some CNRs yielded but not
+yet done; a fresh worker restoring the checkpoint must visit every CNR the
+first one left unfinished and nothing past the end of the shard twice. A case
+whose save fails must never reach the checkpoint, and one that never succeeds
+must stop being replayed instead of piling up in the checkpoint row.
+"""
+from src.cnr_frontier import CheckpointedFrontier, CnrFrontier
+from src.database import CaseWriter
+
+
+class CheckpointStore:
+    """Stands in for Database's load_checkpoint/save_checkpoint"""
+
+    def __init__(self):
+        self.rows = {}
+        self.saves = 0
+
+    def load_checkpoint(self, worker_key):
+        return self.rows.get(worker_key)
+
+    def save_checkpoint(self, worker_key, high_water, in_flight):
+        self.saves += 1
+        self.rows[worker_key] = (high_water, list(in_flight))
+        return True
+
+
+def make_frontier(store, every=5):
+    frontier = CnrFrontier(['KLKN01'], [2019, 2020], shard=1, shards=3, block_size=4)
+    for year in (2019, 2020):
+        frontier.set_bounds('KLKN01', year, end=60)
+    return CheckpointedFrontier(frontier, store, 'shard 1/3', interval=3600, every=every)
+
+
+def test_resume_after_crash_loses_nothing():
+    store = CheckpointStore()
+    everything = list(make_frontier(store))
+
+    first = make_frontier(store)
+    assert not first.restore()
+    done = []
+    cnr_iter = iter(first)
+    in_flight = [next(cnr_iter) for _ in range(3)]
+    for cnr_number in cnr_iter:
+        # Three CNRs stay in flight; the oldest finishes out of order
+        in_flight.append(cnr_number)
+        finished = in_flight.pop(1)
+        first.done(finished)
+        done.append(finished)
+        if len(done) == 23:
+            break  # crash: no close(), so only the last coalesced save survives
+
+    second = make_frontier(store)
+    assert second.restore()
+    resumed = list(second)
+    assert set(done) | set(resumed) == set(everything)
+    # Only CNRs done since the last save are visited twice
+    assert len(set(done) & set(resumed)) < 5
+    assert store.saves == len(done) // 5
+
+
+def test_close_saves_finished_shard():
+    store = CheckpointStore()
+    frontier = make_frontier(store, every=1000)
+    for cnr_number in frontier:
+        frontier.done(cnr_number)
+    frontier.close()
+    resumed = make_frontier(store)
+    assert resumed.restore()
+    assert list(resumed) == []
+
+
+def test_cnr_that_keeps_failing_is_given_up_after_max_attempts():
+    store = CheckpointStore()
+    stuck = None
+    runs = 0
+    while True:
+        frontier = CheckpointedFrontier(make_frontier(store).frontier, store, 'shard 1/3',
+                                        interval=3600, max_attempts=3)
+        frontier.restore()
+        cnr_numbers = list(frontier)
+        stuck = stuck or cnr_numbers[0]
+        if stuck not in cnr_numbers:
+            break
+        runs += 1
+        for cnr_number in cnr_numbers:
+            if cnr_number != stuck:
+                frontier.done(cnr_number)
+        frontier.close()
+    assert runs == 3
+    assert store.rows['shard 1/3'][1] == [f"{stuck}:3"]
+
+
+def test_in_flight_is_capped_oldest_first():
+    store = CheckpointStore()
+    frontier = CheckpointedFrontier(make_frontier(store).frontier, store, 'shard 1/3',
+                                    interval=3600, max_in_flight=4)
+    cnr_numbers = list(frontier)  # nothing is ever done
+    frontier.close()
+    assert store.rows['shard 1/3'][1] == cnr_numbers[-4:]
+
+
+class FlakyDatabase:
+    """Fails every batch insert, and the single inserts of bad_cnrs"""
+
+    def __init__(self, bad_cnrs):
+        self.bad_cnrs = bad_cnrs
+
+    def insert_cases(self, batch, replace=False):
+        raise RuntimeError("deadlock")
+
+    def insert_case(self, case_details, replace=False):
+        if case_details['cnr_number'] in self.bad_cnrs:
+            raise RuntimeError("bad row")
+        return 1
+
+
+def test_failed_saves_stay_out_of_the_checkpoint():
+    # Serial 2 is advanced while buffered, serial 3 after the add that flushed its batch
+    bad_cnrs = {'KLKN010000022019', 'KLKN010000032019'}
+    done = []
+    writer = CaseWriter(FlakyDatabase(bad_cnrs), batch_size=3, flush_interval_ms=3600 * 1000,
+                        checkpoint=done.extend)
+    cnrs = [f"KLKN0100000{serial}2019" for serial in range(1, 7)]
+    for cnr in cnrs:
+        writer.add({'cnr_number': cnr})
+        writer.advance(cnr)
+    writer.close()
+    assert done == [cnr for cnr in cnrs if cnr not in bad_cnrs]
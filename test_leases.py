@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Lease subsystem checks against a throwaway SQLite database.
+
+Several workers, each on its own connection, claim ranges concurrently and
+must between them cover every CNR exactly once; a worker that dies mid-lease
+must be picked up from where it stopped once its lease expires, even by a
+worker that has run out of other ranges and would otherwise have stopped.
+The lease table in schema.sql must match the one CrawlLeases creates.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from src.cnr_frontier import LeasedFrontier, encode_cnr
+from src.database import CrawlLeases
+
+STREAMS = [('KLKN01', 2019), ('KLKN01', 2020)]
+ENDS = {('KLKN01', 2019): 250, ('KLKN01', 2020): 120}
+
+
+def expected_cnrs():
+    return {encode_cnr(establishment, serial, year)
+            for (establishment, year), end in ENDS.items() for serial in range(1, end + 1)}
+
+
+def open_leases(path, ttl=60):
+    connection = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+    return CrawlLeases(connection, STREAMS, ENDS, lease_size=7, ttl=ttl)
+
+
+def test_concurrent_workers_cover_every_cnr_once(tmp_path):
+    path = str(tmp_path / 'leases.db')
+    open_leases(path).close()  # create the table before the workers race
+    processed = []
+    lock = threading.Lock()
+    errors = []
+
+    def work(worker_id):
+        try:
+            leases = open_leases(path)
+            frontier = LeasedFrontier(leases, worker_id, heartbeat_interval=0.001)
+            for cnr in frontier:
+                with lock:
+                    processed.append(cnr)
+                frontier.done(cnr)
+            frontier.close()
+            leases.close()
+        except Exception as e:
+            errors.append(e)
+
+    workers = [threading.Thread(target=work, args=(f"worker-{i}",)) for i in range(8)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert not errors
+    assert len(processed) == len(set(processed)), "a CNR was handed to more than one worker"
+    assert set(processed) == expected_cnrs()
+    statuses = sqlite3.connect(path).execute("SELECT DISTINCT status FROM crawl_leases").fetchall()
+    assert statuses == [('done',)]
+
+
+def test_expired_lease_resumes_where_the_dead_worker_stopped(tmp_path):
+    path = str(tmp_path / 'leases.db')
+    crashed = LeasedFrontier(open_leases(path, ttl=0.2), 'crashed', heartbeat_interval=0.001)
+    cnr_iter = iter(crashed)
+    first = [next(cnr_iter) for _ in range(4)]
+    for cnr in first[:3]:
+        crashed.done(cnr)  # the fourth is still in flight when the worker dies
+    crashed.heartbeat()
+    time.sleep(0.3)
+
+    survivor = LeasedFrontier(open_leases(path), 'survivor', heartbeat_interval=0.001)
+    processed = []
+    for cnr in survivor:
+        processed.append(cnr)
+        survivor.done(cnr)
+
+    assert processed[0] == first[3]
+    assert set(first[:3]) | set(processed) == expected_cnrs()
+    assert not set(first[:3]) & set(processed)
+
+    # The lease was taken over, so the stale worker can no longer touch it
+    crashed.heartbeat()
+    crashed.close()
+    statuses = sqlite3.connect(path).execute("SELECT DISTINCT status FROM crawl_leases").fetchall()
+    assert statuses == [('done',)]
+
+
+def test_idle_worker_waits_for_a_held_lease_instead_of_exiting(tmp_path):
+    path = str(tmp_path / 'leases.db')
+    crashed = LeasedFrontier(open_leases(path, ttl=0.5), 'crashed', heartbeat_interval=0.001)
+    cnr_iter = iter(crashed)
+    first = [next(cnr_iter) for _ in range(3)]
+    for cnr in first[:2]:
+        crashed.done(cnr)
+    crashed.heartbeat()
+
+    # Everything else gets leased and finished while the dead worker's lease is still live
+    survivor = LeasedFrontier(open_leases(path), 'survivor', heartbeat_interval=0.05)
+    processed = []
+    for cnr in survivor:
+        processed.append(cnr)
+        survivor.done(cnr)
+
+    assert first[2] in processed
+    assert set(first[:2]) | set(processed) == expected_cnrs()
+    statuses = sqlite3.connect(path).execute("SELECT DISTINCT status FROM crawl_leases").fetchall()
+    assert statuses == [('done',)]
+
+
+def test_schema_sql_matches_the_lease_table():
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schema.sql')) as f:
+        schema = f.read()
+    statement = re.search(r"CREATE TABLE IF NOT EXISTS crawl_leases \(.*?\n\);", schema, re.S).group(0)
+    normalise = lambda sql: ' '.join(sql.replace(';', '').split())
+    assert normalise(statement) == normalise(CrawlLeases.CREATE_TABLE)
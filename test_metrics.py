@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Metrics endpoint checks: histograms render cumulative buckets with their sum
+and count, and a running server answers a scrape in the text format.
+"""
+import asyncio
+import socket
+from urllib.request import urlopen
+
+from src.metrics import REGISTRY, Counter, Gauge, Histogram, Registry, start_metrics_server
+
+
+def test_registry_renders_text_format():
+    registry = Registry()
+    requests = registry.register(Counter('test_requests_total', 'Requests', ['status']))
+    depth = registry.register(Gauge('test_depth', 'Depth', ['queue']))
+    seconds = registry.register(Histogram('test_seconds', 'Seconds', ['stage'], buckets=(0.1, 1)))
+    requests.inc(status=200)
+    requests.inc(2, status=200)
+    pending = [1, 2, 3]
+    depth.set_function(lambda: len(pending), queue='writer')
+    for value in (0.05, 0.1, 0.5, 3):
+        seconds.observe(value, stage='search')
+
+    @seconds.timed(stage='parse')
+    async def parse():
+        return 'parsed'
+
+    assert asyncio.run(parse()) == 'parsed'
+
+    lines = registry.render().splitlines()
+    assert '# TYPE test_requests_total counter' in lines
+    assert 'test_requests_total{status="200"} 3' in lines
+    assert 'test_depth{queue="writer"} 3' in lines
+    # Buckets are cumulative and a value on a bound falls in that bound's bucket
+    assert 'test_seconds_bucket{stage="search",le="0.1"} 2' in lines
+    assert 'test_seconds_bucket{stage="search",le="1.0"} 3' in lines
+    assert 'test_seconds_bucket{stage="search",le="+Inf"} 4' in lines
+    assert 'test_seconds_sum{stage="search"} 3.65' in lines
+    assert 'test_seconds_count{stage="search"} 4' in lines
+    assert 'test_seconds_count{stage="parse"} 1' in lines
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_server_answers_scrape():
+    port = free_port()
+    server = start_metrics_server(port=port, host='127.0.0.1')
+    assert server is not None, f"metrics server did not start on port {port}"
+    try:
+        with urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            assert response.headers['Content-Type'].startswith('text/plain')
+            assert response.read().decode('utf-8') == REGISTRY.render()
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Rate limiter checks: every retry the adapter makes takes its own token and
+reports its own status, so a 429 slows the crawl even if the retry succeeds;
+and a state file locked by another worker does not stall the event loop.
+"""
+import asyncio
+import fcntl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from urllib3.util.retry import Retry
+
+from src.rate_limiter import RateLimitedAdapter, RateLimiter
+
+
+class RecordingLimiter:
+    """Stands in for RateLimiter, keeping what it was told"""
+
+    def __init__(self):
+        self.acquired = 0
+        self.statuses = []
+
+    def acquire(self):
+        self.acquired += 1
+
+    def record(self, status_code=None, latency=None):
+        self.statuses.append(status_code)
+
+
+def serve(statuses):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(statuses.pop(0))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_each_retry_takes_a_token_and_reports_its_status():
+    server = serve([429, 503, 200])
+    limiter = RecordingLimiter()
+    session = requests.Session()
+    session.mount('http://', RateLimitedAdapter(limiter, retry=Retry(total=3, backoff_factor=0,
+                                                                     status_forcelist=[429, 503])))
+    try:
+        response = session.get(f"http://127.0.0.1:{server.server_address[1]}/")
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert response.status_code == 200
+    assert limiter.acquired == 3
+    assert limiter.statuses == [429, 503, 200]
+
+
+def test_locked_state_file_does_not_stall_event_loop(tmp_path):
+    limiter = RateLimiter(state_file=str(tmp_path / 'rate_limit.json'), settings={'burst': 100})
+
+    async def crawl():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.ensure_future(tick())
+        with open(limiter.state_file, 'a+') as f:
+            # Another worker holds the lock for a while
+            fcntl.flock(f, fcntl.LOCK_EX)
+            acquire = asyncio.ensure_future(limiter.acquire_async())
+            await asyncio.sleep(0.3)
+            assert not acquire.done()
+            fcntl.flock(f, fcntl.LOCK_UN)
+        await acquire
+        await limiter.record_async(200, 0.1)
+        ticker.cancel()
+        return ticks
+
+    started = time.monotonic()
+    assert asyncio.run(crawl()) >= 10
+    assert time.monotonic() - started < 5
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tracing checks: spans are keyed to the CNR and attempt they ran under, even
+with several CNRs in flight on one event loop, and --profile stops after its
+cases and merges per-worker profiles into one.
+"""
+import asyncio
+import json
+import pstats
+
+from src import tracing
+from src.tracing import CaseProfiler, merge_profiles, set_attempt, span, trace_case
+
+
+async def fetch(cnr, attempts):
+    with trace_case(cnr):
+        for attempt in range(1, attempts + 1):
+            set_attempt(attempt)
+            with span('http', url='/search') as attributes:
+                await asyncio.sleep(0.01)
+                attributes['status'] = 200
+            await asyncio.to_thread(traced_ocr)
+
+
+@tracing.traced('ocr')
+def traced_ocr():
+    return 'abcdef'
+
+
+async def fetch_all():
+    await asyncio.gather(fetch('KLKN010000012019', 2), fetch('KLKN010000022019', 1))
+
+
+def test_spans_are_keyed_by_cnr_and_attempt(tmp_path, monkeypatch):
+    monkeypatch.setitem(tracing.TRACING, 'trace_dir', str(tmp_path))
+    path = tracing.start_tracing('test')
+    try:
+        asyncio.run(fetch_all())
+    finally:
+        tracing.stop_tracing()
+    with open(path) as f:
+        spans = [json.loads(line) for line in f]
+    keys = sorted((record['cnr'], record['attempt'], record['span']) for record in spans)
+    # The case span is charged to the attempt the case ended on
+    assert keys == [
+        ('KLKN010000012019', 1, 'http'), ('KLKN010000012019', 1, 'ocr'),
+        ('KLKN010000012019', 2, 'case'), ('KLKN010000012019', 2, 'http'), ('KLKN010000012019', 2, 'ocr'),
+        ('KLKN010000022019', 1, 'case'), ('KLKN010000022019', 1, 'http'), ('KLKN010000022019', 1, 'ocr'),
+    ]
+    assert all(record['status'] == 200 for record in spans if record['span'] == 'http')
+
+
+def busy_case(cnr):
+    with trace_case(cnr):
+        return sum(range(1000))
+
+
+def test_profile_stops_after_its_cases_and_merges(tmp_path):
+    parts = []
+    for worker in range(2):
+        part = str(tmp_path / f"profile.prof.{worker}-0")
+        with CaseProfiler(2, part) as profiler:
+            for serial in range(5):
+                busy_case(f"KLKN0100000{serial}2019")
+        assert profiler.done == 2
+        parts.append(part)
+    merged = str(tmp_path / 'profile.prof')
+    assert merge_profiles(parts, merged)
+    calls = {function[2]: stat[1] for function, stat in pstats.Stats(merged).stats.items()}
+    assert calls['busy_case'] == 4
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Supervisor checks: a worker that crashes or asks to be recycled is restarted,
+and what every worker generation reported ends up in the totals.
+"""
+import time
+
+from src.crawl_stats import CrawlStats
+from src.worker_supervisor import RECYCLE_EXIT_CODE, WorkerReporter, WorkerSupervisor
+
+
+def count_cases(index, workers, generation, reports):
+    stats = CrawlStats()
+    reporter = WorkerReporter(reports, index, generation, stats.report, report_interval=0.05)
+    reporter.start()
+    try:
+        for serial in range(1, 6):
+            stats.attempted()
+            stats.record('successful', f"{index}/{generation}/{serial}")
+            stats.observe_latency(serial)
+            time.sleep(0.01)
+        if index == 1 and generation == 0:
+            raise RuntimeError("worker crashed")
+    finally:
+        reporter.final(stats.report(finished=True))
+    if index == 2 and generation == 0:
+        raise SystemExit(RECYCLE_EXIT_CODE)
+
+
+def test_crashed_and_recycled_workers_are_restarted_and_counted():
+    # Worker 1 crashes and uses up its one restart; worker 2's recycle is not counted as a crash
+    supervisor = WorkerSupervisor(count_cases, 3, max_restarts=1, restart_delay=0.1)
+    reports = supervisor.run()
+    assert sorted(reports) == [(0, 0), (1, 0), (1, 1), (2, 0), (2, 1)]
+    stats = CrawlStats.from_reports(reports.values(), time.time())
+    assert stats['total_attempted'] == stats['successful'] == 25
+    assert stats.latency.count == 25
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+import argparse
+import logging
+
+from config.settings import CAPTCHA_SOLVER
+from src.captcha_solver import CaptchaSolver, is_held_out, load_harvested_samples
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the securimage captcha solver from harvested captchas")
+    parser.add_argument('--input', default=CAPTCHA_SOLVER['harvest_dir'],
+                        help="directory of <text>_<hash>.png captchas (default: CAPTCHA_HARVEST_DIR)")
+    parser.add_argument('--model', default=CAPTCHA_SOLVER['model_path'],
+                        help="where to write the trained model")
+    parser.add_argument('--holdout', type=float, default=CAPTCHA_SOLVER['holdout'],
+                        help="fraction of captchas kept aside to measure accuracy")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not args.input:
+        print("No input directory; pass --input or set CAPTCHA_HARVEST_DIR")
+        return 1
+
+    samples = list(load_harvested_samples(args.input))
+    if not samples:
+        print(f"No captchas found in {args.input}")
+        return 1
+
+    # benchmark_captcha.py scores the solver on the same held-out captchas
+    validation = [sample for sample in samples if is_held_out(sample[0], args.holdout)]
+    training = [sample for sample in samples if not is_held_out(sample[0], args.holdout)]
+
+    solver = CaptchaSolver()
+    used = solver.train(training)
+    print(f"\nTrained on {used}/{len(training)} captchas ({len(solver.labels)} glyphs)")
+    if not solver.is_trained:
+        print("Nothing could be segmented; model not written")
+        return 1
+
+    if validation:
+        correct = 0
+        confident = 0
+        for image_bytes, text in validation:
+            guess, confidence = solver.solve(image_bytes)
+            if confidence >= CAPTCHA_SOLVER['min_confidence']:
+                confident += 1
+                correct += guess == text
+        print(f"Held-out captchas: {len(validation)}")
+        print(f"Answered confidently: {confident}")
+        if confident:
+            print(f"Accuracy when confident: {correct / confident * 100:.1f}%")
+
+    solver.save(args.model)
+    print(f"Model written to {args.model}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())